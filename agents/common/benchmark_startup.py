@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Startup-time benchmark and regression guard for the agent modules.
+
+Imports each entry point in a fresh interpreter under `python -X importtime`,
+then reports the wall time, the total import time and the slowest imports.
+A target fails when it takes longer than its budget or when it pulls in a
+heavy dependency (torch, whisper, supabase, openai, ...) it shouldn't need,
+so a module-level `import whisper` sneaking back in is caught before it
+slows every DB-only command down again.
+
+Usage:
+    python benchmark_startup.py
+    python benchmark_startup.py --targets view_videos job_queue --repeat 5
+    python benchmark_startup.py --output startup.json
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+
+AGENTS_DIR = Path(__file__).parent.parent.resolve()
+
+# Heavy dependencies that should only load when the stage that needs them runs
+HEAVY_MODULES = ['torch', 'whisper', 'supabase', 'openai', 'numpy']
+
+# name -> (directory, module, wall-time budget in seconds, modules it must not import)
+TARGETS = {
+    'view_videos': ('database', 'view_videos', 1.0, HEAVY_MODULES),
+    'job_queue': ('database', 'job_queue', 1.0, HEAVY_MODULES),
+    'database_utils': ('database', 'database_utils', 1.0, HEAVY_MODULES),
+    'catalog_mirror': ('database', 'catalog_mirror', 1.0, HEAVY_MODULES),
+    'facet_index': ('database', 'facet_index', 1.0, HEAVY_MODULES),
+    'fetch_news': ('news_agent', 'fetch_news', 1.0, HEAVY_MODULES),
+    'generate_summary': ('news_agent', 'generate_summary', 1.0, HEAVY_MODULES),
+    'video_gen': ('video_agent', 'video_gen', 1.0, HEAVY_MODULES),
+    'video_agent': ('video_agent', 'video_agent', 1.5, HEAVY_MODULES),
+    'orchestration_agent': ('orchestration_agent', 'orchestration_agent', 2.0, HEAVY_MODULES),
+    'warm_worker': ('orchestration_agent', 'warm_worker', 0.5, HEAVY_MODULES),
+}
+
+# Slowest imports listed per target
+TOP_IMPORTS = 10
+
+
+def parse_importtime(stderr):
+    """
+    Parse `-X importtime` output.
+
+    Returns:
+        list: (module, self_us, cumulative_us) per imported module; module
+            names keep their nesting indentation
+    """
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        # Nested imports are indented two spaces per level after the separator
+        imports.append((name[1:].rstrip(), int(self_us), int(cumulative_us)))
+    return imports
+
+
+def measure_target(name, repeat=3):
+    """
+    Import one target in fresh interpreters and measure it.
+
+    Returns:
+        dict: wall_seconds (median), import_seconds, top_imports, heavy_imports,
+            budget_seconds, ok and error
+    """
+    directory, module, budget, forbidden = TARGETS[name]
+    code = f"import sys; sys.path.insert(0, {str(AGENTS_DIR / directory)!r}); import {module}"
+
+    walls = []
+    imports = []
+    error = None
+    for _ in range(repeat):
+        start = time.monotonic()
+        process = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                                 capture_output=True, text=True, cwd=AGENTS_DIR / directory)
+        walls.append(time.monotonic() - start)
+        imports = parse_importtime(process.stderr)
+        if process.returncode != 0:
+            error = process.stderr.strip().splitlines()[-1] if process.stderr.strip() else 'failed'
+            break
+
+    imported = {module_name.strip().split('.')[0] for module_name, _, _ in imports}
+    heavy = sorted(imported & set(forbidden))
+    wall = statistics.median(walls)
+    # Top-level imports only, so nested imports aren't counted twice
+    top_level = [entry for entry in imports if not entry[0].startswith(' ')]
+    return {
+        'target': name,
+        'wall_seconds': round(wall, 3),
+        'import_seconds': round(sum(cumulative for _, _, cumulative in top_level) / 1e6, 3),
+        'budget_seconds': budget,
+        'top_imports': [
+            {'module': module_name.strip(), 'cumulative_ms': round(cumulative / 1000, 1)}
+            for module_name, _, cumulative in sorted(imports, key=lambda entry: -entry[2])[:TOP_IMPORTS]
+        ],
+        'heavy_imports': heavy,
+        'error': error,
+        'ok': error is None and not heavy and wall <= budget,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure and guard agent module startup time")
+    parser.add_argument('--targets', nargs='+', default=list(TARGETS), choices=list(TARGETS))
+    parser.add_argument('--repeat', type=int, default=3, help="Fresh interpreters per target (median wall time)")
+    parser.add_argument('--output', help="Write the JSON report here")
+    args = parser.parse_args()
+
+    results = [measure_target(name, args.repeat) for name in args.targets]
+    for result in results:
+        status = 'ok' if result['ok'] else 'FAIL'
+        detail = f" heavy={result['heavy_imports']}" if result['heavy_imports'] else ''
+        detail += f" error={result['error']}" if result['error'] else ''
+        print(f"{status:4} {result['target']:22} {result['wall_seconds']:6.3f}s "
+              f"(budget {result['budget_seconds']}s, imports {result['import_seconds']:.3f}s){detail}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({
+            'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': sys.version.split()[0],
+            'results': results,
+        }, indent=2))
+        print(f"Startup report written to {args.output}")
+
+    if not all(result['ok'] for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Process-wide API clients.
+
+Building an OpenAI client or a requests session sets up a connection pool, and
+building one per call throws the pool (and its TLS connections) away. These
+helpers create each client once per process and hand the same instance to
+every caller, so batch runs and long-lived workers reuse warm connections.
+"""
+
+import os
+import threading
+
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+
+# Connections kept per host by the shared HTTP session
+HTTP_POOL_SIZE = 16
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _get_or_create(name, factory):
+    with _clients_lock:
+        if name not in _clients:
+            _clients[name] = factory()
+        return _clients[name]
+
+
+def get_openai_client():
+    """
+    Return the shared OpenAI client (created on first use).
+
+    Returns:
+        openai.OpenAI: Client configured from OPENAI_API_KEY
+    """
+    def create():
+        from openai import OpenAI
+        load_dotenv()
+        return OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+    return _get_or_create('openai', create)
+
+
+def get_http_session():
+    """
+    Return the shared requests session (created on first use).
+
+    Returns:
+        requests.Session: Session with a connection pool of HTTP_POOL_SIZE per host
+    """
+    def create():
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    return _get_or_create('http', create)
+
+
+def reset_clients():
+    """Drop every shared client, e.g. in a child process after fork"""
+    with _clients_lock:
+        _clients.clear()
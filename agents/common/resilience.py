@@ -0,0 +1,294 @@
+"""
+Resilient calls to external providers (NewsAPI, OpenAI, Supabase, image hosts).
+
+Every external request goes through call_external, which applies the
+provider's policy from PROVIDER_POLICIES:
+
+    data = call_external('newsapi', lambda timeout: session.get(url, timeout=timeout))
+
+- the callable receives the per-attempt timeout and must pass it on, so no
+  request can hang forever;
+- transient failures (timeouts, connection errors, HTTP 408/425/429/5xx) are
+  retried with full-jitter exponential backoff, honouring Retry-After;
+- for tail-latency-sensitive, idempotent calls (hedge_after set) a duplicate
+  request is started when the first one is slower than hedge_after, and the
+  first successful response wins;
+- a per-provider circuit breaker opens after failure_threshold consecutive
+  failures and makes calls fail fast with CircuitOpenError until
+  reset_seconds have passed, after which a single trial call is let through.
+"""
+
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+
+from tracing import run_in_context, span
+
+
+# Per-provider call policy; timeouts and delays are in seconds
+PROVIDER_POLICIES = {
+    'newsapi': {
+        'timeout': 10.0, 'attempts': 3, 'base_delay': 0.5, 'max_delay': 8.0,
+        'hedge_after': 2.0, 'failure_threshold': 5, 'reset_seconds': 60.0,
+    },
+    'openai': {
+        'timeout': 60.0, 'attempts': 3, 'base_delay': 1.0, 'max_delay': 20.0,
+        'hedge_after': None, 'failure_threshold': 5, 'reset_seconds': 30.0,
+    },
+    'openai_images': {
+        'timeout': 90.0, 'attempts': 2, 'base_delay': 2.0, 'max_delay': 20.0,
+        'hedge_after': None, 'failure_threshold': 3, 'reset_seconds': 60.0,
+    },
+    'image_download': {
+        'timeout': 15.0, 'attempts': 3, 'base_delay': 0.5, 'max_delay': 5.0,
+        'hedge_after': 3.0, 'failure_threshold': 10, 'reset_seconds': 30.0,
+    },
+    'supabase': {
+        'timeout': 120.0, 'attempts': 4, 'base_delay': 1.0, 'max_delay': 30.0,
+        'hedge_after': None, 'failure_threshold': 5, 'reset_seconds': 60.0,
+    },
+}
+
+DEFAULT_POLICY = {
+    'timeout': 30.0, 'attempts': 3, 'base_delay': 1.0, 'max_delay': 15.0,
+    'hedge_after': None, 'failure_threshold': 5, 'reset_seconds': 60.0,
+}
+
+RETRYABLE_STATUS_CODES = {408, 425, 429}
+
+# Exception class names raised by SDKs we don't import here (openai, httpx)
+RETRYABLE_EXCEPTION_NAMES = {
+    'APITimeoutError', 'APIConnectionError', 'RateLimitError', 'InternalServerError',
+    'TimeoutException', 'ConnectError', 'ReadTimeout', 'RemoteProtocolError',
+}
+
+CIRCUIT_CLOSED = 'closed'
+CIRCUIT_OPEN = 'open'
+CIRCUIT_HALF_OPEN = 'half_open'
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+_hedge_pool = None
+_hedge_pool_lock = threading.Lock()
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling the provider while its circuit breaker is open"""
+
+    def __init__(self, provider, retry_in):
+        super().__init__(f"{provider} circuit open, retry in {retry_in:.0f}s")
+        self.provider = provider
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker for one provider.
+
+    Args:
+        provider: Provider name (for messages)
+        failure_threshold: Consecutive failures that open the circuit
+        reset_seconds: How long the circuit stays open before a trial call
+    """
+
+    def __init__(self, provider, failure_threshold=5, reset_seconds=60.0):
+        self.provider = provider
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = CIRCUIT_CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """
+        Check whether a call may go out.
+
+        Raises:
+            CircuitOpenError: While open, or while a half-open trial call is running
+        """
+        with self._lock:
+            if self.state == CIRCUIT_CLOSED:
+                return
+            retry_in = self.opened_at + self.reset_seconds - time.monotonic()
+            if self.state == CIRCUIT_OPEN and retry_in <= 0:
+                self.state = CIRCUIT_HALF_OPEN
+                self._trial_running = False
+            if self.state == CIRCUIT_HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return
+            raise CircuitOpenError(self.provider, max(retry_in, 0.0))
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CIRCUIT_CLOSED:
+                print(f"[resilience] {self.provider} circuit closed")
+            self.state = CIRCUIT_CLOSED
+            self.failures = 0
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.state == CIRCUIT_HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != CIRCUIT_OPEN:
+                    print(f"[resilience] {self.provider} circuit open after "
+                          f"{self.failures} failures, failing fast for {self.reset_seconds:.0f}s")
+                self.state = CIRCUIT_OPEN
+                self.opened_at = time.monotonic()
+
+
+def get_policy(provider):
+    """Return the call policy for a provider (DEFAULT_POLICY for unknown ones)"""
+    return PROVIDER_POLICIES.get(provider, DEFAULT_POLICY)
+
+
+def get_breaker(provider):
+    """Return the process-wide circuit breaker for a provider"""
+    with _breakers_lock:
+        if provider not in _breakers:
+            policy = get_policy(provider)
+            _breakers[provider] = CircuitBreaker(
+                provider, policy['failure_threshold'], policy['reset_seconds'])
+        return _breakers[provider]
+
+
+def reset_breakers():
+    """Forget every breaker's state (e.g. in a child process after fork)"""
+    with _breakers_lock:
+        _breakers.clear()
+
+
+def _status_code(exc):
+    status = getattr(exc, 'status_code', None)
+    if status is None:
+        status = getattr(getattr(exc, 'response', None), 'status_code', None)
+    return status
+
+
+def is_retryable(exc):
+    """
+    Whether an exception is a transient failure worth retrying.
+
+    Returns:
+        bool: True for timeouts, connection errors and 408/425/429/5xx responses
+    """
+    if isinstance(exc, (requests.Timeout, requests.ConnectionError, TimeoutError, ConnectionError)):
+        return True
+    status = _status_code(exc)
+    if isinstance(status, int):
+        return status in RETRYABLE_STATUS_CODES or status >= 500
+    return type(exc).__name__ in RETRYABLE_EXCEPTION_NAMES
+
+
+def _retry_after(exc):
+    headers = getattr(getattr(exc, 'response', None), 'headers', None) or {}
+    try:
+        return float(headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, base_delay, max_delay):
+    """Full-jitter exponential backoff: uniform in [0, min(max_delay, base_delay * 2**attempt)]"""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+def _get_hedge_pool():
+    global _hedge_pool
+    with _hedge_pool_lock:
+        if _hedge_pool is None:
+            _hedge_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix='hedge')
+        return _hedge_pool
+
+
+def _hedged(func, timeout, hedge_after, attributes):
+    """
+    Run func(timeout); if it hasn't finished after hedge_after seconds start a
+    second copy and return whichever succeeds first. The slower copy is left
+    to finish in the background and its result is dropped.
+    """
+    pool = _get_hedge_pool()
+    pending = {pool.submit(run_in_context(func), timeout)}
+    done, pending = wait(pending, timeout=hedge_after)
+    if not done:
+        attributes['hedged'] = True
+        pending.add(pool.submit(run_in_context(func), timeout))
+
+    error = None
+    while done or pending:
+        for future in done:
+            try:
+                return future.result()
+            except Exception as e:
+                error = e
+        if not pending:
+            break
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+    raise error
+
+
+def call_external(provider, func, attempts=None, timeout=None, hedge_after=None, retry_on=is_retryable):
+    """
+    Call an external provider with its timeout, retry, hedging and breaker policy.
+
+    Args:
+        provider: Key of PROVIDER_POLICIES ('newsapi', 'openai', 'openai_images',
+            'image_download', 'supabase')
+        func: Callable taking the per-attempt timeout in seconds; it must pass
+            the timeout on to the request it makes
+        attempts: Override the policy's number of attempts
+        timeout: Override the policy's per-attempt timeout
+        hedge_after: Override the policy's hedging delay (0 disables hedging)
+        retry_on: Predicate deciding whether an exception is retried
+
+    Returns:
+        Whatever func returns
+
+    Raises:
+        CircuitOpenError: If the provider's breaker is open
+        Exception: The last error once attempts are exhausted, or immediately
+            for non-retryable errors
+    """
+    policy = get_policy(provider)
+    attempts = attempts or policy['attempts']
+    timeout = timeout or policy['timeout']
+    hedge_after = policy['hedge_after'] if hedge_after is None else hedge_after
+    breaker = get_breaker(provider)
+
+    with span(f"resilience.{provider}", kind='http', timeout=timeout) as attributes:
+        last_error = None
+        for attempt in range(attempts):
+            attributes['attempts'] = attempt + 1
+            try:
+                breaker.before_call()
+            except CircuitOpenError as e:
+                # The breaker may open between retries; keep the real cause
+                raise e from last_error
+            try:
+                if hedge_after:
+                    result = _hedged(func, timeout, hedge_after, attributes)
+                else:
+                    result = func(timeout)
+            except Exception as e:
+                if not retry_on(e):
+                    # A bad request says nothing about the provider's health
+                    breaker.record_success()
+                    raise
+                breaker.record_failure()
+                last_error = e
+                if attempt + 1 >= attempts:
+                    raise
+                delay = backoff_delay(attempt, policy['base_delay'], policy['max_delay'])
+                delay = max(delay, min(_retry_after(e) or 0.0, policy['max_delay']))
+                print(f"[resilience] {provider} attempt {attempt + 1}/{attempts} failed "
+                      f"({type(e).__name__}: {e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+            else:
+                breaker.record_success()
+                return result
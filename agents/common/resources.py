@@ -0,0 +1,165 @@
+"""
+CPU core budgets for CPU-heavy stages.
+
+Whisper (torch intra-op threads) and ffmpeg/libx264 each size their thread
+pools to every core of the machine, so a transcription running next to a
+render oversubscribes the CPU and both slow down. A CoreScheduler hands out
+core budgets instead: a stage asks for between min_cores and max_cores, waits
+(FIFO) until at least min_cores are free, and runs with the budget it was
+granted. The budget is published in a context variable; run_ffmpeg turns it
+into -threads / -filter_threads options and torch_thread_budget() into
+torch.set_num_threads, so the code doing the work doesn't need to pass it
+around.
+"""
+
+import contextvars
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from tracing import span
+
+
+# Cores the scheduler may hand out (default: every core of the machine)
+DEFAULT_CORES = int(os.getenv("PIPELINE_CORES", 0)) or os.cpu_count() or 1
+
+# Core budget (min_cores, max_cores) per CPU-heavy pipeline resource; None
+# means all cores. Whisper gains little past 4 threads, x264 keeps scaling.
+DEFAULT_CORE_DEMANDS = {
+    'asr': (1, 4),
+    'render': (2, None),
+}
+
+_core_budget = contextvars.ContextVar('core_budget', default=None)
+_torch_lock = threading.Lock()
+
+
+def current_core_budget():
+    """Cores granted to the running stage, or None when no budget applies"""
+    return _core_budget.get()
+
+
+@contextmanager
+def core_budget(cores):
+    """Run a block with an explicit core budget (None removes the budget)"""
+    token = _core_budget.set(cores)
+    try:
+        yield cores
+    finally:
+        _core_budget.reset(token)
+
+
+class CoreScheduler:
+    """
+    Admission control over a fixed number of cores.
+
+    Args:
+        total_cores: Cores available to all stages together
+    """
+
+    def __init__(self, total_cores=DEFAULT_CORES):
+        self.total_cores = max(int(total_cores), 1)
+        self.free_cores = self.total_cores
+        self._queue = deque()
+        self._condition = threading.Condition()
+        self.stats = {'admitted': 0, 'wait_seconds': 0.0, 'max_waiting': 0}
+
+    def _grant(self, min_cores, max_cores):
+        # Leave the requests queued behind this one at least their minimum
+        reserved = sum(queued[0] for queued in self._queue)
+        return max(min(max_cores, self.free_cores - reserved), min_cores)
+
+    @contextmanager
+    def reserve(self, min_cores=1, max_cores=None, name=None):
+        """
+        Wait for at least min_cores free cores and hold a budget while the block runs.
+
+        Args:
+            min_cores: Cores needed to start (capped at total_cores)
+            max_cores: Cores the work can use (None: all of them)
+            name: Label for the trace span
+
+        Yields:
+            int: Granted number of cores (also available via current_core_budget())
+        """
+        min_cores = min(max(min_cores, 1), self.total_cores)
+        max_cores = max(min(max_cores or self.total_cores, self.total_cores), min_cores)
+        request = (min_cores, max_cores)
+
+        start = time.monotonic()
+        with span('cores.wait', kind='internal', stage=name, min_cores=min_cores) as attributes:
+            with self._condition:
+                self._queue.append(request)
+                self.stats['max_waiting'] = max(self.stats['max_waiting'], len(self._queue))
+                while self._queue[0] is not request or self.free_cores < min_cores:
+                    self._condition.wait()
+                self._queue.popleft()
+                granted = self._grant(min_cores, max_cores)
+                self.free_cores -= granted
+                self.stats['admitted'] += 1
+                self.stats['wait_seconds'] += time.monotonic() - start
+                # The next request in line may fit in what is left
+                self._condition.notify_all()
+            attributes['granted'] = granted
+
+        try:
+            with core_budget(granted):
+                yield granted
+        finally:
+            with self._condition:
+                self.free_cores += granted
+                self._condition.notify_all()
+
+
+def ffmpeg_thread_args(command, cores=None):
+    """
+    Apply a core budget to an ffmpeg command.
+
+    Adds the global -filter_threads/-filter_complex_threads options and a
+    -threads option after every libx264 encoder selection, so each encoder and
+    the filter graph stay within the budget.
+
+    Args:
+        command: ffmpeg command list
+        cores: Budget; defaults to current_core_budget()
+
+    Returns:
+        list: The command, unchanged when there is no budget
+    """
+    cores = cores or current_core_budget()
+    if not cores:
+        return list(command)
+    threads = str(cores)
+    result = [command[0], '-filter_threads', threads, '-filter_complex_threads', threads]
+    args = list(command[1:])
+    for i, arg in enumerate(args):
+        result.append(arg)
+        if i > 0 and arg == 'libx264' and args[i - 1].startswith('-c:v'):
+            result += ['-threads', threads]
+    return result
+
+
+@contextmanager
+def torch_thread_budget(cores=None):
+    """
+    Limit torch intra-op threads (Whisper inference) to the core budget for a block.
+
+    torch's thread count is process-wide, so concurrent blocks are serialised
+    and the previous count is restored afterwards. Does nothing when there is
+    no budget or torch hasn't been imported.
+    """
+    cores = cores or current_core_budget()
+    torch = sys.modules.get('torch')
+    if not cores or torch is None:
+        yield
+        return
+    with _torch_lock:
+        previous = torch.get_num_threads()
+        torch.set_num_threads(cores)
+        try:
+            yield
+        finally:
+            torch.set_num_threads(previous)
@@ -0,0 +1,279 @@
+"""
+Lightweight tracing for the news video pipeline.
+
+Code wraps each stage and external call in a span:
+
+    with span('openai.tts', kind='http', chars=len(script)):
+        ...
+
+Spans nest through a context variable, so a span opened inside a stage becomes
+its child even when stages run on worker threads (as long as the thread was
+started with the caller's context, see run_in_context). Each finished span
+records wall time, CPU time of its own thread, the process peak RSS so far and
+any error. The collected spans can be exported as a JSON trace and as a
+Prometheus text summary.
+
+Profiling is opt-in per span name with TRACE_PROFILE (comma-separated names
+or prefixes, or "all"): matching spans run under cProfile and tracemalloc and
+write a .prof file plus the traced memory peak to TRACE_PROFILE_DIR.
+"""
+
+import contextvars
+import cProfile
+import functools
+import io
+import itertools
+import json
+import os
+import pstats
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+
+
+TRACE_PROFILE = os.getenv("TRACE_PROFILE", "")
+TRACE_PROFILE_DIR = Path(os.getenv("TRACE_PROFILE_DIR", "profiles"))
+
+# ru_maxrss is in kilobytes on Linux and bytes on macOS
+RSS_UNIT_BYTES = 1 if sys.platform == 'darwin' else 1024
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+_span_ids = itertools.count(1)
+
+
+class Tracer:
+    """Collects finished spans for one process"""
+
+    def __init__(self):
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def record(self, span_record):
+        with self._lock:
+            self.spans.append(span_record)
+
+    def clear(self):
+        with self._lock:
+            self.spans = []
+
+    def summary(self):
+        """
+        Aggregate finished spans by name.
+
+        Returns:
+            dict: name -> {'kind', 'count', 'errors', 'wall_seconds', 'cpu_seconds', 'max_wall_seconds'}
+        """
+        totals = {}
+        with self._lock:
+            spans = list(self.spans)
+        for record in spans:
+            entry = totals.setdefault(record['name'], {
+                'kind': record['kind'], 'count': 0, 'errors': 0,
+                'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'max_wall_seconds': 0.0,
+            })
+            entry['count'] += 1
+            entry['errors'] += 1 if record['error'] else 0
+            entry['wall_seconds'] += record['wall_seconds']
+            entry['cpu_seconds'] += record['cpu_seconds']
+            entry['max_wall_seconds'] = max(entry['max_wall_seconds'], record['wall_seconds'])
+        return totals
+
+    def export_json(self, path):
+        """Write every finished span (ordered by start time) and the summary to a JSON file"""
+        with self._lock:
+            spans = sorted(self.spans, key=lambda record: record['start'])
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'spans': spans, 'summary': self.summary()}, f, indent=2, default=str)
+
+    def prometheus_text(self, prefix='news_pipeline'):
+        """
+        Render the span summary in the Prometheus text exposition format.
+
+        Returns:
+            str: Metrics text
+        """
+        lines = [
+            f"# HELP {prefix}_span_seconds Wall time spent in pipeline spans.",
+            f"# TYPE {prefix}_span_seconds summary",
+        ]
+        summary = self.summary()
+        for name, entry in sorted(summary.items()):
+            labels = f'name="{name}",kind="{entry["kind"]}"'
+            lines.append(f"{prefix}_span_seconds_sum{{{labels}}} {entry['wall_seconds']:.6f}")
+            lines.append(f"{prefix}_span_seconds_count{{{labels}}} {entry['count']}")
+        lines += [
+            f"# HELP {prefix}_span_cpu_seconds_total CPU time of the span's thread.",
+            f"# TYPE {prefix}_span_cpu_seconds_total counter",
+        ]
+        for name, entry in sorted(summary.items()):
+            lines.append(f'{prefix}_span_cpu_seconds_total{{name="{name}"}} {entry["cpu_seconds"]:.6f}')
+        lines += [
+            f"# HELP {prefix}_span_errors_total Spans that ended with an exception.",
+            f"# TYPE {prefix}_span_errors_total counter",
+        ]
+        for name, entry in sorted(summary.items()):
+            lines.append(f'{prefix}_span_errors_total{{name="{name}"}} {entry["errors"]}')
+        lines += [
+            f"# HELP {prefix}_peak_rss_bytes Peak resident set size of the process.",
+            f"# TYPE {prefix}_peak_rss_bytes gauge",
+            f"{prefix}_peak_rss_bytes {peak_rss_kb() * 1024}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def export_prometheus(self, path, prefix='news_pipeline'):
+        """Write prometheus_text() to a file (e.g. for the node_exporter textfile collector)"""
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus_text(prefix))
+
+
+_tracer = Tracer()
+
+
+def get_tracer():
+    """Return the process-wide tracer"""
+    return _tracer
+
+
+def peak_rss_kb():
+    """Peak resident set size of this process so far, in kilobytes"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * RSS_UNIT_BYTES // 1024
+
+
+def current_rss_kb():
+    """Current resident set size of this process in kilobytes (peak RSS where /proc isn't available)"""
+    try:
+        with open('/proc/self/status', encoding='ascii') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return peak_rss_kb()
+
+
+def _should_profile(name):
+    if not TRACE_PROFILE:
+        return False
+    for pattern in TRACE_PROFILE.split(','):
+        pattern = pattern.strip()
+        if pattern == 'all' or (pattern and name.startswith(pattern)):
+            return True
+    return False
+
+
+class _SpanProfiler:
+    """cProfile + tracemalloc for one span; silently skipped if another profiler is active"""
+
+    def __init__(self, name, span_id):
+        self.name = name
+        self.span_id = span_id
+        self.profile = cProfile.Profile()
+        self.started_tracemalloc = False
+        self.active = False
+
+    def start(self):
+        try:
+            self.profile.enable()
+        except ValueError:
+            # Only one cProfile can be active at a time (e.g. a nested profiled span)
+            return
+        self.active = True
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracemalloc = True
+        tracemalloc.reset_peak()
+
+    def stop(self, attributes):
+        if not self.active:
+            return
+        self.profile.disable()
+        _, peak = tracemalloc.get_traced_memory()
+        if self.started_tracemalloc:
+            tracemalloc.stop()
+
+        TRACE_PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        prof_path = TRACE_PROFILE_DIR / f"{self.name}_{self.span_id}.prof"
+        self.profile.dump_stats(str(prof_path))
+        report = io.StringIO()
+        pstats.Stats(self.profile, stream=report).sort_stats('cumulative').print_stats(20)
+        prof_path.with_suffix('.txt').write_text(report.getvalue())
+
+        attributes['profile_path'] = str(prof_path)
+        attributes['tracemalloc_peak_bytes'] = peak
+
+
+@contextmanager
+def span(name, kind='internal', **attributes):
+    """
+    Trace a block of code.
+
+    Args:
+        name: Span name (e.g. 'stage.render', 'openai.chat', 'ffmpeg.single_pass')
+        kind: Span category (stage, http, subprocess, db, model, internal)
+        **attributes: Extra key/values recorded with the span
+
+    Yields:
+        dict: The span's attributes; add to it to record results (sizes, ids, ...)
+    """
+    parent = _current_span.get()
+    span_id = next(_span_ids)
+    token = _current_span.set(span_id)
+
+    profiler = _SpanProfiler(name, span_id) if _should_profile(name) else None
+    if profiler is not None:
+        profiler.start()
+
+    start = time.time()
+    wall_start = time.monotonic()
+    cpu_start = time.thread_time()
+    error = None
+    try:
+        yield attributes
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        wall_seconds = time.monotonic() - wall_start
+        cpu_seconds = time.thread_time() - cpu_start
+        if profiler is not None:
+            profiler.stop(attributes)
+        _current_span.reset(token)
+        _tracer.record({
+            'id': span_id,
+            'parent_id': parent,
+            'name': name,
+            'kind': kind,
+            'thread': threading.current_thread().name,
+            'start': start,
+            'wall_seconds': round(wall_seconds, 6),
+            'cpu_seconds': round(cpu_seconds, 6),
+            'peak_rss_kb': peak_rss_kb(),
+            'attributes': attributes,
+            'error': error,
+        })
+
+
+def traced(name=None, kind='internal'):
+    """Decorator form of span(); the span name defaults to the function name"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name or func.__name__, kind=kind):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def run_in_context(func):
+    """
+    Bind func to the caller's context (and so its current span).
+
+    Use when handing work to a thread pool so spans opened by the worker
+    nest under the span that submitted it.
+    """
+    context = contextvars.copy_context()
+    return functools.partial(context.run, func)
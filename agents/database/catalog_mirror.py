@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+"""
+Local read-through mirror of the Supabase videos catalog.
+
+fetch_all_videos and fetch_video_by_date in database_utils run the nested
+titles/sources/tags join on Supabase for every call. The website's archive
+pages read the catalog on every request, so this module keeps a copy of each
+catalog entry (exactly as Supabase returns it) in the local SQLite database
+and answers the same reads from it.
+
+Reads accept data up to max_staleness seconds old (CATALOG_MAX_STALENESS);
+an older mirror is synced first. A sync is incremental: it fetches entries
+with an id above the highest one mirrored, re-fetches entries that were still
+being published (no video_url yet) and drops those that were rolled back.
+Every CATALOG_FULL_SYNC_SECONDS the catalog is copied again in full, which
+picks up edits and deletions of published entries.
+
+Syncs triggered by reads make a single attempt, and only one runs at a time:
+other readers keep serving the current copy meanwhile instead of queueing
+behind it. If Supabase is down, reads keep serving the last synced copy and
+the next sync is only tried CATALOG_SYNC_RETRY_SECONDS after the failure, so
+an outage doesn't add a timeout to every request.
+
+supabase_standin.py serves a synthetic catalog over the same REST API for
+trying the mirror without a Supabase project.
+
+Usage:
+    python catalog_mirror.py sync [--full]
+    python catalog_mirror.py status
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, List, Dict, Any, Iterator, Sequence, Tuple
+
+sys.path.append(str(Path(__file__).parent))
+import database_utils
+from database_utils import (
+    DEFAULT_PAGE_SIZE,
+    LISTING_COLUMNS,
+    MAX_PAGE_SIZE,
+    decode_cursor,
+    encode_cursor,
+    iter_video_pages as _iter_video_pages,
+    page_projection,
+)
+from video_database import get_db_connection, initialize_database
+
+sys.path.append(str(Path(__file__).parent.parent / 'common'))
+from tracing import traced
+
+
+# Reads accept a mirror synced at most this many seconds ago
+CATALOG_MAX_STALENESS = float(os.getenv("CATALOG_MAX_STALENESS", 60))
+
+# Copy the whole catalog again after this long (catches edits and deletions)
+CATALOG_FULL_SYNC_SECONDS = float(os.getenv("CATALOG_FULL_SYNC_SECONDS", 3600))
+
+# After a failed sync, reads serve the old copy this long before syncing again
+CATALOG_SYNC_RETRY_SECONDS = float(os.getenv("CATALOG_SYNC_RETRY_SECONDS", 30))
+
+# Entries fetched per request during a sync
+SYNC_PAGE_SIZE = 500
+
+_initialized = False
+_sync_lock = threading.RLock()
+# Start time of the last sync this process knows about (epoch seconds)
+_synced_at = None
+# When the last sync attempted by a read failed (epoch seconds)
+_sync_failed_at = None
+
+
+def initialize_catalog_mirror():
+    """
+    Creates the 'catalog_videos' and 'catalog_sync' tables if they don't exist.
+    This function is safe to call multiple times (idempotent).
+    """
+    global _initialized
+    if _initialized:
+        return
+    initialize_database()
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS catalog_videos (
+            id INTEGER PRIMARY KEY,
+            date TEXT NOT NULL,
+            complete INTEGER NOT NULL,
+            payload TEXT NOT NULL
+        )
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_catalog_videos_date ON catalog_videos (date, id)
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS catalog_sync (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            last_id INTEGER NOT NULL DEFAULT 0,
+            synced_at REAL,
+            full_synced_at REAL
+        )
+    """)
+    cursor.execute("INSERT OR IGNORE INTO catalog_sync (id) VALUES (1)")
+
+    conn.commit()
+    conn.close()
+    _initialized = True
+
+
+def _load_state(conn) -> Dict[str, Any]:
+    return dict(conn.execute("SELECT last_id, synced_at, full_synced_at FROM catalog_sync WHERE id = 1").fetchone())
+
+
+def _fetch_pages(after_id: int, attempts: Optional[int]) -> List[Dict[str, Any]]:
+    entries = []
+    while True:
+        page = database_utils.fetch_videos_after(after_id, SYNC_PAGE_SIZE, attempts=attempts)
+        entries += page
+        if len(page) < SYNC_PAGE_SIZE:
+            return entries
+        after_id = page[-1]["id"]
+
+
+@traced('catalog.sync', kind='db')
+def sync_catalog(full: bool = False, attempts: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Brings the mirror up to date with Supabase.
+
+    Args:
+        full: Copy the whole catalog even if the last full copy is recent
+        attempts: Attempts per request (default: the Supabase call policy's)
+
+    Returns:
+        dict: full, fetched, refreshed and removed entry counts and the sync duration
+    """
+    global _synced_at
+    initialize_catalog_mirror()
+
+    with _sync_lock:
+        started = time.time()
+        conn = get_db_connection()
+        try:
+            state = _load_state(conn)
+            full = full or state["full_synced_at"] is None or \
+                started - state["full_synced_at"] > CATALOG_FULL_SYNC_SECONDS
+
+            # All remote reads happen before the write transaction starts
+            entries = _fetch_pages(0 if full else state["last_id"], attempts)
+            refreshed, removed = [], []
+            if not full:
+                pending = [row["id"] for row in conn.execute("SELECT id FROM catalog_videos WHERE complete = 0")]
+                if pending:
+                    refreshed = database_utils.fetch_videos_by_ids(pending, attempts=attempts)
+                    found = {entry["id"] for entry in refreshed}
+                    # A publish that failed deletes its metadata row again
+                    removed = [video_id for video_id in pending if video_id not in found]
+
+            with conn:
+                if full:
+                    conn.execute("DELETE FROM catalog_videos")
+                conn.executemany("DELETE FROM catalog_videos WHERE id = ?", [(video_id,) for video_id in removed])
+                conn.executemany("""
+                    INSERT OR REPLACE INTO catalog_videos (id, date, complete, payload) VALUES (?, ?, ?, ?)
+                """, [
+                    (entry["id"], entry["date"], int(bool(entry.get("video_url"))), json.dumps(entry))
+                    for entry in entries + refreshed
+                ])
+                last_id = max([entry["id"] for entry in entries] + [0 if full else state["last_id"]])
+                conn.execute("""
+                    UPDATE catalog_sync
+                    SET last_id = ?, synced_at = ?, full_synced_at = COALESCE(?, full_synced_at)
+                    WHERE id = 1
+                """, (last_id, started, started if full else None))
+        finally:
+            conn.close()
+        _synced_at = started
+
+    return {
+        'full': full,
+        'fetched': len(entries),
+        'refreshed': len(refreshed),
+        'removed': len(removed),
+        'seconds': round(time.time() - started, 3),
+    }
+
+
+def ensure_fresh(max_staleness: Optional[float] = None):
+    """
+    Syncs the mirror (one attempt) if it is older than max_staleness seconds.
+
+    If an older copy exists, it is served as is while another thread syncs,
+    and for CATALOG_SYNC_RETRY_SECONDS after a failed sync (with a warning),
+    so the archive stays up and fast while Supabase is not.
+
+    Raises:
+        Exception: The sync error when nothing has been mirrored yet
+    """
+    global _synced_at, _sync_failed_at
+    max_staleness = CATALOG_MAX_STALENESS if max_staleness is None else max_staleness
+    if _synced_at is not None:
+        if time.time() - _synced_at <= max_staleness:
+            return
+        if _sync_failed_at is not None and time.time() - _sync_failed_at < CATALOG_SYNC_RETRY_SECONDS:
+            return
+
+    initialize_catalog_mirror()
+    # With a copy to serve, don't wait for a sync that is already running
+    if not _sync_lock.acquire(blocking=_synced_at is None):
+        return
+    try:
+        # Another thread or process may have synced in the meantime
+        conn = get_db_connection()
+        _synced_at = _load_state(conn)["synced_at"]
+        conn.close()
+        if _synced_at is not None and time.time() - _synced_at <= max_staleness:
+            return
+        try:
+            sync_catalog(attempts=1)
+        except Exception as e:
+            _sync_failed_at = time.time()
+            if _synced_at is None:
+                raise
+            print(f"Catalog sync failed, serving the mirror from {time.time() - _synced_at:.0f}s ago "
+                  f"(next try in {CATALOG_SYNC_RETRY_SECONDS:.0f}s): {e}")
+        else:
+            _sync_failed_at = None
+    finally:
+        _sync_lock.release()
+
+
+def fetch_all_videos(max_staleness: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    Mirrored equivalent of database_utils.fetch_all_videos.
+
+    Args:
+        max_staleness: Oldest acceptable mirror in seconds (default CATALOG_MAX_STALENESS)
+
+    Returns:
+        List[Dict]: Catalog entries in id order
+    """
+    ensure_fresh(max_staleness)
+
+    conn = get_db_connection()
+    rows = conn.execute("SELECT payload FROM catalog_videos ORDER BY id").fetchall()
+    conn.close()
+
+    return [json.loads(row["payload"]) for row in rows]
+
+
+def fetch_video_by_date(date: str, max_staleness: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    Mirrored equivalent of database_utils.fetch_video_by_date.
+
+    Args:
+        date: Edition date (YYYY-MM-DD)
+        max_staleness: Oldest acceptable mirror in seconds (default CATALOG_MAX_STALENESS)
+
+    Returns:
+        List[Dict]: Catalog entries of that date in id order
+    """
+    try:
+        parsed_date = datetime.strptime(date, "%Y-%m-%d").date()
+    except ValueError:
+        raise ValueError("Date must be in YYYY-MM-DD format")
+
+    ensure_fresh(max_staleness)
+
+    conn = get_db_connection()
+    rows = conn.execute(
+        "SELECT payload FROM catalog_videos WHERE date = ? ORDER BY id", (str(parsed_date),)
+    ).fetchall()
+    conn.close()
+
+    return [json.loads(row["payload"]) for row in rows]
+
+
+def fetch_videos_page(columns: Sequence[str] = LISTING_COLUMNS, relations: Sequence[str] = (),
+                      cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE,
+                      newest_first: bool = True,
+                      max_staleness: Optional[float] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Mirrored equivalent of database_utils.fetch_videos_page (same cursors).
+
+    Returns:
+        tuple: (entries, next_cursor); next_cursor is None on the last page
+    """
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    keys = page_projection(columns, relations) + list(relations)
+    direction = "DESC" if newest_first else "ASC"
+    where, params = "", []
+    if cursor is not None:
+        where = f"WHERE (date, id) {'<' if newest_first else '>'} (?, ?)"
+        params = list(decode_cursor(cursor))
+
+    ensure_fresh(max_staleness)
+
+    conn = get_db_connection()
+    rows = conn.execute(
+        f"SELECT payload FROM catalog_videos {where} ORDER BY date {direction}, id {direction} LIMIT ?",
+        params + [limit + 1]
+    ).fetchall()
+    conn.close()
+
+    entries = [json.loads(row["payload"]) for row in rows]
+    next_cursor = encode_cursor(entries[limit - 1]) if len(entries) > limit else None
+    return [{key: entry.get(key) for key in keys} for entry in entries[:limit]], next_cursor
+
+
+def fetch_videos_by_ids(ids: Sequence[int], columns: Sequence[str] = LISTING_COLUMNS,
+                        relations: Sequence[str] = ()) -> List[Dict[str, Any]]:
+    """
+    Mirrored catalog entries by id, projected like fetch_videos_page.
+
+    Returns:
+        List[Dict]: Entries in the order of ids (ids not in the mirror are skipped)
+
+    Raises:
+        ValueError: On an invalid projection or more than MAX_PAGE_SIZE ids
+    """
+    keys = page_projection(columns, relations) + list(relations)
+    ids = list(ids)
+    if len(ids) > MAX_PAGE_SIZE:
+        raise ValueError(f"At most {MAX_PAGE_SIZE} ids per call")
+    if not ids:
+        return []
+
+    conn = get_db_connection()
+    rows = conn.execute(
+        f"SELECT id, payload FROM catalog_videos WHERE id IN ({','.join('?' * len(ids))})", ids
+    ).fetchall()
+    conn.close()
+
+    entries = {row["id"]: json.loads(row["payload"]) for row in rows}
+    return [{key: entries[video_id].get(key) for key in keys} for video_id in ids if video_id in entries]
+
+
+def iter_video_pages(columns: Sequence[str] = LISTING_COLUMNS, relations: Sequence[str] = (),
+                     page_size: int = DEFAULT_PAGE_SIZE, newest_first: bool = True) -> Iterator[List[Dict[str, Any]]]:
+    """Mirrored equivalent of database_utils.iter_video_pages"""
+    return _iter_video_pages(columns, relations, page_size, newest_first, fetch_page=fetch_videos_page)
+
+
+def last_synced_at() -> Optional[float]:
+    """Start time of the last sync this process knows about (None before the first one)"""
+    return _synced_at
+
+
+def get_sync_state() -> Dict[str, Any]:
+    """
+    Returns:
+        dict: last_id, synced_at and full_synced_at (epoch seconds) of the mirror
+    """
+    initialize_catalog_mirror()
+
+    conn = get_db_connection()
+    state = _load_state(conn)
+    conn.close()
+
+    return state
+
+
+def get_mirror_status() -> Dict[str, Any]:
+    """
+    Returns:
+        dict: entries, pending (not yet published) entries, last_id and sync ages in seconds
+    """
+    initialize_catalog_mirror()
+
+    conn = get_db_connection()
+    state = _load_state(conn)
+    counts = conn.execute("SELECT COUNT(*) AS entries, SUM(complete = 0) AS pending FROM catalog_videos").fetchone()
+    conn.close()
+
+    now = time.time()
+    return {
+        'entries': counts["entries"],
+        'pending': counts["pending"] or 0,
+        'last_id': state["last_id"],
+        'synced_seconds_ago': round(now - state["synced_at"], 1) if state["synced_at"] else None,
+        'full_synced_seconds_ago': round(now - state["full_synced_at"], 1) if state["full_synced_at"] else None,
+        'max_staleness': CATALOG_MAX_STALENESS,
+        'sync_failed_seconds_ago': round(now - _sync_failed_at, 1) if _sync_failed_at else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mirror of the Supabase videos catalog")
+    commands = parser.add_subparsers(dest='command', required=True)
+    sync = commands.add_parser('sync', help="Bring the mirror up to date")
+    sync.add_argument('--full', action='store_true', help="Copy the whole catalog again")
+    commands.add_parser('status', help="Show the mirror's size and age")
+    args = parser.parse_args()
+
+    if args.command == 'sync':
+        result = sync_catalog(full=args.full)
+        kind = 'Full' if result['full'] else 'Incremental'
+        print(f"{kind} sync: {result['fetched']} fetched, {result['refreshed']} refreshed, "
+              f"{result['removed']} removed in {result['seconds']:.2f}s")
+    else:
+        print(json.dumps(get_mirror_status(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
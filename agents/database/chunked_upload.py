@@ -0,0 +1,390 @@
+import base64
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, Set
+
+sys.path.append(str(Path(__file__).parent.parent / 'common'))
+from tracing import run_in_context, span
+from resilience import call_external
+
+
+# Supabase's resumable (TUS) endpoint requires 6 MB chunks (the last one may be shorter)
+DEFAULT_CHUNK_SIZE = 6 * 1024 * 1024
+
+# Parts uploaded at once by backends that accept out-of-order parts
+DEFAULT_PARALLEL_PARTS = 4
+
+# Suffix of the sidecar file that remembers an unfinished upload
+UPLOAD_STATE_SUFFIX = '.upload.json'
+
+STORAGE_BUCKET = "media"
+
+# Block size of the content hash pass
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+class LocalStorageBackend:
+    """
+    Storage stand-in on the local filesystem with multipart semantics.
+
+    Parts are written to <root>/.uploads/<upload_id>/ (atomically, one file per
+    part) and joined into <root>/<storage_path> on completion, so uploads can
+    be interrupted, resumed and checked without a Supabase project.
+
+    Args:
+        root: Directory standing in for the bucket
+        base_url: Public URL prefix (default: file:// URL of root)
+    """
+
+    name = 'local'
+    parallel = True
+
+    def __init__(self, root, base_url: Optional[str] = None):
+        self.root = Path(root).resolve()
+        self.base_url = (base_url or self.root.as_uri()).rstrip('/')
+        self._uploads = self.root / '.uploads'
+
+    def start(self, storage_path: str, size: int, content_type: str) -> str:
+        upload_id = uuid.uuid4().hex
+        upload_dir = self._uploads / upload_id
+        upload_dir.mkdir(parents=True)
+        (upload_dir / 'meta.json').write_text(json.dumps({
+            'storage_path': storage_path, 'size': size, 'content_type': content_type
+        }))
+        return upload_id
+
+    def confirmed_parts(self, upload_id: str, chunk_size: int, size: int) -> Optional[Set[int]]:
+        upload_dir = self._uploads / upload_id
+        if not upload_dir.exists():
+            return None
+        parts = set()
+        for part in upload_dir.glob('part_*'):
+            index = int(part.name.split('_')[1])
+            expected = min(chunk_size, size - index * chunk_size)
+            if part.stat().st_size == expected:
+                parts.add(index)
+        return parts
+
+    def upload_part(self, upload_id: str, index: int, offset: int, data: bytes, timeout: float):
+        upload_dir = self._uploads / upload_id
+        temp = upload_dir / f".part_{index:06d}.tmp"
+        temp.write_bytes(data)
+        os.replace(temp, upload_dir / f"part_{index:06d}")
+
+    def complete(self, upload_id: str, storage_path: str, part_count: int):
+        upload_dir = self._uploads / upload_id
+        target = self.root / storage_path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        temp = target.with_name(f".{target.name}.{upload_id}.tmp")
+        with open(temp, 'wb') as out:
+            for index in range(part_count):
+                with open(upload_dir / f"part_{index:06d}", 'rb') as part:
+                    shutil.copyfileobj(part, out)
+        os.replace(temp, target)
+        shutil.rmtree(upload_dir, ignore_errors=True)
+
+    def exists(self, storage_path: str) -> bool:
+        return (self.root / storage_path).is_file()
+
+    def public_url(self, storage_path: str) -> str:
+        return f"{self.base_url}/{storage_path}"
+
+
+class TusBackend:
+    """
+    Supabase Storage resumable uploads (TUS protocol).
+
+    TUS appends at the server's current offset, so parts go up in order; a
+    resumed upload asks the server (HEAD) how many bytes it already has. An
+    interrupted PATCH may have stored part of a chunk, so the server offset
+    can fall inside a part; that part is then sent from the server offset on.
+
+    Args:
+        supabase_url: Project URL
+        supabase_key: Service or anon key
+        bucket: Storage bucket
+    """
+
+    name = 'tus'
+    parallel = False
+
+    def __init__(self, supabase_url: str, supabase_key: str, bucket: str = STORAGE_BUCKET):
+        from clients import get_http_session
+        self.endpoint = f"{supabase_url.rstrip('/')}/storage/v1/upload/resumable"
+        self.object_base = f"{supabase_url.rstrip('/')}/storage/v1/object/{bucket}"
+        self.public_base = f"{supabase_url.rstrip('/')}/storage/v1/object/public/{bucket}"
+        self.bucket = bucket
+        self.session = get_http_session()
+        self.headers = {
+            'authorization': f"Bearer {supabase_key}",
+            'apikey': supabase_key,
+            'Tus-Resumable': '1.0.0',
+        }
+
+    @staticmethod
+    def _metadata(**values) -> str:
+        return ','.join(f"{key} {base64.b64encode(value.encode()).decode()}" for key, value in values.items())
+
+    def start(self, storage_path: str, size: int, content_type: str) -> str:
+        def request(timeout):
+            response = self.session.post(self.endpoint, timeout=timeout, headers=dict(
+                self.headers,
+                **{
+                    'Upload-Length': str(size),
+                    'Upload-Metadata': self._metadata(
+                        bucketName=self.bucket, objectName=storage_path, contentType=content_type
+                    ),
+                    # Re-uploading an edition replaces the object
+                    'x-upsert': 'true',
+                }
+            ))
+            response.raise_for_status()
+            return response.headers['Location']
+
+        return call_external('supabase', request)
+
+    def _server_offset(self, upload_id: str, timeout: float) -> Optional[int]:
+        # Bytes the server holds for the upload, or None if it is gone
+        response = self.session.head(upload_id, headers=self.headers, timeout=timeout)
+        if response.status_code in (404, 410):
+            return None
+        response.raise_for_status()
+        return int(response.headers.get('Upload-Offset', 0))
+
+    def _patch(self, upload_id: str, offset: int, data: bytes, timeout: float):
+        return self.session.patch(upload_id, data=data, timeout=timeout, headers=dict(
+            self.headers,
+            **{'Upload-Offset': str(offset), 'Content-Type': 'application/offset+octet-stream'}
+        ))
+
+    def confirmed_parts(self, upload_id: str, chunk_size: int, size: int) -> Optional[Set[int]]:
+        offset = call_external('supabase', lambda timeout: self._server_offset(upload_id, timeout))
+        if offset is None:
+            return None
+        part_count = -(-size // chunk_size)
+        return {index for index in range(part_count)
+                if min((index + 1) * chunk_size, size) <= offset}
+
+    def upload_part(self, upload_id: str, index: int, offset: int, data: bytes, timeout: float):
+        response = self._patch(upload_id, offset, data, timeout)
+        if response.status_code == 409:
+            # Offset mismatch: an interrupted PATCH left the server holding
+            # the start of this part. Send the rest from where it stopped.
+            server_offset = self._server_offset(upload_id, timeout)
+            if server_offset is not None and offset < server_offset <= offset + len(data):
+                if server_offset == offset + len(data):
+                    return
+                response = self._patch(upload_id, server_offset, data[server_offset - offset:], timeout)
+        response.raise_for_status()
+
+    def complete(self, upload_id: str, storage_path: str, part_count: int):
+        # The upload finishes with the PATCH that reaches Upload-Length
+        pass
+
+    def exists(self, storage_path: str) -> bool:
+        def request(timeout):
+            response = self.session.head(f"{self.object_base}/{storage_path}", headers=self.headers, timeout=timeout)
+            # Storage answers 400 rather than 404 for a missing object
+            if response.status_code in (400, 404):
+                return False
+            response.raise_for_status()
+            return True
+
+        return call_external('supabase', request)
+
+    def public_url(self, storage_path: str) -> str:
+        return f"{self.public_base}/{storage_path}"
+
+
+_default_backend = None
+_default_backend_lock = threading.Lock()
+
+
+def get_storage_backend():
+    """
+    Return the process-wide storage backend.
+
+    LOCAL_STORAGE_DIR selects the local stand-in (LOCAL_STORAGE_URL sets its
+    public URL prefix); otherwise Supabase resumable uploads are used with
+    SUPABASE_URL and SUPABASE_KEY.
+
+    Raises:
+        ValueError: If neither local storage nor Supabase credentials are configured
+    """
+    global _default_backend
+    with _default_backend_lock:
+        if _default_backend is None:
+            from dotenv import load_dotenv
+            load_dotenv()
+            if os.getenv("LOCAL_STORAGE_DIR"):
+                _default_backend = LocalStorageBackend(
+                    os.getenv("LOCAL_STORAGE_DIR"), os.getenv("LOCAL_STORAGE_URL")
+                )
+            else:
+                url, key = os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY")
+                if not url or not key:
+                    raise ValueError(
+                        "Missing Supabase credentials. Set SUPABASE_URL and SUPABASE_KEY in .env"
+                    )
+                _default_backend = TusBackend(url, key)
+        return _default_backend
+
+
+def set_storage_backend(backend):
+    """Use this backend for every later upload (e.g. a LocalStorageBackend in tests)"""
+    global _default_backend
+    with _default_backend_lock:
+        _default_backend = backend
+
+
+# SHA-256 of files this process has hashed, by (path, size, mtime_ns)
+_content_hashes = {}
+_content_hashes_lock = threading.Lock()
+
+
+def content_hash(file_path) -> str:
+    """
+    SHA-256 hex digest of a file's contents.
+
+    The file is read in HASH_BLOCK_SIZE blocks, so memory stays flat for any
+    file size; the digest is remembered while the file's size and mtime
+    don't change.
+    """
+    file_path = Path(file_path)
+    stat = file_path.stat()
+    key = (str(file_path.resolve()), stat.st_size, stat.st_mtime_ns)
+    with _content_hashes_lock:
+        if key in _content_hashes:
+            return _content_hashes[key]
+
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    with _content_hashes_lock:
+        _content_hashes[key] = digest.hexdigest()
+    return _content_hashes[key]
+
+
+def _state_path(file_path: Path) -> Path:
+    return file_path.with_name(file_path.name + UPLOAD_STATE_SUFFIX)
+
+
+def _load_state(file_path: Path, expected: dict) -> Optional[str]:
+    state_path = _state_path(file_path)
+    try:
+        state = json.loads(state_path.read_text())
+    except (OSError, ValueError):
+        return None
+    if any(state.get(key) != value for key, value in expected.items()):
+        # The file or the target changed since; the old upload is useless
+        state_path.unlink(missing_ok=True)
+        return None
+    return state.get('upload_id')
+
+
+def upload_file(file_path, storage_path: str, content_type: str, backend=None,
+                chunk_size: int = DEFAULT_CHUNK_SIZE, parallel_parts: int = DEFAULT_PARALLEL_PARTS) -> str:
+    """
+    Upload a file in fixed-size chunks, resuming an earlier interrupted upload.
+
+    Each part is read with os.pread straight from the file, so memory use is
+    bounded by chunk_size * parallel_parts regardless of the file size. The
+    upload id is remembered in a <file>.upload.json sidecar; a later call for
+    the same unchanged file and target asks the backend which parts it
+    already has and sends only the rest.
+
+    Args:
+        file_path: Local file to upload
+        storage_path: Object path in the bucket
+        content_type: MIME type of the object
+        backend: Storage backend (default: get_storage_backend())
+        chunk_size: Part size in bytes
+        parallel_parts: Parts in flight at once (backends that accept it)
+
+    Returns:
+        str: Public URL of the uploaded object
+    """
+    backend = backend or get_storage_backend()
+    file_path = Path(file_path)
+    stat = file_path.stat()
+    size = stat.st_size
+    part_count = max(-(-size // chunk_size), 1)
+    expected = {
+        'storage_path': storage_path, 'size': size, 'mtime_ns': stat.st_mtime_ns,
+        'chunk_size': chunk_size, 'backend': backend.name,
+    }
+
+    with span('storage.upload', kind='http', backend=backend.name, bytes=size, parts=part_count) as attributes:
+        upload_id = _load_state(file_path, expected)
+        confirmed = backend.confirmed_parts(upload_id, chunk_size, size) if upload_id else None
+        if confirmed is None:
+            upload_id = backend.start(storage_path, size, content_type)
+            confirmed = set()
+            _state_path(file_path).write_text(json.dumps(dict(expected, upload_id=upload_id)))
+        elif confirmed:
+            print(f"Resuming upload of {file_path.name}: {len(confirmed)}/{part_count} parts already stored")
+        attributes['resumed_parts'] = len(confirmed)
+
+        fd = os.open(file_path, os.O_RDONLY)
+        try:
+            def send(index):
+                offset = index * chunk_size
+                data = os.pread(fd, min(chunk_size, size - offset), offset)
+                call_external('supabase', lambda timeout: backend.upload_part(upload_id, index, offset, data, timeout))
+
+            remaining = [index for index in range(part_count) if index not in confirmed]
+            if backend.parallel and parallel_parts > 1 and len(remaining) > 1:
+                with ThreadPoolExecutor(max_workers=parallel_parts, thread_name_prefix='upload') as pool:
+                    futures = [pool.submit(run_in_context(send), index) for index in remaining]
+                    for future in futures:
+                        # Re-raises the first failed part; the others stay confirmed for the resume
+                        future.result()
+            else:
+                for index in remaining:
+                    send(index)
+        finally:
+            os.close(fd)
+
+        backend.complete(upload_id, storage_path, part_count)
+        _state_path(file_path).unlink(missing_ok=True)
+    return backend.public_url(storage_path)
+
+
+def upload_content_addressed(file_path, prefix: str, content_type: str, backend=None, **upload_options) -> str:
+    """
+    Store a file under a path derived from its contents, uploading it only if it isn't stored yet.
+
+    The object goes to <prefix>/<sha256><suffix>. Identical files map to the
+    same object, so they are stored once, and re-publishing an edition
+    (e.g. after a metadata-only fix) costs a hash pass and one existence
+    check instead of the transfer.
+
+    Args:
+        file_path: Local file to store
+        prefix: Folder in the bucket (e.g. "videos")
+        content_type: MIME type of the object
+        backend: Storage backend (default: get_storage_backend())
+        upload_options: Passed on to upload_file (chunk_size, parallel_parts)
+
+    Returns:
+        str: Public URL of the object
+    """
+    backend = backend or get_storage_backend()
+    file_path = Path(file_path)
+
+    with span('storage.dedup', kind='http', backend=backend.name) as attributes:
+        storage_path = f"{prefix}/{content_hash(file_path)}{file_path.suffix.lower()}"
+        attributes['storage_path'] = storage_path
+        attributes['skipped'] = backend.exists(storage_path)
+    if attributes['skipped']:
+        print(f"{file_path.name} already stored as {storage_path}; upload skipped")
+        return backend.public_url(storage_path)
+    return upload_file(file_path, storage_path, content_type, backend, **upload_options)
@@ -1,37 +1,70 @@
 import os
-import supabase
-from dotenv import load_dotenv
-from typing import Optional, List, Dict, Any
+import re
+import sys
+import threading
+from typing import Optional, List, Dict, Any, Iterator, Sequence, Tuple
 from pathlib import Path
 from datetime import date, datetime
 
 # Import from same directory
 from video_database import get_videos_by_status
 
-load_dotenv()
+sys.path.append(str(Path(__file__).parent.parent / 'common'))
+from tracing import traced
+from resilience import call_external, get_policy
+from chunked_upload import upload_content_addressed
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+_supabase_client = None
+_supabase_client_lock = threading.Lock()
 
 def get_supabase_client():
 
+    # One client (and connection pool) per process, shared by concurrent uploads
+    global _supabase_client
+    with _supabase_client_lock:
+        if _supabase_client is None:
+            _supabase_client = _create_supabase_client()
+        return _supabase_client
+
+
+def _create_supabase_client():
+
+    # supabase and dotenv load on first use so DB-only commands start fast
+    import supabase
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    SUPABASE_URL = os.getenv("SUPABASE_URL")
+    SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+
     if not SUPABASE_URL or not SUPABASE_KEY:
         raise ValueError(
             "Missing Supabase credentials. Set SUPABASE_URL and SUPABASE_KEY in .env"
         )
-    return supabase.create_client(SUPABASE_URL, SUPABASE_KEY)
+    timeout = get_policy('supabase')['timeout']
+    return supabase.create_client(SUPABASE_URL, SUPABASE_KEY, options=supabase.ClientOptions(
+        postgrest_client_timeout=timeout,
+        storage_client_timeout=int(timeout)
+    ))
+
+
+def _execute(query, attempts=None):
+    """Execute a query through the Supabase call policy (timeouts come from the client options)"""
+    return call_external('supabase', lambda timeout: query.execute(), attempts=attempts)
+
+
+# A catalog entry: the videos row with its titles, sources and tags
+VIDEO_SELECT = "*, " \
+    "original_titles(*), " \
+    "video_sources(sources(*)), " \
+    "video_tags(tags(*))"
 
 
 def fetch_all_videos():
 
     client = get_supabase_client()
 
-    response = client.table("videos").select(
-        "*, " \
-        "original_titles(*), " \
-        "video_sources(sources(*)), " \
-        "video_tags(tags(*))"
-    ).execute()
+    response = _execute(client.table("videos").select(VIDEO_SELECT))
 
     return response.data or []
 
@@ -44,19 +77,153 @@ def fetch_video_by_date(date):
 
     client = get_supabase_client()
 
-    response = client.table("videos").select(
-        "*, " \
-        "original_titles(*), " \
-        "video_sources(sources(*)), " \
-        "video_tags(tags(*))"
-    ).eq("date", str(parsed_date)).execute()
+    response = _execute(client.table("videos").select(VIDEO_SELECT).eq("date", str(parsed_date)))
 
     return response.data or []
 
-def upload_video_to_storage(video_path):
+# Nested relations a paginated query can include, by the key they appear under
+VIDEO_RELATIONS = {
+    "original_titles": "original_titles(*)",
+    "video_sources": "video_sources(sources(*))",
+    "video_tags": "video_tags(tags(*))",
+}
+
+# What the archive listing shows
+LISTING_COLUMNS = ("id", "date", "summarized_title", "thumbnail_url")
+
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 200
+
+_COLUMN_NAME = re.compile(r"^[a-z_][a-z0-9_]*$")
+
+
+def encode_cursor(entry: Dict[str, Any]) -> str:
+    """Keyset cursor pointing just past a catalog entry ('<date>.<id>', safe in URLs)"""
+    return f"{entry['date']}.{entry['id']}"
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """
+    Parse a cursor made by encode_cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        cursor_date, cursor_id = cursor.split(".")
+        return str(datetime.strptime(cursor_date, "%Y-%m-%d").date()), int(cursor_id)
+    except (AttributeError, ValueError):
+        raise ValueError(f"Invalid page cursor: {cursor!r}")
+
+
+def page_projection(columns: Sequence[str], relations: Sequence[str]) -> List[str]:
+    """
+    Validate a projection and add the cursor columns to it.
+
+    Returns:
+        list: Column names, always including date and id
+
+    Raises:
+        ValueError: On an unknown relation or a malformed column name
+    """
+    for column in columns:
+        if not _COLUMN_NAME.match(column):
+            raise ValueError(f"Invalid column name: {column!r}")
+    unknown = [relation for relation in relations if relation not in VIDEO_RELATIONS]
+    if unknown:
+        raise ValueError(f"Unknown relations: {', '.join(unknown)} (choose from {', '.join(VIDEO_RELATIONS)})")
+    return list(dict.fromkeys(["id", "date", *columns]))
+
+
+def fetch_videos_page(columns: Sequence[str] = LISTING_COLUMNS, relations: Sequence[str] = (),
+                      cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE,
+                      newest_first: bool = True) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Fetch one page of the catalog, ordered by (date, id).
+
+    Pages are addressed by a keyset cursor instead of an offset, so every page
+    costs the same (an index range scan) however deep it is, and entries
+    published while someone pages through are neither skipped nor repeated.
+    Only the requested columns and relations are returned.
+
+    Args:
+        columns: videos columns to return (id and date are always included)
+        relations: Keys of VIDEO_RELATIONS to embed
+        cursor: next_cursor of the previous page (None for the first page)
+        limit: Entries per page (at most MAX_PAGE_SIZE)
+        newest_first: Newest edition first (archive order) or oldest first
+
+    Returns:
+        tuple: (entries, next_cursor); next_cursor is None on the last page
+
+    Raises:
+        ValueError: On an invalid projection, cursor or limit
+    """
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    projection = page_projection(columns, relations)
 
     client = get_supabase_client()
 
+    query = client.table("videos").select(
+        ", ".join(projection + [VIDEO_RELATIONS[relation] for relation in relations])
+    )
+    if cursor is not None:
+        cursor_date, cursor_id = decode_cursor(cursor)
+        op = "lt" if newest_first else "gt"
+        query = query.or_(f"date.{op}.{cursor_date},and(date.eq.{cursor_date},id.{op}.{cursor_id})")
+    # One entry more than asked tells whether another page follows
+    response = _execute(query.order("date", desc=newest_first).order("id", desc=newest_first).limit(limit + 1))
+
+    entries = response.data or []
+    next_cursor = encode_cursor(entries[limit - 1]) if len(entries) > limit else None
+    return entries[:limit], next_cursor
+
+
+def iter_video_pages(columns: Sequence[str] = LISTING_COLUMNS, relations: Sequence[str] = (),
+                     page_size: int = DEFAULT_PAGE_SIZE, newest_first: bool = True,
+                     fetch_page=None) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Stream the catalog page by page (see fetch_videos_page).
+
+    Args:
+        fetch_page: Page function to use (default fetch_videos_page; the
+            catalog mirror passes its own)
+
+    Yields:
+        list: The entries of each page
+    """
+    fetch_page = fetch_page or fetch_videos_page
+    cursor = None
+    while True:
+        entries, cursor = fetch_page(columns, relations, cursor, page_size, newest_first)
+        if entries:
+            yield entries
+        if cursor is None:
+            return
+
+
+def fetch_videos_after(after_id, limit=500, attempts=None):
+
+    # Catalog entries in id order, for incremental copies of the catalog
+    client = get_supabase_client()
+
+    response = _execute(client.table("videos").select(VIDEO_SELECT)
+                        .gt("id", after_id).order("id").limit(limit), attempts=attempts)
+
+    return response.data or []
+
+def fetch_videos_by_ids(ids, attempts=None):
+
+    client = get_supabase_client()
+
+    response = _execute(client.table("videos").select(VIDEO_SELECT).in_("id", list(ids)), attempts=attempts)
+
+    return response.data or []
+
+@traced('supabase.upload_video', kind='http')
+def upload_video_to_storage(video_path):
+
     if not video_path:
         raise ValueError(f"Video record has no video_path")
 
@@ -64,32 +231,14 @@ def upload_video_to_storage(video_path):
     if not video_file.exists():
         raise FileNotFoundError(f"Video file not found: {video_path}")
 
-    filename = video_file.stem  
-    if filename == "Story":
-        from datetime import datetime
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    else:
-        timestamp = filename.split("_", 1)[-1] if "_" in filename else filename
-
-    storage_path = f"videos/{timestamp}.mp4"  
-
-    with open(video_file, "rb") as f:
-        file_data = f.read()
-
-        response = client.storage.from_("media").upload(
-            path=storage_path,
-            file=file_data,
-            file_options={"content-type": "video/mp4"}
-        )
-
-    public_url = client.storage.from_("media").get_public_url(storage_path)
+    # Stored under its content hash: identical files are stored (and sent) once
+    public_url = upload_content_addressed(video_file, "videos", "video/mp4")
 
     return public_url
 
+@traced('supabase.upload_thumbnail', kind='http')
 def upload_thumbnail_to_storage(image_path):
 
-    client = get_supabase_client()
-
     if not image_path:
         raise ValueError(f"Image has no image_path")
     
@@ -97,28 +246,58 @@ def upload_thumbnail_to_storage(image_path):
     if not image_file.exists():
         raise FileNotFoundError(f"Image file not found: {image_path}")
 
-    filename = image_file.stem  
-    if filename == "thumbnail":
-        from datetime import datetime
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    else:
-        timestamp = filename.split("_", 1)[-1] if "_" in filename else filename
-
-    storage_path = f"thumbnails/{timestamp}.png" 
-
-    with open(image_file, "rb") as f:
-        file_data = f.read()
-
-        response = client.storage.from_("media").upload(
-            path=storage_path,
-            file=file_data,
-            file_options={"content-type": "image/png"}
-        )
-
-    public_url = client.storage.from_("media").get_public_url(storage_path)
+    public_url = upload_content_addressed(image_file, "thumbnails", "image/png")
 
     return public_url
 
+# name -> id of sources and tags seen by this process; names are unique and
+# rows are never renamed, so entries don't go stale
+_source_ids = {}
+_tag_ids = {}
+_id_cache_lock = threading.Lock()
+
+def _get_or_create_ids(client, table, names, cache, make_row):
+    """
+    Look up the ids of rows by name, creating the missing ones.
+
+    Names already in the cache cost nothing; the rest take one select and,
+    if some are new, one upsert on the unique name column (safe when another
+    process creates the same name at the same time).
+
+    Args:
+        client: Supabase client
+        table: "sources" or "tags"
+        names: Iterable of names
+        cache: The table's name -> id cache
+        make_row: Builds the row inserted for a new name
+
+    Returns:
+        dict: name -> id for every name
+    """
+    names = list(dict.fromkeys(names))
+    with _id_cache_lock:
+        ids = {name: cache[name] for name in names if name in cache}
+    missing = [name for name in names if name not in ids]
+
+    if missing:
+        existing = _execute(client.table(table).select("id, name").in_("name", missing))
+        ids.update({row["name"]: row["id"] for row in existing.data or []})
+        new_names = [name for name in missing if name not in ids]
+        if new_names:
+            # Upserting on a unique key is idempotent, so it may be retried
+            created = _execute(client.table(table).upsert(
+                [make_row(name) for name in new_names], on_conflict="name"
+            ))
+            ids.update({row["name"]: row["id"] for row in created.data or []})
+        with _id_cache_lock:
+            cache.update({name: ids[name] for name in missing if name in ids})
+
+    unresolved = [name for name in names if name not in ids]
+    if unresolved:
+        raise Exception(f"Failed to resolve {table} ids for: {', '.join(unresolved)}")
+    return ids
+
+@traced('supabase.insert_metadata', kind='http')
 def upload_video_metadata(news_data, video_url= None, thumbnail_url=None):
 
     client = get_supabase_client()
@@ -127,67 +306,99 @@ def upload_video_metadata(news_data, video_url= None, thumbnail_url=None):
     title = news_data["title"]
     summary = news_data["summary"]
 
-    response = client.table("videos").insert({
+    # Inserts are not idempotent, so they get the timeout and breaker but no retry
+    response = _execute(client.table("videos").insert({
         "date": date,
         "summarized_title": title,
         "summary": summary,
         "video_url": video_url,
         "thumbnail_url": thumbnail_url
-    }).execute()
+    }), attempts=1)
 
     if response.data and len(response.data) > 0:
         video_id = response.data[0]["id"]
     else:
         raise Exception("Failed to insert video metadata in videos table")
 
-    for position, title in enumerate(news_data["original_titles"]):
-        client.table("original_titles").insert({
-            "video_id": video_id,
-            "title": title,
-            "position": position
-        }).execute()
-
-    for source_data in news_data["sources"]:
-        source_name = source_data["name"]
-        source_url = source_data["url"]
-
-        existing_source = client.table("sources")\
-            .select("*")\
-            .eq("name", source_name)\
-            .execute()
-
-        if existing_source.data and len(existing_source.data) > 0:
-            source_id = existing_source.data[0]["id"]
-        else:
-            new_source = client.table("sources").insert({
-                "name": source_name,
-                "base_url": source_url
-            }).execute()
-            source_id = new_source.data[0]["id"]
-
-        client.table("video_sources").insert({
-            "video_id": video_id,
-            "source_id": source_id,
-            "article_url": source_url 
-        }).execute()
-
-    for tag_name in news_data["tags"]:
-        existing_tag = client.table("tags")\
-            .select("*")\
-            .eq("name", tag_name)\
-            .execute()
-        
-        if existing_tag.data and len(existing_tag.data) > 0:
-            tag_id = existing_tag.data[0]["id"]
-        else:
-            new_tag = client.table("tags").insert({
-                "name": tag_name
-            }).execute()
-            tag_id = new_tag.data[0]["id"]
-        
-        client.table("video_tags").insert({
-            "video_id": video_id,
-            "tag_id": tag_id
-        }).execute()
+    # Don't leave a videos row without its titles, sources or tags behind
+    try:
+        if news_data["original_titles"]:
+            _execute(client.table("original_titles").insert([
+                {"video_id": video_id, "title": title, "position": position}
+                for position, title in enumerate(news_data["original_titles"])
+            ]), attempts=1)
+
+        sources = news_data["sources"]
+        if sources:
+            base_urls = {}
+            for source_data in sources:
+                base_urls.setdefault(source_data["name"], source_data["url"])
+            source_ids = _get_or_create_ids(client, "sources", base_urls, _source_ids,
+                                            lambda name: {"name": name, "base_url": base_urls[name]})
+            _execute(client.table("video_sources").insert([
+                {
+                    "video_id": video_id,
+                    "source_id": source_ids[source_data["name"]],
+                    "article_url": source_data["url"]
+                }
+                for source_data in sources
+            ]), attempts=1)
+
+        # The LLM sometimes repeats a tag
+        tag_names = list(dict.fromkeys(news_data["tags"]))
+        if tag_names:
+            tag_ids = _get_or_create_ids(client, "tags", tag_names, _tag_ids,
+                                         lambda name: {"name": name})
+            _execute(client.table("video_tags").insert([
+                {"video_id": video_id, "tag_id": tag_ids[tag_name]}
+                for tag_name in tag_names
+            ]), attempts=1)
+    except Exception:
+        try:
+            delete_video_metadata(video_id)
+        except Exception as cleanup_error:
+            print(f"Could not remove partial video metadata {video_id}: {cleanup_error}")
+        raise
 
     return video_id
+
+@traced('supabase.update_urls', kind='http')
+def set_video_urls(video_id, video_url, thumbnail_url):
+
+    client = get_supabase_client()
+
+    # An update to fixed values is idempotent, so it can be retried
+    response = _execute(client.table("videos").update({
+        "video_url": video_url,
+        "thumbnail_url": thumbnail_url
+    }).eq("id", video_id))
+
+    return bool(response.data)
+
+# Copy of every machine's local videos table, written by outbox.py
+PIPELINE_VIDEOS_TABLE = os.getenv("PIPELINE_VIDEOS_TABLE", "pipeline_videos")
+
+@traced('supabase.upsert_pipeline_videos', kind='http')
+def upsert_pipeline_videos(rows):
+
+    client = get_supabase_client()
+
+    # Rows are full snapshots keyed by (origin, local_id), so a retry is harmless
+    _execute(client.table(PIPELINE_VIDEOS_TABLE).upsert(rows, on_conflict="origin,local_id"))
+
+@traced('supabase.delete_pipeline_videos', kind='http')
+def delete_pipeline_videos(origin, local_ids):
+
+    client = get_supabase_client()
+
+    _execute(client.table(PIPELINE_VIDEOS_TABLE).delete().eq("origin", origin).in_("local_id", list(local_ids)))
+
+@traced('supabase.delete_metadata', kind='http')
+def delete_video_metadata(video_id):
+
+    client = get_supabase_client()
+
+    for table in ("original_titles", "video_sources", "video_tags"):
+        _execute(client.table(table).delete().eq("video_id", video_id))
+
+    _execute(client.table("videos").delete().eq("id", video_id))
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+In-memory faceted index of the published catalog, for the archive filters.
+
+Built from the local catalog mirror (catalog_mirror.py): every tag and source
+maps to a sorted array of video ids (a compact array('q'), not a set), and
+every video's date is kept in a date-sorted array, so a filter such as
+"technology AND Reuters, last 30 days" is a handful of bisections and
+sorted-array intersections. Facet counts (how many matching videos carry
+each tag/source) are computed over the result, so the filter UI can show
+them next to every option.
+
+The index follows the mirror: when the mirror has synced since the last
+query, newly published videos are added and rolled-back ones removed; a full
+mirror sync (which may edit existing entries) rebuilds it. Tag and source
+names match case-insensitively.
+
+Usage:
+    python facet_index.py --tags technology --sources Reuters --days 30
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from itertools import chain
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Optional, List, Dict, Any, Sequence
+
+sys.path.append(str(Path(__file__).parent))
+import catalog_mirror
+from database_utils import decode_cursor, encode_cursor
+from video_database import get_db_connection
+
+
+# Facets whose counts are returned, largest first
+MAX_FACET_VALUES = 50
+
+
+def _intersect(a, b):
+    """Intersection of two sorted id arrays, as a sorted array"""
+    if len(a) > len(b):
+        a, b = b, a
+    if len(a) * 32 < len(b):
+        # Very uneven sizes: bisect the long array for each id of the short one
+        result = array('q')
+        low = 0
+        for value in a:
+            low = bisect_left(b, value, low)
+            if low == len(b):
+                break
+            if b[low] == value:
+                result.append(value)
+        return result
+    return array('q', sorted(set(a).intersection(b)))
+
+
+def _names(entry: Dict[str, Any], relation: str, key: str) -> List[str]:
+    names = []
+    for link in entry.get(relation) or []:
+        row = (link or {}).get(key) or {}
+        if row.get("name"):
+            names.append(row["name"])
+    return names
+
+
+class FacetIndex:
+    """
+    Tag, source and date index over published catalog entries.
+
+    Posting lists are sorted arrays of video ids; dates are day ordinals.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._clear()
+        self._mirror_synced_at = None
+        self._mirror_full_synced_at = None
+
+    def _clear(self):
+        self.postings = {'tags': {}, 'sources': {}}
+        self.labels = {'tags': {}, 'sources': {}}
+        self.video_facets = {}
+        self.video_dates = {}
+        # (day ordinal, id) pairs in order, as two parallel arrays
+        self._date_keys = array('q')
+        self._date_ids = array('q')
+
+    def __len__(self):
+        return len(self.video_dates)
+
+    def add(self, entry: Dict[str, Any]):
+        """Index a catalog entry (replacing what was indexed for it before)"""
+        video_id = entry["id"]
+        with self._lock:
+            if video_id in self.video_dates:
+                self.remove(video_id)
+            facets = {
+                'tags': {name.casefold(): name for name in _names(entry, "video_tags", "tags")},
+                'sources': {name.casefold(): name for name in _names(entry, "video_sources", "sources")},
+            }
+            for facet, values in facets.items():
+                for key, label in values.items():
+                    self.labels[facet].setdefault(key, label)
+                    posting = self.postings[facet].setdefault(key, array('q'))
+                    # Entries mostly arrive in id order, so this is usually an append
+                    if not posting or posting[-1] < video_id:
+                        posting.append(video_id)
+                    else:
+                        posting.insert(bisect_left(posting, video_id), video_id)
+            self.video_facets[video_id] = {facet: tuple(values) for facet, values in facets.items()}
+
+            day = date.fromisoformat(str(entry["date"])[:10]).toordinal()
+            self.video_dates[video_id] = day
+            position = bisect_right(self._date_keys, day)
+            # Same-day entries stay in id order
+            while position > 0 and self._date_keys[position - 1] == day and self._date_ids[position - 1] > video_id:
+                position -= 1
+            self._date_keys.insert(position, day)
+            self._date_ids.insert(position, video_id)
+
+    def remove(self, video_id: int):
+        """Drop a video from the index (no-op if it isn't indexed)"""
+        with self._lock:
+            facets = self.video_facets.pop(video_id, None)
+            day = self.video_dates.pop(video_id, None)
+            if facets is None:
+                return
+            for facet, keys in facets.items():
+                for key in keys:
+                    posting = self.postings[facet][key]
+                    del posting[bisect_left(posting, video_id)]
+                    if not posting:
+                        del self.postings[facet][key]
+                        del self.labels[facet][key]
+            low = bisect_left(self._date_keys, day)
+            high = bisect_right(self._date_keys, day)
+            position = low + list(self._date_ids[low:high]).index(video_id)
+            del self._date_keys[position]
+            del self._date_ids[position]
+
+    def refresh(self, max_staleness: Optional[float] = None):
+        """
+        Catch up with the catalog mirror (syncing it first if it is stale).
+
+        Cheap when the mirror hasn't synced since the last refresh.
+        """
+        catalog_mirror.ensure_fresh(max_staleness)
+        synced_at = catalog_mirror.last_synced_at()
+        if synced_at == self._mirror_synced_at:
+            return
+
+        with self._lock:
+            if synced_at == self._mirror_synced_at:
+                return
+            state = catalog_mirror.get_sync_state()
+            conn = get_db_connection()
+            try:
+                if state["full_synced_at"] != self._mirror_full_synced_at:
+                    # A full sync may have edited or deleted any entry
+                    self._clear()
+                    published = set()
+                else:
+                    published = set(self.video_dates)
+                current = {row["id"] for row in conn.execute("SELECT id FROM catalog_videos WHERE complete = 1")}
+                for video_id in published - current:
+                    self.remove(video_id)
+                added = sorted(current - published)
+                # SQLite limits the number of bound parameters, so read in slices
+                for start in range(0, len(added), 500):
+                    chunk = added[start:start + 500]
+                    rows = conn.execute(
+                        f"SELECT payload FROM catalog_videos WHERE id IN ({','.join('?' * len(chunk))}) ORDER BY id",
+                        chunk
+                    ).fetchall()
+                    for row in rows:
+                        self.add(json.loads(row["payload"]))
+            finally:
+                conn.close()
+            self._mirror_synced_at = synced_at
+            self._mirror_full_synced_at = state["full_synced_at"]
+
+    def query(self, tags: Sequence[str] = (), sources: Sequence[str] = (),
+              since: Optional[date] = None, until: Optional[date] = None,
+              limit: Optional[int] = None, cursor: Optional[str] = None,
+              facet_limit: int = MAX_FACET_VALUES) -> Dict[str, Any]:
+        """
+        Find the videos carrying every given tag and source within a date range.
+
+        Args:
+            tags: Tag names (all must match; case-insensitive)
+            sources: Source names (all must match; case-insensitive)
+            since: First date included
+            until: Last date included
+            limit: Return at most this many ids (the total is still exact)
+            cursor: Start after this keyset cursor (next_cursor of the previous
+                page; same format as database_utils.encode_cursor)
+            facet_limit: Tag/source counts returned per facet, largest first
+
+        Returns:
+            dict: ids (newest first), total, next_cursor (None on the last
+                page), and facets {'tags': {name: count}, 'sources':
+                {name: count}} over all matching videos
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        after = None
+        if cursor is not None:
+            cursor_date, cursor_id = decode_cursor(cursor)
+            after = (date.fromisoformat(cursor_date).toordinal(), cursor_id)
+
+        with self._lock:
+            lists = [
+                self.postings[facet].get(name.casefold(), array('q'))
+                for facet, names in (('tags', tags), ('sources', sources)) for name in names
+            ]
+            filtered = bool(lists) or since is not None or until is not None
+            low = bisect_left(self._date_keys, since.toordinal()) if since else 0
+            high = bisect_right(self._date_keys, until.toordinal()) if until else len(self._date_keys)
+            in_range = high - low < len(self._date_keys)
+
+            if lists:
+                # Smallest list first, so every step stays small; a narrow
+                # date range joins in as one more list
+                if in_range and high - low <= min(len(posting) for posting in lists):
+                    lists.append(array('q', sorted(self._date_ids[low:high])))
+                    in_range = False
+                lists.sort(key=len)
+                result = lists[0]
+                for posting in lists[1:]:
+                    if not result:
+                        break
+                    result = _intersect(result, posting)
+                if in_range:
+                    first_day, last_day = self._date_keys[low], self._date_keys[high - 1]
+                    result = [video_id for video_id in result
+                              if first_day <= self.video_dates[video_id] <= last_day]
+                dates = self.video_dates
+                ids = sorted(result, key=lambda video_id: (dates[video_id], video_id), reverse=True)
+            else:
+                # The date array is in (date, id) order already
+                ids = self._date_ids[low:high].tolist()[::-1]
+
+            if filtered:
+                facets = {
+                    facet: Counter(chain.from_iterable(self.video_facets[video_id][facet] for video_id in ids))
+                    for facet in self.postings
+                }
+            else:
+                # No filter: the counts are the posting list sizes
+                facets = {facet: Counter({key: len(posting) for key, posting in postings.items()})
+                          for facet, postings in self.postings.items()}
+
+            total = len(ids)
+            dates = self.video_dates
+            if after is not None:
+                # ids are in descending (date, id) order; skip up to the cursor
+                start = bisect_left(ids, (-after[0], -after[1]), key=lambda video_id: (-dates[video_id], -video_id))
+                if start < len(ids) and (dates[ids[start]], ids[start]) == after:
+                    start += 1
+                ids = ids[start:]
+            next_cursor = None
+            if limit is not None and len(ids) > limit:
+                ids = ids[:limit]
+                last = ids[-1]
+                next_cursor = encode_cursor({'date': date.fromordinal(dates[last]).isoformat(), 'id': last})
+
+            return {
+                'ids': ids,
+                'total': total,
+                'next_cursor': next_cursor,
+                'facets': {
+                    facet: {self.labels[facet][key]: count for key, count in counts.most_common(facet_limit)}
+                    for facet, counts in facets.items()
+                },
+            }
+
+
+_facet_index = None
+_facet_index_lock = threading.Lock()
+
+
+def get_facet_index(max_staleness: Optional[float] = None) -> FacetIndex:
+    """Return the process-wide index, caught up with the catalog mirror"""
+    global _facet_index
+    with _facet_index_lock:
+        if _facet_index is None:
+            _facet_index = FacetIndex()
+    _facet_index.refresh(max_staleness)
+    return _facet_index
+
+
+def search_archive(tags: Sequence[str] = (), sources: Sequence[str] = (), days: Optional[int] = None,
+                   since: Optional[date] = None, until: Optional[date] = None,
+                   limit: Optional[int] = None, cursor: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Query the process-wide index (see FacetIndex.query).
+
+    Args:
+        days: Only the last this many days, today included (overrides since)
+    """
+    if days is not None:
+        since = date.today() - timedelta(days=days - 1)
+    return get_facet_index().query(tags, sources, since, until, limit, cursor)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Filter the archive by tag, source and date")
+    parser.add_argument('--tags', nargs='*', default=[])
+    parser.add_argument('--sources', nargs='*', default=[])
+    parser.add_argument('--days', type=int, help="Only the last N days")
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--cursor', help="next_cursor of the previous page")
+    args = parser.parse_args()
+
+    index = get_facet_index()
+    start = time.perf_counter()
+    result = search_archive(args.tags, args.sources, days=args.days, limit=args.limit, cursor=args.cursor)
+    elapsed = time.perf_counter() - start
+    print(f"{result['total']} video(s) in {elapsed * 1e6:.0f}us (index of {len(index)})")
+    print(f"ids: {result['ids']}")
+    print(f"next cursor: {result['next_cursor']}")
+    print(json.dumps(result['facets'], indent=2))
+
+
+if __name__ == "__main__":
+    main()
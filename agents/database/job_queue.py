@@ -0,0 +1,438 @@
+import json
+import os
+import socket
+import time
+from datetime import datetime
+from typing import Optional, List, Dict, Any
+
+from video_database import get_db_connection, initialize_database
+from tracing import traced
+
+
+# A claimed job whose lease isn't renewed within this many seconds is
+# considered abandoned (worker crashed) and can be claimed again
+DEFAULT_LEASE_SECONDS = 600
+
+# Failed jobs are re-queued until they have been attempted this many times
+MAX_JOB_ATTEMPTS = 3
+
+# Weight of the newest measurement in the stage cost moving average
+STAGE_COST_SMOOTHING = 0.3
+
+
+def initialize_job_queue():
+    """
+    Creates the 'jobs' and 'job_stages' tables if they don't exist.
+    This function is safe to call multiple times (idempotent).
+    """
+    initialize_database()
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            category TEXT NOT NULL,
+            story_count INTEGER NOT NULL,
+            timestamp TEXT NOT NULL,
+            upload INTEGER NOT NULL DEFAULT 0,
+            status TEXT NOT NULL DEFAULT 'queued',
+            video_id INTEGER,
+            worker_id TEXT,
+            lease_expires_at REAL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, lease_expires_at)
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS job_stages (
+            job_id INTEGER NOT NULL REFERENCES jobs (id) ON DELETE CASCADE,
+            stage TEXT NOT NULL,
+            outputs TEXT NOT NULL,
+            elapsed REAL,
+            completed_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (job_id, stage)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS stage_costs (
+            stage TEXT NOT NULL,
+            variant TEXT NOT NULL,
+            seconds REAL NOT NULL,
+            samples INTEGER NOT NULL DEFAULT 1,
+            updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (stage, variant)
+        )
+    """)
+
+    # Columns added after the first release of the jobs table
+    columns = {row['name'] for row in cursor.execute("PRAGMA table_info(jobs)")}
+    if 'deadline' not in columns:
+        cursor.execute("ALTER TABLE jobs ADD COLUMN deadline REAL")
+
+    conn.commit()
+    conn.close()
+
+
+def default_worker_id() -> str:
+    """
+    Returns an identifier for this worker process (host:pid).
+    """
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue_job(category: str, story_count: int, upload: bool = False,
+                timestamp: Optional[str] = None, deadline: Optional[float] = None) -> int:
+    """
+    Adds an edition job to the queue.
+
+    Args:
+        category: News category for the edition
+        story_count: Number of stories in the edition
+        upload: Whether the worker should upload the finished edition
+        timestamp: Timestamp string used for the job's file names
+            (default: now, format YYYYMMDD_HHMMSS)
+        deadline: Optional publish deadline (epoch seconds); the worker
+            degrades quality as needed to meet it
+
+    Returns:
+        int: The ID of the new job
+    """
+    initialize_job_queue()
+    timestamp = timestamp or datetime.now().strftime("%Y%m%d_%H%M%S")
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO jobs (category, story_count, timestamp, upload, deadline)
+        VALUES (?, ?, ?, ?, ?)
+    """, (category, story_count, timestamp, int(upload), deadline))
+
+    job_id = cursor.lastrowid
+    conn.commit()
+    conn.close()
+
+    return job_id
+
+
+@traced('db.claim_job', kind='db')
+def claim_job(worker_id: Optional[str] = None, lease_seconds: int = DEFAULT_LEASE_SECONDS,
+              max_attempts: int = MAX_JOB_ATTEMPTS) -> Optional[Dict[str, Any]]:
+    """
+    Atomically claims the oldest queued job, or a running job whose lease expired.
+
+    The select and update run in one IMMEDIATE transaction, so two workers
+    can never claim the same job. An expired job that has already been
+    attempted max_attempts times (its workers keep dying) is marked failed
+    instead of being claimed again.
+
+    Args:
+        worker_id: Identifier of the claiming worker (default: host:pid)
+        lease_seconds: How long the claim is valid without a heartbeat
+        max_attempts: Attempts allowed before an abandoned job is given up
+
+    Returns:
+        Dict: The claimed job record, or None if the queue is empty
+    """
+    initialize_job_queue()
+    worker_id = worker_id or default_worker_id()
+    now = time.time()
+
+    conn = get_db_connection()
+    conn.isolation_level = None
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("""
+            UPDATE jobs
+            SET status = 'failed', error = 'Lease expired on the last attempt',
+                worker_id = NULL, lease_expires_at = NULL, updated_at = CURRENT_TIMESTAMP
+            WHERE status = 'running' AND lease_expires_at < ? AND attempts >= ?
+        """, (now, max_attempts))
+        cursor.execute("""
+            SELECT * FROM jobs
+            WHERE status = 'queued'
+               OR (status = 'running' AND lease_expires_at < ? AND attempts < ?)
+            ORDER BY id
+            LIMIT 1
+        """, (now, max_attempts))
+        row = cursor.fetchone()
+        if row is None:
+            cursor.execute("COMMIT")
+            return None
+
+        cursor.execute("""
+            UPDATE jobs
+            SET status = 'running', worker_id = ?, lease_expires_at = ?,
+                attempts = attempts + 1, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, (worker_id, now + lease_seconds, row['id']))
+        cursor.execute("COMMIT")
+    except Exception:
+        cursor.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+    job = dict(row)
+    job.update(status='running', worker_id=worker_id, attempts=job['attempts'] + 1)
+    return job
+
+
+def set_job_story_count(job_id: int, story_count: int) -> bool:
+    """
+    Records the story count a job was planned with (a deadline may reduce it),
+    so a resumed attempt builds on the same count as its checkpoints.
+
+    Args:
+        job_id: ID of the job
+        story_count: Planned number of stories
+
+    Returns:
+        bool: True if update was successful, False otherwise
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        UPDATE jobs SET story_count = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?
+    """, (story_count, job_id))
+
+    success = cursor.rowcount > 0
+    conn.commit()
+    conn.close()
+
+    return success
+
+
+def renew_lease(job_id: int, worker_id: str, lease_seconds: int = DEFAULT_LEASE_SECONDS) -> bool:
+    """
+    Extends a running job's lease (worker heartbeat).
+
+    Args:
+        job_id: ID of the job
+        worker_id: Worker holding the job
+        lease_seconds: New lease length from now
+
+    Returns:
+        bool: False if the job is no longer held by this worker
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        UPDATE jobs
+        SET lease_expires_at = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE id = ? AND worker_id = ? AND status = 'running'
+    """, (time.time() + lease_seconds, job_id, worker_id))
+
+    success = cursor.rowcount > 0
+    conn.commit()
+    conn.close()
+
+    return success
+
+
+@traced('db.record_stage_complete', kind='db')
+def record_stage_complete(job_id: int, stage: str, outputs: Dict[str, Any],
+                          elapsed: Optional[float] = None):
+    """
+    Checkpoints a finished stage and its outputs (artifact paths, ids, ...).
+
+    Args:
+        job_id: ID of the job
+        stage: Stage name
+        outputs: JSON-serializable stage outputs
+        elapsed: Stage run time in seconds
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT OR REPLACE INTO job_stages (job_id, stage, outputs, elapsed)
+        VALUES (?, ?, ?, ?)
+    """, (job_id, stage, json.dumps(outputs), elapsed))
+
+    if 'video_id' in outputs:
+        cursor.execute("UPDATE jobs SET video_id = ? WHERE id = ?", (outputs['video_id'], job_id))
+
+    conn.commit()
+    conn.close()
+
+
+def get_completed_stages(job_id: int) -> Dict[str, Dict[str, Any]]:
+    """
+    Retrieves the checkpointed stages of a job.
+
+    Args:
+        job_id: ID of the job
+
+    Returns:
+        Dict: Stage name -> outputs
+    """
+    initialize_job_queue()
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT stage, outputs FROM job_stages WHERE job_id = ?", (job_id,))
+    rows = cursor.fetchall()
+    conn.close()
+
+    return {row['stage']: json.loads(row['outputs']) for row in rows}
+
+
+def complete_job(job_id: int, worker_id: str) -> bool:
+    """
+    Marks a job as completed.
+
+    Args:
+        job_id: ID of the job
+        worker_id: Worker holding the job
+
+    Returns:
+        bool: False if the job is no longer held by this worker
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        UPDATE jobs
+        SET status = 'completed', lease_expires_at = NULL, error = NULL,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE id = ? AND worker_id = ?
+    """, (job_id, worker_id))
+
+    success = cursor.rowcount > 0
+    conn.commit()
+    conn.close()
+
+    return success
+
+
+def fail_job(job_id: int, error: str, worker_id: str,
+             max_attempts: int = MAX_JOB_ATTEMPTS) -> Optional[str]:
+    """
+    Records a failed attempt. The job is re-queued (keeping its checkpoints)
+    until it has been attempted max_attempts times, then marked failed.
+
+    Args:
+        job_id: ID of the job
+        error: Error message
+        worker_id: Worker holding the job
+        max_attempts: Attempts allowed before giving up
+
+    Returns:
+        str: The job's new status ('queued' or 'failed'), or None if the job
+            is no longer held by this worker (left untouched)
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        UPDATE jobs
+        SET status = CASE WHEN attempts < ? THEN 'queued' ELSE 'failed' END,
+            error = ?, worker_id = NULL, lease_expires_at = NULL,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE id = ? AND worker_id = ?
+    """, (max_attempts, error, job_id, worker_id))
+    held = cursor.rowcount > 0
+    cursor.execute("SELECT status FROM jobs WHERE id = ?", (job_id,))
+    row = cursor.fetchone()
+
+    conn.commit()
+    conn.close()
+
+    if not held:
+        return None
+    return row['status'] if row else 'failed'
+
+
+def get_jobs_by_status(status: str) -> List[Dict[str, Any]]:
+    """
+    Retrieves all jobs with a specific status.
+
+    Args:
+        status: Status to filter by (e.g. "queued", "running", "completed", "failed")
+
+    Returns:
+        List[Dict]: List of job records as dictionaries
+    """
+    initialize_job_queue()
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM jobs WHERE status = ? ORDER BY id", (status,))
+    rows = cursor.fetchall()
+    conn.close()
+
+    return [dict(row) for row in rows]
+
+
+def get_job(job_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Retrieves a single job record by ID.
+
+    Args:
+        job_id: ID of the job to retrieve
+
+    Returns:
+        Dict: Job record as dictionary, or None if not found
+    """
+    initialize_job_queue()
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+    row = cursor.fetchone()
+    conn.close()
+
+    return dict(row) if row else None
+
+
+def record_stage_cost(stage: str, variant: str, seconds: float,
+                      smoothing: float = STAGE_COST_SMOOTHING):
+    """
+    Folds a measured stage cost into the stage's moving average.
+
+    Args:
+        stage: Stage name
+        variant: Quality variant the stage ran with (e.g. x264 preset)
+        seconds: Measured cost (per story for per-story stages)
+        smoothing: Weight of this measurement in the moving average
+    """
+    initialize_job_queue()
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO stage_costs (stage, variant, seconds) VALUES (?, ?, ?)
+        ON CONFLICT (stage, variant) DO UPDATE SET
+            seconds = seconds * (1 - ?) + excluded.seconds * ?,
+            samples = samples + 1,
+            updated_at = CURRENT_TIMESTAMP
+    """, (stage, variant, seconds, smoothing, smoothing))
+
+    conn.commit()
+    conn.close()
+
+
+def get_stage_costs() -> Dict[str, Dict[str, float]]:
+    """
+    Retrieves the measured stage costs.
+
+    Returns:
+        Dict: Stage name -> variant -> seconds
+    """
+    initialize_job_queue()
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT stage, variant, seconds FROM stage_costs")
+    rows = cursor.fetchall()
+    conn.close()
+
+    costs = {}
+    for row in rows:
+        costs.setdefault(row['stage'], {})[row['variant']] = row['seconds']
+    return costs
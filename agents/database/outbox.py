@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Write-behind sync of the local videos table to Supabase.
+
+video_database.py records every insert, update and delete of a local
+'videos' row in the 'outbox' table of news_videos.db (with SQLite triggers,
+so the change and its outbox entry commit together). Nothing in the pipeline
+waits for Supabase: an OutboxFlusher thread ships the entries in the
+background, and entries written while Supabase is unreachable or not
+configured are shipped once it is.
+
+A flush takes the oldest pending entries (up to OUTBOX_BATCH_SIZE), keeps
+the newest change per row, and sends all of them in one upsert (plus one
+delete for removed rows) to the Supabase table pipeline_videos
+(database_utils.PIPELINE_VIDEOS_TABLE), keyed by (origin, local_id). Each
+row carries the idempotency key of the change it reflects (change_key), so
+a flush that is retried after a timeout writes the same values again
+instead of duplicating anything. On failure the batch is
+retried with exponential backoff; entries are always shipped oldest first,
+so an older snapshot never overwrites a newer one.
+
+Remote table (Supabase SQL):
+    create table pipeline_videos (
+        origin text not null, local_id bigint not null,
+        timestamp text, script_path text, audio_path text, video_path text,
+        headline text, summary text, source text, duration double precision,
+        status text, created_at text, change_key text not null,
+        primary key (origin, local_id)
+    );
+
+Usage:
+    python outbox.py flush      # ship everything pending now
+    python outbox.py status
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Dict, Any
+
+sys.path.append(str(Path(__file__).parent))
+import database_utils
+from video_database import get_db_connection, initialize_database
+
+sys.path.append(str(Path(__file__).parent.parent / 'common'))
+from tracing import traced
+from resilience import backoff_delay
+
+
+# Identifies this machine's news_videos.db in the remote table
+OUTBOX_ORIGIN = os.getenv("OUTBOX_ORIGIN", socket.gethostname())
+
+# Entries shipped per flush
+OUTBOX_BATCH_SIZE = 200
+
+# Seconds between background flushes
+OUTBOX_FLUSH_SECONDS = float(os.getenv("OUTBOX_FLUSH_SECONDS", 5))
+
+# Backoff between failed flushes (seconds)
+OUTBOX_RETRY_BASE_DELAY = 2.0
+OUTBOX_RETRY_MAX_DELAY = 300.0
+
+# Shipped entries are kept this long for inspection
+OUTBOX_RETENTION_DAYS = 7
+
+_flush_lock = threading.Lock()
+_initialized = False
+
+
+def _initialize():
+    # initialize_database creates the outbox; once per process is enough for a poller
+    global _initialized
+    if not _initialized:
+        initialize_database()
+        _initialized = True
+
+
+def _mark_failed(conn, entry_ids, attempts: int, error: str) -> float:
+    delay = backoff_delay(attempts, OUTBOX_RETRY_BASE_DELAY, OUTBOX_RETRY_MAX_DELAY)
+    with conn:
+        conn.execute(f"""
+            UPDATE outbox SET attempts = attempts + 1, next_attempt_at = ?, last_error = ?
+            WHERE id IN ({','.join('?' * len(entry_ids))})
+        """, [time.time() + delay, error] + entry_ids)
+    return delay
+
+
+@traced('outbox.flush', kind='http')
+def flush_outbox(batch_size: int = OUTBOX_BATCH_SIZE) -> Dict[str, Any]:
+    """
+    Ships the oldest pending outbox entries to Supabase in one batch.
+
+    Returns:
+        dict: sent (entries), rows (remote rows written or deleted), pending
+            (entries left), plus retry_in (seconds) while backing off and
+            error when this batch failed
+
+    Raises:
+        ValueError: If Supabase credentials are not configured
+    """
+    _initialize()
+
+    with _flush_lock:
+        conn = get_db_connection()
+        try:
+            entries = conn.execute(
+                "SELECT * FROM outbox WHERE sent_at IS NULL ORDER BY id LIMIT ?", (batch_size,)
+            ).fetchall()
+            if not entries:
+                return {'sent': 0, 'rows': 0, 'pending': 0}
+            # The whole queue waits behind its oldest entry, which keeps changes in order
+            if entries[0]["next_attempt_at"] > time.time():
+                return {'sent': 0, 'rows': 0, 'pending': _pending_count(conn),
+                        'retry_in': round(entries[0]["next_attempt_at"] - time.time(), 1)}
+
+            # Only the newest change of each row needs to be shipped
+            latest = {}
+            for entry in entries:
+                latest[(entry["entity"], entry["entity_id"])] = entry
+            upserts = [
+                dict(json.loads(entry["payload"]), origin=OUTBOX_ORIGIN, local_id=entry["entity_id"],
+                     change_key=entry["idempotency_key"])
+                for entry in latest.values() if entry["op"] == "upsert"
+            ]
+            deletes = [entry["entity_id"] for entry in latest.values() if entry["op"] == "delete"]
+            entry_ids = [entry["id"] for entry in entries]
+
+            # Fails with ValueError before any entry is touched when Supabase isn't configured
+            database_utils.get_supabase_client()
+            try:
+                if upserts:
+                    database_utils.upsert_pipeline_videos(upserts)
+                if deletes:
+                    database_utils.delete_pipeline_videos(OUTBOX_ORIGIN, deletes)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                delay = _mark_failed(conn, entry_ids, entries[0]["attempts"], error)
+                return {'sent': 0, 'rows': 0, 'pending': _pending_count(conn),
+                        'error': error, 'retry_in': round(delay, 1)}
+
+            with conn:
+                conn.execute(f"""
+                    UPDATE outbox SET sent_at = CURRENT_TIMESTAMP, last_error = NULL
+                    WHERE id IN ({','.join('?' * len(entry_ids))})
+                """, entry_ids)
+                conn.execute("DELETE FROM outbox WHERE sent_at < datetime('now', ?)",
+                             (f"-{OUTBOX_RETENTION_DAYS} days",))
+            return {'sent': len(entries), 'rows': len(latest), 'pending': _pending_count(conn)}
+        finally:
+            conn.close()
+
+
+def _pending_count(conn) -> int:
+    return conn.execute("SELECT COUNT(*) FROM outbox WHERE sent_at IS NULL").fetchone()[0]
+
+
+def drain_outbox(batch_size: int = OUTBOX_BATCH_SIZE) -> Dict[str, Any]:
+    """
+    Flushes batch after batch until the outbox is empty or a batch fails.
+
+    Returns:
+        dict: Totals of sent entries and rows, plus the last flush's pending,
+            error and retry_in
+    """
+    totals = {'sent': 0, 'rows': 0}
+    while True:
+        result = flush_outbox(batch_size)
+        totals['sent'] += result['sent']
+        totals['rows'] += result['rows']
+        if not result['sent'] or not result['pending']:
+            return dict(result, **totals)
+
+
+def get_outbox_status() -> Dict[str, Any]:
+    """
+    Returns:
+        dict: pending entries, oldest pending entry's age, attempts and last
+            error, and the number of shipped entries still kept
+    """
+    _initialize()
+
+    conn = get_db_connection()
+    oldest = conn.execute("""
+        SELECT created_at, attempts, last_error, next_attempt_at,
+               (julianday('now') - julianday(created_at)) * 86400 AS age_seconds
+        FROM outbox WHERE sent_at IS NULL ORDER BY id LIMIT 1
+    """).fetchone()
+    pending = _pending_count(conn)
+    sent = conn.execute("SELECT COUNT(*) FROM outbox WHERE sent_at IS NOT NULL").fetchone()[0]
+    conn.close()
+
+    return {
+        'pending': pending,
+        'oldest_pending_seconds': round(oldest["age_seconds"], 1) if oldest else None,
+        'attempts': oldest["attempts"] if oldest else 0,
+        'last_error': oldest["last_error"] if oldest else None,
+        'retry_in': round(max(oldest["next_attempt_at"] - time.time(), 0), 1) if oldest else None,
+        'sent_kept': sent,
+        'origin': OUTBOX_ORIGIN,
+        'remote_table': database_utils.PIPELINE_VIDEOS_TABLE,
+    }
+
+
+class OutboxFlusher:
+    """
+    Background thread that drains the outbox every interval seconds.
+
+    stop() makes one last bounded attempt so a short CLI run still ships its
+    rows; whatever is left is shipped by the next run.
+
+    Args:
+        interval: Seconds between flushes
+        batch_size: Entries per flush
+    """
+
+    def __init__(self, interval: float = OUTBOX_FLUSH_SECONDS, batch_size: int = OUTBOX_BATCH_SIZE):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.last_result = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self) -> 'OutboxFlusher':
+        self._thread = threading.Thread(target=self._run, name='outbox-flusher', daemon=True)
+        self._thread.start()
+        return self
+
+    def wake(self):
+        """Flush now instead of at the next interval"""
+        self._wake.set()
+
+    def stop(self, timeout: Optional[float] = 10.0):
+        """Stop after one last flush, waiting at most timeout seconds for it"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            try:
+                self.last_result = drain_outbox(self.batch_size)
+                if self.last_result.get('error'):
+                    print(f"Outbox flush failed ({self.last_result['pending']} pending, "
+                          f"retry in {self.last_result['retry_in']}s): {self.last_result['error']}")
+            except ValueError as e:
+                # No Supabase configured: entries stay queued until it is
+                print(f"Outbox flusher disabled: {e}")
+                return
+            except Exception as e:
+                print(f"Outbox flush error: {type(e).__name__}: {e}")
+            if self._stop.is_set():
+                return
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ship local video records to Supabase")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('flush', help="Ship every pending outbox entry now")
+    commands.add_parser('status', help="Show pending entries and the last error")
+    args = parser.parse_args()
+
+    if args.command == 'flush':
+        result = drain_outbox()
+        print(f"Shipped {result['sent']} change(s) as {result['rows']} row(s); {result['pending']} pending")
+        if result.get('error'):
+            sys.exit(f"Flush failed: {result['error']}")
+    else:
+        print(json.dumps(get_outbox_status(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+from datetime import datetime
+from typing import Optional, List, Dict, Any
+
+from video_database import get_db_connection, initialize_database
+
+
+def _format_time(epoch_seconds: float) -> str:
+    return datetime.fromtimestamp(epoch_seconds).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def initialize_schedule_runs():
+    """
+    Creates the 'schedule_runs' table if it doesn't exist.
+    This function is safe to call multiple times (idempotent).
+    """
+    initialize_database()
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schedule_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            category TEXT NOT NULL,
+            scheduled_for TEXT NOT NULL,
+            started_at TEXT,
+            finished_at TEXT,
+            lag_seconds REAL,
+            duration_seconds REAL,
+            interval_seconds REAL,
+            status TEXT NOT NULL,
+            job_id INTEGER,
+            error TEXT
+        )
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_schedule_runs_category ON schedule_runs (category, scheduled_for)
+    """)
+
+    conn.commit()
+    conn.close()
+
+
+def start_schedule_run(category: str, scheduled_for: float, started_at: float,
+                       interval_seconds: float, job_id: Optional[int] = None) -> int:
+    """
+    Records a scheduled edition that was started.
+
+    Args:
+        category: News category of the edition
+        scheduled_for: Planned start time (epoch seconds, including jitter)
+        started_at: Actual start time (epoch seconds)
+        interval_seconds: The category's schedule interval
+        job_id: Queue job ID when the run was enqueued rather than run in-process
+
+    Returns:
+        int: The ID of the new schedule run
+    """
+    initialize_schedule_runs()
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO schedule_runs (
+            category, scheduled_for, started_at, lag_seconds, interval_seconds, status, job_id
+        ) VALUES (?, ?, ?, ?, ?, 'running', ?)
+    """, (
+        category, _format_time(scheduled_for), _format_time(started_at),
+        round(started_at - scheduled_for, 3), interval_seconds, job_id
+    ))
+
+    run_id = cursor.lastrowid
+    conn.commit()
+    conn.close()
+
+    return run_id
+
+
+def finish_schedule_run(run_id: int, status: str, duration_seconds: float,
+                        error: Optional[str] = None) -> bool:
+    """
+    Records the outcome of a started schedule run.
+
+    Args:
+        run_id: ID from start_schedule_run
+        status: "completed" or "failed"
+        duration_seconds: Wall time from start to finish
+        error: Optional error message
+
+    Returns:
+        bool: True if update was successful, False otherwise
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        UPDATE schedule_runs
+        SET status = ?, finished_at = ?, duration_seconds = ?, error = ?
+        WHERE id = ?
+    """, (status, _format_time(datetime.now().timestamp()), round(duration_seconds, 3), error, run_id))
+
+    success = cursor.rowcount > 0
+    conn.commit()
+    conn.close()
+
+    return success
+
+
+def record_coalesced_run(category: str, scheduled_for: float, interval_seconds: float) -> int:
+    """
+    Records a trigger that was skipped because the previous run was still in flight.
+
+    Args:
+        category: News category of the edition
+        scheduled_for: Planned start time of the skipped trigger (epoch seconds)
+        interval_seconds: The category's schedule interval
+
+    Returns:
+        int: The ID of the new schedule run
+    """
+    initialize_schedule_runs()
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO schedule_runs (category, scheduled_for, interval_seconds, status)
+        VALUES (?, ?, ?, 'coalesced')
+    """, (category, _format_time(scheduled_for), interval_seconds))
+
+    run_id = cursor.lastrowid
+    conn.commit()
+    conn.close()
+
+    return run_id
+
+
+def get_schedule_stats(category: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Summarizes schedule lag and run duration per category.
+
+    Args:
+        category: Optional category to filter by
+
+    Returns:
+        List[Dict]: One row per category with run/coalesced/failed counts,
+            average and maximum lag and duration, the interval, and the
+            number of runs that took longer than their interval
+    """
+    initialize_schedule_runs()
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT
+            category,
+            SUM(status != 'coalesced') AS runs,
+            SUM(status = 'coalesced') AS coalesced,
+            SUM(status = 'failed') AS failed,
+            AVG(lag_seconds) AS avg_lag_seconds,
+            MAX(lag_seconds) AS max_lag_seconds,
+            AVG(duration_seconds) AS avg_duration_seconds,
+            MAX(duration_seconds) AS max_duration_seconds,
+            MAX(interval_seconds) AS interval_seconds,
+            SUM(duration_seconds > interval_seconds) AS overruns
+        FROM schedule_runs
+        WHERE ? IS NULL OR category = ?
+        GROUP BY category
+        ORDER BY category
+    """, (category, category))
+
+    rows = cursor.fetchall()
+    conn.close()
+
+    return [dict(row) for row in rows]
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Supabase REST API (PostgREST), serving a synthetic
+videos catalog, for trying catalog_mirror.py and the archive pages without a
+Supabase project.
+
+Only reads of the 'videos' table are served, with the part of the PostgREST
+query syntax database_utils uses: select (top-level columns and embedded
+relations), the eq/neq/gt/gte/lt/lte/in/is filters, or=(...) with nested
+and(...), order, limit and offset. Every entry carries its original_titles,
+video_sources(sources(*)) and video_tags(tags(*)) as Supabase embeds them.
+
+--latency and --error-rate make requests slow or fail (HTTP 503), to watch
+the mirror keep serving its copy while "Supabase" is down.
+
+Usage:
+    python supabase_standin.py --videos 5000 --port 54321
+    SUPABASE_URL=http://127.0.0.1:54321 SUPABASE_KEY=<printed key> python catalog_mirror.py sync
+"""
+
+import argparse
+import json
+import random
+import re
+import time
+from datetime import date, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import List, Dict, Any, Callable, Tuple
+from urllib.parse import urlsplit, parse_qsl
+
+
+# supabase-py checks that the key looks like a JWT; the stand-in ignores it
+STANDIN_KEY = "standin.eyJyb2xlIjoiYW5vbiJ9.standin"
+
+TAGS = ["technology", "science", "business", "politics", "health", "sports",
+        "climate", "ai", "space", "economy", "security", "culture"]
+SOURCES = ["Reuters", "AP News", "BBC", "The Verge", "Ars Technica", "Bloomberg",
+           "The Guardian", "Wired", "NPR", "Al Jazeera"]
+
+_OPERATORS = {
+    'eq': lambda a, b: a == b,
+    'neq': lambda a, b: a != b,
+    'gt': lambda a, b: a > b,
+    'gte': lambda a, b: a >= b,
+    'lt': lambda a, b: a < b,
+    'lte': lambda a, b: a <= b,
+}
+
+
+def generate_catalog(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    Builds count catalog entries (about two editions a day, newest today).
+
+    Returns:
+        List[Dict]: Entries shaped like a `select=*, original_titles(*),
+            video_sources(sources(*)), video_tags(tags(*))` response
+    """
+    rng = random.Random(seed)
+    sources = {name: {"id": i + 1, "name": name, "base_url": f"https://{name.lower().replace(' ', '')}.example"}
+               for i, name in enumerate(SOURCES)}
+    tags = {name: {"id": i + 1, "name": name} for i, name in enumerate(TAGS)}
+    first_day = date.today() - timedelta(days=count // 2)
+
+    entries = []
+    for video_id in range(1, count + 1):
+        day = first_day + timedelta(days=(video_id - 1) // 2)
+        entries.append({
+            "id": video_id,
+            "date": day.isoformat(),
+            "summarized_title": f"Edition {video_id}",
+            "summary": f"Synthetic edition {video_id} of {day.isoformat()}.",
+            "video_url": f"https://standin.example/videos/{video_id}.mp4",
+            "thumbnail_url": f"https://standin.example/thumbnails/{video_id}.png",
+            "created_at": f"{day.isoformat()}T12:00:00+00:00",
+            "original_titles": [
+                {"id": video_id * 10 + position, "video_id": video_id,
+                 "title": f"Story {position} of edition {video_id}", "position": position}
+                for position in range(1, 4)
+            ],
+            "video_sources": [{"sources": sources[name]} for name in rng.sample(SOURCES, 2)],
+            "video_tags": [{"tags": tags[name]} for name in rng.sample(TAGS, 3)],
+        })
+    return entries
+
+
+def _split_top_level(text: str) -> List[str]:
+    # Split on commas outside parentheses
+    parts, depth, current = [], 0, ''
+    for ch in text:
+        if ch == ',' and depth == 0:
+            parts.append(current)
+            current = ''
+            continue
+        depth += (ch == '(') - (ch == ')')
+        current += ch
+    if current:
+        parts.append(current)
+    return parts
+
+
+def _coerce(value: str, like: Any) -> Any:
+    if isinstance(like, bool):
+        return value == 'true'
+    if isinstance(like, int):
+        return int(value)
+    if isinstance(like, float):
+        return float(value)
+    return value
+
+
+def _condition(column: str, expression: str) -> Callable[[Dict[str, Any]], bool]:
+    """Predicate for one `column=op.value` filter"""
+    op, _, value = expression.partition('.')
+    if op == 'in':
+        values = [item.strip('"') for item in _unwrap(value).split(',') if item]
+        return lambda row: row.get(column) is not None and row[column] in [_coerce(v, row[column]) for v in values]
+    if op == 'is':
+        return lambda row: row.get(column) is None if value == 'null' else row.get(column) == (value == 'true')
+    if op not in _OPERATORS:
+        raise ValueError(f"Unsupported operator: {op}")
+    compare = _OPERATORS[op]
+    return lambda row: row.get(column) is not None and compare(row[column], _coerce(value, row[column]))
+
+
+def _logical(expression: str, combine) -> Callable[[Dict[str, Any]], bool]:
+    """Predicate for the body of or=(...) / and(...)"""
+    predicates = []
+    for part in _split_top_level(expression):
+        nested = re.match(r"^(and|or)\((.*)\)$", part)
+        if nested:
+            predicates.append(_logical(nested.group(2), all if nested.group(1) == 'and' else any))
+        else:
+            column, _, rest = part.partition('.')
+            predicates.append(_condition(column, rest))
+    return lambda row: combine(predicate(row) for predicate in predicates)
+
+
+def _unwrap(value: str) -> str:
+    # Drop one pair of enclosing parentheses (strip() would eat nested ones)
+    if value.startswith('(') and value.endswith(')'):
+        return value[1:-1]
+    raise ValueError(f"Expected a parenthesised list: {value}")
+
+
+def _project(entry: Dict[str, Any], select: List[str]) -> Dict[str, Any]:
+    row = {}
+    for item in select:
+        name = item.split('(', 1)[0]
+        if name == '*':
+            row.update({key: value for key, value in entry.items() if not isinstance(value, list)})
+        elif name in entry:
+            row[name] = entry[name]
+        else:
+            raise ValueError(f"Unknown column or relation: {name}")
+    return row
+
+
+def query_videos(catalog: List[Dict[str, Any]], params: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+    """
+    Answers a PostgREST query string (as parsed key/value pairs) over the catalog.
+
+    Raises:
+        ValueError: On syntax the stand-in doesn't support
+    """
+    select, orders, limit, offset, predicates = ['*'], [], None, 0, []
+    for key, value in params:
+        if key == 'select':
+            select = _split_top_level(re.sub(r"\s+", "", value))
+        elif key == 'order':
+            for item in value.split(','):
+                column, *modifiers = item.split('.')
+                orders.append((column, 'desc' in modifiers))
+        elif key == 'limit':
+            limit = int(value)
+        elif key == 'offset':
+            offset = int(value)
+        elif key == 'or':
+            predicates.append(_logical(_unwrap(value), any))
+        elif key == 'and':
+            predicates.append(_logical(_unwrap(value), all))
+        else:
+            predicates.append(_condition(key, value))
+
+    rows = [entry for entry in catalog if all(predicate(entry) for predicate in predicates)]
+    for column, descending in reversed(orders):
+        rows.sort(key=lambda entry: entry[column], reverse=descending)
+    rows = rows[offset:offset + limit if limit is not None else None]
+    return [_project(entry, select) for entry in rows]
+
+
+def make_handler(catalog: List[Dict[str, Any]], latency: float = 0.0, error_rate: float = 0.0):
+    """Request handler class serving GET /rest/v1/videos over catalog"""
+
+    class StandinHandler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            if latency:
+                time.sleep(latency)
+            if error_rate and random.random() < error_rate:
+                return self._send(503, {"message": "Stand-in outage"})
+            if url.path.rstrip('/') != '/rest/v1/videos':
+                return self._send(404, {"message": f"Not served by the stand-in: {url.path}"})
+            try:
+                rows = query_videos(catalog, parse_qsl(url.query, keep_blank_values=True))
+            except ValueError as e:
+                return self._send(400, {"message": str(e)})
+            self._send(200, rows)
+
+        def _send(self, status: int, body):
+            payload = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StandinHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a synthetic videos catalog over the Supabase REST API")
+    parser.add_argument('--videos', type=int, default=1000, help="Catalog size")
+    parser.add_argument('--port', type=int, default=54321)
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every request")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests failing with 503")
+    args = parser.parse_args()
+
+    catalog = generate_catalog(args.videos)
+    server = ThreadingHTTPServer(('127.0.0.1', args.port),
+                                 make_handler(catalog, args.latency, args.error_rate))
+    print(f"Serving {len(catalog)} videos at http://127.0.0.1:{args.port}/rest/v1/videos")
+    print(f"SUPABASE_URL=http://127.0.0.1:{args.port} SUPABASE_KEY={STANDIN_KEY}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
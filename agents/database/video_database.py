@@ -1,9 +1,13 @@
 import sqlite3
 import os
+import sys
 from datetime import datetime
 from pathlib import Path
 from typing import Optional, List, Dict, Any
 
+sys.path.append(str(Path(__file__).parent.parent / 'common'))
+from tracing import traced
+
 
 def get_db_path() -> Path:
     """
@@ -39,6 +43,15 @@ def get_db_connection():
     return conn
 
 
+# Snapshot of a 'videos' row as the outbox ships it ({row} is NEW or the table name)
+_OUTBOX_PAYLOAD = """json_object(
+    'timestamp', {row}.timestamp, 'script_path', {row}.script_path, 'audio_path', {row}.audio_path,
+    'video_path', {row}.video_path, 'headline', {row}.headline, 'summary', {row}.summary,
+    'source', {row}.source, 'duration', {row}.duration, 'status', {row}.status,
+    'created_at', {row}.created_at
+)"""
+
+
 def initialize_database():
     """
     Initializes the database and creates the 'videos' table if it doesn't exist.
@@ -67,12 +80,57 @@ def initialize_database():
             created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
         )
     """)
-    
+
+    # Every change to 'videos' is captured in the outbox by triggers, in the
+    # same transaction as the change itself; outbox.py ships it to Supabase
+    outbox_existed = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'outbox'"
+    ).fetchone()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            idempotency_key TEXT NOT NULL UNIQUE DEFAULT (lower(hex(randomblob(16)))),
+            entity TEXT NOT NULL,
+            entity_id INTEGER NOT NULL,
+            op TEXT NOT NULL,
+            payload TEXT,
+            created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL DEFAULT 0,
+            last_error TEXT,
+            sent_at TEXT
+        )
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_outbox_pending ON outbox (sent_at, id)
+    """)
+    for event in ('INSERT', 'UPDATE'):
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS videos_outbox_{event.lower()} AFTER {event} ON videos
+            BEGIN
+                INSERT INTO outbox (entity, entity_id, op, payload)
+                VALUES ('videos', NEW.id, 'upsert', {_OUTBOX_PAYLOAD.format(row='NEW')});
+            END
+        """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS videos_outbox_delete AFTER DELETE ON videos
+        BEGIN
+            INSERT INTO outbox (entity, entity_id, op) VALUES ('videos', OLD.id, 'delete');
+        END
+    """)
+    if not outbox_existed:
+        # Rows written before the outbox existed are shipped once as well
+        cursor.execute(f"""
+            INSERT INTO outbox (entity, entity_id, op, payload)
+            SELECT 'videos', id, 'upsert', {_OUTBOX_PAYLOAD.format(row='videos')} FROM videos ORDER BY id
+        """)
+
     conn.commit()
     conn.close()
     print(f"Database initialized at: {db_path}")
 
 
+@traced('db.insert_video_record', kind='db')
 def insert_video_record(
     timestamp: str,
     script_path: str,
@@ -155,7 +213,7 @@ def get_videos_by_status(status: str) -> List[Dict[str, Any]]:
     Retrieves videos filtered by status.
     
     Args:
-        status: Status to filter by (e.g., 'processing', 'completed', 'failed')
+        status: Status to filter by (e.g., 'processing', 'rendered', 'completed', 'failed')
     
     Returns:
         List[Dict]: List of matching video records
@@ -236,6 +294,7 @@ def get_videos_by_headline(headline_search: str) -> List[Dict[str, Any]]:
     return [dict(row) for row in rows]
 
 
+@traced('db.update_video_status', kind='db')
 def update_video_status(video_id: int, status: str) -> bool:
     """
     Updates the status of a video record.
@@ -265,6 +324,7 @@ def update_video_status(video_id: int, status: str) -> bool:
     return success
 
 
+@traced('db.update_video_path', kind='db')
 def update_video_path(video_id: int, video_path: str) -> bool:
     """
     Updates the video_path of a video record.
@@ -1,8 +1,14 @@
-import requests
 import json
+import sys
 from datetime import datetime
 from dotenv import load_dotenv
 import os
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / 'common'))
+from clients import get_http_session
+from tracing import span
+from resilience import call_external
 
 def fetch_news(count, category="general"):
 
@@ -11,8 +17,20 @@ def fetch_news(count, category="general"):
 
     url = f"https://newsapi.org/v2/top-headlines?country=us&category={category}&pageSize=10&apiKey={API_KEY}"
 
-    response = requests.get(url)
-    data = response.json()
+    def request(timeout):
+        with span('newsapi.top_headlines', kind='http', category=category) as attributes:
+            response = get_http_session().get(url, timeout=timeout)
+            attributes['status_code'] = response.status_code
+            response.raise_for_status()
+            return response.json()
+
+    try:
+        data = call_external('newsapi', request)
+    except Exception as e:
+        return json.dumps({"error": f"NewsAPI request failed: {e}"})
+
+    if data.get('status') != 'ok' or not isinstance(data.get('articles'), list):
+        return json.dumps({"error": f"NewsAPI error: {data.get('message') or data.get('code') or 'no articles in response'}"})
 
     today = datetime.now().strftime("%Y-%m-%d")
 
@@ -27,9 +45,9 @@ def fetch_news(count, category="general"):
         story = {
             "headline": article['title'],
             "summary": article['description'],
-            "source": article['source']['name'],
-            "url": article['url'],
-            "image": article['urlToImage']
+            "source": (article.get('source') or {}).get('name'),
+            "url": article.get('url'),
+            "image": article.get('urlToImage')
         }
         structured_output['stories'].append(story)
 
@@ -3,22 +3,24 @@ from fetch_news import fetch_news
 from llm import summarize_story
 
 
-def generate_news_script(story_count=1, return_metadata=False):
+CATEGORIES = ["business", "entertainment", "general", "health", "science", "sports", "technology"]
+
+
+def generate_news_script(story_count=1, return_metadata=False, category="technology"):
     """
     Fetches news stories and generates a summarized script.
     
     Args:
         story_count (int): Number of news stories to fetch. Default is 1.
         return_metadata (bool): If True, returns dict with script and metadata. Default is False.
+        category (str): NewsAPI category to fetch (one of CATEGORIES). Default is "technology".
     
     Returns:
         str or dict: 
             - If return_metadata=False: The generated news script string
             - If return_metadata=True: Dict with 'script' and 'story_metadata' keys
     """
-    categories = ["business", "entertainment", "general", "health", "science", "sports", "technology"]
-
-    stories_json = fetch_news(story_count, categories[6])
+    stories_json = fetch_news(story_count, category)
     
     # Check if fetch_news returned an error
     try:
@@ -1,15 +1,14 @@
-import requests
 import json
 from datetime import datetime
-from openai import OpenAI
-from dotenv import load_dotenv
-import os
+import sys
 from pathlib import Path
 
-def summarize_story(story):
+sys.path.append(str(Path(__file__).parent.parent / 'common'))
+from clients import get_openai_client
+from tracing import span
+from resilience import call_external
 
-    load_dotenv()
-    OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+def summarize_story(story):
 
     if isinstance(story, str):
         story = json.loads(story)
@@ -21,7 +20,7 @@ def summarize_story(story):
     with open(prompt_path, "r", encoding="utf-8") as f:
         system_prompt = f.read()
 
-    client = OpenAI(api_key=OPENAI_API_KEY)
+    client = get_openai_client()
 
     stories = story['stories'][:3]
     original_titles = [s['headline'] for s in stories]
@@ -37,13 +36,21 @@ def summarize_story(story):
     today = datetime.now().strftime("%Y-%m-%d")
     user_content += f"\nToday's date is: {today}"
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_content}],
-        response_format={"type": "json_object"}
-    )
+    def request(timeout):
+        # Retries happen in call_external, so the SDK's own retries are turned off
+        with span('openai.chat', kind='http', model="gpt-4o-mini") as attributes:
+            response = client.with_options(timeout=timeout, max_retries=0).chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_content}],
+                response_format={"type": "json_object"}
+            )
+            if response.usage is not None:
+                attributes['total_tokens'] = response.usage.total_tokens
+            return response
+
+    response = call_external('openai', request)
 
     script = response.choices[0].message.content
     
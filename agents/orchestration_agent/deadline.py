@@ -0,0 +1,268 @@
+"""
+Deadline-aware quality ladder for editions.
+
+An edition with a publish deadline carries a DeadlineController. Before each
+stage that has cheaper alternatives starts (thumbnails, boundary detection,
+render), the controller estimates the time still needed on the critical path
+of the remaining stages, using measured stage costs from news_videos.db where
+available (every edition run records them, deadline or not), and picks the best rung of QUALITY_LADDER that still finishes
+before the deadline. If even the cheapest rung can't make it with the full
+story count, the edition is planned with fewer stories up front.
+"""
+
+import time
+from datetime import datetime, timedelta
+
+from video_gen import X264_PRESET
+from video_agent import THUMBNAIL_MODE_ARTICLE, THUMBNAIL_MODE_CACHED, THUMBNAIL_MODE_GENERATE
+from job_queue import get_stage_costs, record_stage_cost
+
+
+# Best quality first; each rung is cheaper than the one before
+QUALITY_LADDER = [
+    {'x264_preset': X264_PRESET, 'asr_model': 'base', 'thumbnail_mode': THUMBNAIL_MODE_GENERATE},
+    {'x264_preset': 'veryfast', 'asr_model': 'base', 'thumbnail_mode': THUMBNAIL_MODE_GENERATE},
+    {'x264_preset': 'veryfast', 'asr_model': 'tiny', 'thumbnail_mode': THUMBNAIL_MODE_GENERATE},
+    {'x264_preset': 'veryfast', 'asr_model': 'tiny', 'thumbnail_mode': THUMBNAIL_MODE_ARTICLE},
+    {'x264_preset': 'ultrafast', 'asr_model': 'tiny', 'thumbnail_mode': THUMBNAIL_MODE_CACHED},
+]
+
+MIN_STORY_COUNT = 1
+
+# Estimates are multiplied by this before comparing with the time left
+SAFETY_FACTOR = 1.25
+
+# Ladder settings each stage takes as keyword arguments
+STAGE_SETTINGS = {
+    'thumbnails': ('thumbnail_mode',),
+    'boundaries': ('asr_model',),
+    'render': ('x264_preset', 'asr_model'),
+}
+
+# Stages whose cost grows with the number of stories
+PER_STORY_STAGES = {'thumbnails', 'boundaries', 'render'}
+
+# Estimates (seconds, per story for PER_STORY_STAGES) used until a cost is measured
+DEFAULT_STAGE_SECONDS = {
+    'fetch': 2.0,
+    'summarize': 10.0,
+    'voiceover': 15.0,
+    'record': 0.1,
+    'upload': 15.0,
+}
+DEFAULT_THUMBNAIL_SECONDS = {
+    THUMBNAIL_MODE_GENERATE: 20.0,
+    THUMBNAIL_MODE_ARTICLE: 2.0,
+    THUMBNAIL_MODE_CACHED: 0.1,
+}
+DEFAULT_ASR_SECONDS = {'base': 6.0, 'tiny': 2.0}
+DEFAULT_ENCODE_SECONDS = {'medium': 15.0, 'fast': 11.0, 'veryfast': 6.0, 'ultrafast': 3.0}
+
+
+def parse_deadline(text, now=None):
+    """
+    Parse a deadline given as a clock time ('18:30', today or tomorrow) or
+    relative to now ('+20m', '+90s', '+1h').
+
+    Returns:
+        float: Deadline in epoch seconds
+
+    Raises:
+        ValueError: If the text is neither form
+    """
+    now = now or datetime.now()
+    text = text.strip()
+    if text.startswith('+'):
+        units = {'s': 1, 'm': 60, 'h': 3600}
+        value = text[1:].strip()
+        if not value:
+            raise ValueError("Relative deadline needs a duration, e.g. '+20m'")
+        seconds = float(value[:-1]) * units[value[-1]] if value[-1] in units else float(value) * 60
+        return (now + timedelta(seconds=seconds)).timestamp()
+
+    clock = datetime.strptime(text, "%H:%M").time()
+    deadline = datetime.combine(now.date(), clock)
+    if deadline <= now:
+        deadline += timedelta(days=1)
+    return deadline.timestamp()
+
+
+def stage_variant(stage_name, settings):
+    """Name of the quality variant a stage runs with (the key its cost is recorded under)"""
+    keys = STAGE_SETTINGS.get(stage_name)
+    if not keys:
+        return 'default'
+    return '/'.join(str(settings[key]) for key in keys)
+
+
+def record_run_cost(stage_name, elapsed, story_count=None, settings=None):
+    """
+    Fold one finished stage run into the measured costs deadlines are planned with.
+
+    Called for every edition stage the orchestrator runs, with or without a
+    deadline; stages the controller knows nothing about are ignored.
+
+    Args:
+        stage_name: Stage name
+        elapsed: Run time in seconds
+        story_count: Stories in the edition (per-story stages are recorded per story)
+        settings: Ladder settings the stage ran with (None: its defaults, the best rung)
+    """
+    if stage_name not in DEFAULT_STAGE_SECONDS and stage_name not in PER_STORY_STAGES:
+        return
+    units = story_count if stage_name in PER_STORY_STAGES and story_count else 1
+    record_stage_cost(stage_name, stage_variant(stage_name, settings or QUALITY_LADDER[0]), elapsed / units)
+
+
+class DeadlineController:
+    """
+    Chooses quality settings for one edition so it finishes by its deadline.
+
+    Args:
+        deadline: Publish deadline (epoch seconds)
+        stages: The edition's stage list (used for the critical path)
+        story_count: Requested number of stories
+        stage_costs: Optional measured costs (stage -> variant -> seconds);
+            loaded from news_videos.db when omitted
+        safety_factor: Multiplier applied to estimates
+        ladder: Quality ladder, best rung first
+    """
+
+    def __init__(self, deadline, stages, story_count, stage_costs=None,
+                 safety_factor=SAFETY_FACTOR, ladder=QUALITY_LADDER):
+        self.deadline = deadline
+        self.stages = list(stages)
+        self.story_count = story_count
+        self.costs = stage_costs if stage_costs is not None else get_stage_costs()
+        self.safety_factor = safety_factor
+        self.ladder = ladder
+        self.started = {}
+        self.finished = set()
+        self.decisions = []
+
+        producers = {output: stage.name for stage in self.stages for output in stage.outputs}
+        self._depends_on = {
+            stage.name: {producers[name] for name in stage.inputs if name in producers}
+            for stage in self.stages
+        }
+
+    def estimate(self, stage_name, settings, story_count=None):
+        """
+        Estimated run time of one stage with the given ladder settings.
+
+        Returns:
+            float: Seconds
+        """
+        story_count = story_count or self.story_count
+        measured = self.costs.get(stage_name, {}).get(stage_variant(stage_name, settings))
+        if measured is not None:
+            seconds = measured
+        elif stage_name == 'thumbnails':
+            seconds = DEFAULT_THUMBNAIL_SECONDS.get(settings['thumbnail_mode'], 20.0)
+        elif stage_name == 'boundaries':
+            seconds = DEFAULT_ASR_SECONDS.get(settings['asr_model'], 6.0)
+        elif stage_name == 'render':
+            # The render transcribes again for caption timings
+            seconds = (DEFAULT_ENCODE_SECONDS.get(settings['x264_preset'], 15.0)
+                       + DEFAULT_ASR_SECONDS.get(settings['asr_model'], 6.0))
+        else:
+            seconds = DEFAULT_STAGE_SECONDS.get(stage_name, 5.0)
+        return seconds * story_count if stage_name in PER_STORY_STAGES else seconds
+
+    def remaining_seconds(self, settings, story_count=None, now=None):
+        """
+        Estimated time until every unfinished stage is done (critical path).
+
+        Stages already running count only their estimated remaining time.
+        """
+        now = now if now is not None else time.time()
+        finish = {}
+
+        def finish_time(name):
+            if name in finish:
+                return finish[name]
+            if name in self.finished:
+                finish[name] = 0.0
+                return 0.0
+            ready = max((finish_time(dep) for dep in self._depends_on[name]), default=0.0)
+            cost = self.estimate(name, settings, story_count)
+            if name in self.started:
+                cost = max(cost - (now - self.started[name]), 0.0)
+            finish[name] = ready + cost
+            return finish[name]
+
+        return max((finish_time(stage.name) for stage in self.stages), default=0.0)
+
+    def _fits(self, settings, story_count, now):
+        return self.remaining_seconds(settings, story_count, now) * self.safety_factor <= self.deadline - now
+
+    def plan_story_count(self, now=None):
+        """
+        Largest story count (up to the requested one) that fits the deadline
+        on the cheapest rung; sets and returns self.story_count.
+        """
+        now = now if now is not None else time.time()
+        count = self.story_count
+        while count > MIN_STORY_COUNT and not self._fits(self.ladder[-1], count, now):
+            count -= 1
+        if count != self.story_count:
+            print(f"[deadline] reducing edition from {self.story_count} to {count} stories")
+            self.decisions.append({'stage': None, 'story_count': count, 'at': now})
+        self.story_count = count
+        return count
+
+    def choose_level(self, now=None):
+        """Index of the best ladder rung whose remaining estimate fits before the deadline"""
+        now = now if now is not None else time.time()
+        for level, settings in enumerate(self.ladder):
+            if self._fits(settings, self.story_count, now):
+                return level
+        return len(self.ladder) - 1
+
+    def settings_for(self, stage_name, now=None):
+        """
+        Pick the ladder rung as the stage starts and return its settings for that stage.
+
+        Returns:
+            dict: Keyword arguments for the stage function
+        """
+        now = now if now is not None else time.time()
+        level = self.choose_level(now)
+        settings = {key: self.ladder[level][key] for key in STAGE_SETTINGS.get(stage_name, ())}
+        self.decisions.append({
+            'stage': stage_name,
+            'level': level,
+            'settings': settings,
+            'seconds_left': round(self.deadline - now, 1),
+            'at': now,
+        })
+        if level:
+            print(f"[deadline] {stage_name}: {self.deadline - now:.0f}s left, using rung {level} {settings}")
+        return settings
+
+    def mark_completed(self, stage_names):
+        """Mark stages finished in an earlier run (resumed jobs)"""
+        self.finished.update(stage_names)
+
+    def wrap(self, stage):
+        """
+        Return a copy of the stage whose function receives the controller's
+        settings, which it also keeps in its settings attribute (the
+        orchestrator records the run's cost under them).
+        """
+        func = stage.func
+
+        def run_with_deadline(**kwargs):
+            self.started[stage.name] = time.time()
+            settings = self.settings_for(stage.name)
+            wrapped.settings = settings
+            outputs = func(**kwargs, **settings)
+            self.finished.add(stage.name)
+            return outputs
+
+        wrapped = type(stage)(stage.name, run_with_deadline, stage.inputs, stage.outputs, stage.resource)
+        return wrapped
+
+    def wrap_stages(self, stages):
+        """Wrap every stage in the list (see wrap)"""
+        return [self.wrap(stage) for stage in stages]
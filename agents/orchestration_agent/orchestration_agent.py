@@ -0,0 +1,870 @@
+"""
+Orchestrates the news video pipeline as a graph of stages.
+
+Each stage declares typed inputs and outputs; a stage starts as soon as every
+input it needs has been produced, so independent work overlaps (thumbnails are
+generated from the fetched story text while TTS and boundary detection run).
+Stages are tagged with a resource (newsapi, openai, asr, render, ...) and each
+resource has a concurrency limit shared by every edition the orchestrator runs,
+so several editions can be in flight at once, e.g. one edition uploading while
+the next one fetches, without oversubscribing the CPU or API quotas. CPU-heavy
+resources (asr, render) also reserve a core budget before they start, which
+caps Whisper's torch threads and ffmpeg's -threads, so a transcription and a
+render share the cores instead of thrashing them.
+
+Editions can also be queued in news_videos.db and drained by one or more
+worker processes. Workers checkpoint every finished stage, so a worker that
+crashes (or a failed render) resumes from the last completed stage instead of
+repeating the paid API calls.
+
+Usage:
+    python orchestration_agent.py --categories technology business --stories 4
+    python orchestration_agent.py --categories all     # every category in one batch process
+    python orchestration_agent.py --enqueue --categories technology business
+    python orchestration_agent.py --worker [--once]
+    python orchestration_agent.py --categories all --cores 0   # no core budgets (free-for-all)
+    TRACE_PROFILE=stage.render python orchestration_agent.py --trace trace.json --metrics trace.prom
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+from pathlib import Path
+
+# Start of module import, so batch reports include the cost of importing whisper/torch
+IMPORT_STARTED_AT = time.monotonic()
+
+# Add sibling agent directories to path (same layout as video_agent.py)
+AGENTS_DIR = Path(__file__).parent.parent.resolve()
+sys.path.append(str(AGENTS_DIR / 'news_agent'))
+sys.path.append(str(AGENTS_DIR / 'database'))
+sys.path.append(str(AGENTS_DIR / 'video_agent'))
+sys.path.append(str(AGENTS_DIR / 'upload_agent'))
+sys.path.append(str(AGENTS_DIR / 'common'))
+
+from fetch_news import fetch_news
+from llm import summarize_story
+from video_database import insert_video_record, update_video_status
+from outbox import OutboxFlusher
+from job_queue import (
+    DEFAULT_LEASE_SECONDS, claim_job, complete_job, default_worker_id, enqueue_job,
+    fail_job, get_completed_stages, record_stage_complete, renew_lease, set_job_story_count
+)
+import video_agent
+from video_gen import detect_smart_story_boundaries, get_whisper_model
+from generate_summary import CATEGORIES
+from tracing import get_tracer, run_in_context, span
+from resources import DEFAULT_CORE_DEMANDS, DEFAULT_CORES, CoreScheduler
+from deadline import DeadlineController, parse_deadline, record_run_cost
+
+
+# Longest a finished run waits for its last outbox flush; the rest goes with the next run
+OUTBOX_EXIT_FLUSH_SECONDS = 10.0
+
+# Per-resource concurrency limits, shared by all editions run by one orchestrator.
+# Resources not listed here are unlimited.
+DEFAULT_STAGE_LIMITS = {
+    'newsapi': 2,
+    'openai': 4,
+    'openai_images': 2,
+    'db': 1,
+    'asr': 1,
+    'render': 1,
+    'upload': 2,
+}
+
+# Status of an edition's local videos row once it rendered without being
+# uploaded; publish_edition marks uploaded editions 'completed'
+VIDEO_STATUS_RENDERED = 'rendered'
+
+OPTIONAL_FLOAT = (float, int, type(None))
+OPTIONAL_INT = (int, type(None))
+
+
+class PipelineError(Exception):
+    """Raised when a stage fails or the stage graph is invalid"""
+
+    def __init__(self, message, stage=None):
+        super().__init__(message)
+        self.stage = stage
+
+
+class Stage:
+    """
+    One unit of work in the pipeline graph.
+
+    Args:
+        name: Unique stage name
+        func: Callable invoked with the declared inputs as keyword arguments;
+            must return a dict containing every declared output
+        inputs: Dict of input name -> expected type (or tuple of types)
+        outputs: Dict of output name -> expected type (or tuple of types)
+        resource: Concurrency-limit bucket (defaults to the stage name)
+    """
+
+    def __init__(self, name, func, inputs=None, outputs=None, resource=None):
+        self.name = name
+        self.func = func
+        self.inputs = dict(inputs or {})
+        self.outputs = dict(outputs or {})
+        self.resource = resource or name
+        # Quality settings of the last run when a DeadlineController picks them (None: defaults)
+        self.settings = None
+
+    def __repr__(self):
+        return f"Stage({self.name!r})"
+
+
+def validate_graph(stages, initial_names):
+    """
+    Check that every input has exactly one producer and the graph has no cycles.
+
+    Args:
+        stages: List of Stage
+        initial_names: Names of values supplied before the run starts
+
+    Raises:
+        PipelineError: If the graph is invalid
+    """
+    producers = {name: None for name in initial_names}
+    for stage in stages:
+        for output in stage.outputs:
+            if output in producers:
+                raise PipelineError(f"Output '{output}' is produced more than once", stage.name)
+            producers[output] = stage.name
+
+    for stage in stages:
+        for name in stage.inputs:
+            if name not in producers:
+                raise PipelineError(f"Input '{name}' of stage '{stage.name}' has no producer", stage.name)
+
+    # Kahn's algorithm over stage dependencies
+    depends_on = {
+        stage.name: {producers[name] for name in stage.inputs if producers[name] is not None}
+        for stage in stages
+    }
+    resolved = set()
+    while len(resolved) < len(stages):
+        ready = [name for name, deps in depends_on.items()
+                 if name not in resolved and deps <= resolved]
+        if not ready:
+            cycle = sorted(set(depends_on) - resolved)
+            raise PipelineError(f"Stage graph has a cycle among: {', '.join(cycle)}")
+        resolved.update(ready)
+
+
+def _check_type(stage, name, value, expected):
+    if expected is not None and not isinstance(value, expected):
+        raise PipelineError(
+            f"Stage '{stage.name}' produced {name}={type(value).__name__}, expected {expected}",
+            stage.name
+        )
+
+
+class Orchestrator:
+    """
+    Runs stage graphs with per-resource concurrency limits and core budgets.
+
+    Args:
+        limits: Dict of resource -> max concurrent stages (merged over DEFAULT_STAGE_LIMITS)
+        max_workers: Size of the thread pool shared by all running graphs
+        cores: Cores shared by the stages in DEFAULT_CORE_DEMANDS (default:
+            DEFAULT_CORES); 0 disables core budgets
+    """
+
+    def __init__(self, limits=None, max_workers=16, cores=None):
+        self.limits = dict(DEFAULT_STAGE_LIMITS, **(limits or {}))
+        self.cores = CoreScheduler(cores or DEFAULT_CORES) if cores != 0 else None
+        self._semaphores = {}
+        self._semaphores_lock = threading.Lock()
+        self._stage_pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='stage')
+        self._graph_pool = ThreadPoolExecutor(thread_name_prefix='graph')
+
+    def _semaphore(self, resource):
+        with self._semaphores_lock:
+            if resource not in self._semaphores:
+                limit = self.limits.get(resource)
+                self._semaphores[resource] = threading.BoundedSemaphore(limit) if limit else None
+            return self._semaphores[resource]
+
+    def _run_stage(self, stage, kwargs):
+        semaphore = self._semaphore(stage.resource)
+        if semaphore is not None:
+            semaphore.acquire()
+        try:
+            demand = DEFAULT_CORE_DEMANDS.get(stage.resource) if self.cores else None
+            if demand is None:
+                start = time.monotonic()
+                with span(f"stage.{stage.name}", kind='stage', resource=stage.resource):
+                    outputs = stage.func(**kwargs) or {}
+                return outputs, time.monotonic() - start
+            with self.cores.reserve(*demand, name=stage.name) as granted:
+                start = time.monotonic()
+                with span(f"stage.{stage.name}", kind='stage', resource=stage.resource, cores=granted):
+                    outputs = stage.func(**kwargs) or {}
+                return outputs, time.monotonic() - start
+        finally:
+            if semaphore is not None:
+                semaphore.release()
+
+    def run(self, stages, initial=None, on_stage_complete=None, completed=None):
+        """
+        Run a stage graph to completion.
+
+        Args:
+            stages: List of Stage
+            initial: Dict of values available before any stage runs
+            on_stage_complete: Optional callback(stage_name, outputs, elapsed_seconds)
+            completed: Optional dict of stage name -> outputs for stages that
+                already finished (e.g. in an earlier run); they are not re-run
+
+        Returns:
+            dict: Every initial value and stage output by name
+
+        Raises:
+            PipelineError: If the graph is invalid or a stage fails
+        """
+        # Scalar initial values (category, timestamp, ...) label the trace
+        labels = {name: value for name, value in (initial or {}).items()
+                  if isinstance(value, (str, int, float))}
+        with span('pipeline', kind='pipeline', **labels):
+            return self._run_graph(stages, initial, on_stage_complete, completed)
+
+    def _run_graph(self, stages, initial, on_stage_complete, completed):
+        values = dict(initial or {})
+        validate_graph(stages, values.keys())
+
+        pending = list(stages)
+        for stage in list(pending):
+            if completed and stage.name in completed:
+                values.update(completed[stage.name])
+                pending.remove(stage)
+
+        running = {}
+        failure = None
+        while (pending or running) and failure is None:
+            for stage in [s for s in pending if all(name in values for name in s.inputs)]:
+                for name, expected in stage.inputs.items():
+                    _check_type(stage, name, values[name], expected)
+                kwargs = {name: values[name] for name in stage.inputs}
+                running[self._stage_pool.submit(run_in_context(self._run_stage), stage, kwargs)] = stage
+                pending.remove(stage)
+
+            if not running:
+                raise PipelineError(
+                    f"Stages can never run: {', '.join(s.name for s in pending)}"
+                )
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                try:
+                    outputs, elapsed = future.result()
+                    for name, expected in stage.outputs.items():
+                        if name not in outputs:
+                            raise PipelineError(f"Stage '{stage.name}' did not produce '{name}'", stage.name)
+                        _check_type(stage, name, outputs[name], expected)
+                except Exception as e:
+                    failure = failure or (stage, e)
+                    continue
+                values.update({name: outputs[name] for name in stage.outputs})
+                try:
+                    record_run_cost(stage.name, elapsed, values.get('story_count'), stage.settings)
+                except Exception as e:
+                    print(f"⚠️ Could not record the cost of stage {stage.name}: {e}")
+                if on_stage_complete is not None:
+                    try:
+                        on_stage_complete(stage.name, {name: outputs[name] for name in stage.outputs}, elapsed)
+                    except Exception as e:
+                        # A checkpoint that can't be written (e.g. a locked
+                        # database) fails the run like a stage would
+                        error = PipelineError(f"Could not checkpoint stage '{stage.name}': {e}", stage.name)
+                        error.__cause__ = e
+                        failure = failure or (stage, error)
+
+        if failure is not None:
+            # Let stages that already started finish before reporting
+            wait(running)
+            stage, error = failure
+            if isinstance(error, PipelineError):
+                raise error
+            raise PipelineError(f"Stage '{stage.name}' failed: {error}", stage.name) from error
+        return values
+
+    def submit(self, stages, initial=None, on_stage_complete=None, completed=None):
+        """Run a stage graph in the background; returns a Future for run()'s result"""
+        return self._graph_pool.submit(
+            run_in_context(self.run), stages, initial, on_stage_complete, completed
+        )
+
+    def shutdown(self):
+        """Wait for running graphs and release the worker threads"""
+        self._graph_pool.shutdown(wait=True)
+        self._stage_pool.shutdown(wait=True)
+
+
+# ---------------------------------------------------------------------------
+# Edition stages
+# ---------------------------------------------------------------------------
+
+def fetch_stage(category, story_count):
+    """Fetch the top stories for a category from NewsAPI"""
+    stories = json.loads(fetch_news(story_count, category))
+    if 'error' in stories:
+        raise PipelineError(f"NewsAPI error: {stories['error']}", 'fetch')
+    if not stories.get('stories'):
+        raise PipelineError("No news stories available to summarize.", 'fetch')
+    return {'stories': stories}
+
+
+def summarize_stage(stories):
+    """Summarize the fetched stories into a spoken script (JSON with title, summary, sources, tags)"""
+    return {'script_data': summarize_story(stories)}
+
+
+def voiceover_stage(script_data, timestamp):
+    """Save the script and synthesize the voiceover"""
+    output_dir = Path(video_agent.__file__).parent.resolve() / "voiceovers"
+    output_dir.mkdir(parents=True, exist_ok=True)
+    script_path = output_dir / f"script_{timestamp}.txt"
+    audio_path = output_dir / f"voiceover_{timestamp}.mp3"
+
+    script = script_data.get('summary', '')
+    with open(script_path, 'w', encoding='utf-8') as f:
+        f.write(script)
+    duration = video_agent.synthesize_voiceover(script, audio_path)
+    return {'script_path': str(script_path), 'audio_path': str(audio_path), 'duration': duration}
+
+
+def record_stage(stories, script_path, audio_path, duration, timestamp):
+    """Insert the edition's row in the local videos table"""
+    story_metadata = stories['stories'][0]
+    video_id = insert_video_record(
+        timestamp=timestamp,
+        script_path=script_path,
+        audio_path=audio_path,
+        headline=story_metadata.get('headline'),
+        summary=story_metadata.get('summary'),
+        source=story_metadata.get('source'),
+        duration=duration,
+        status="processing"
+    )
+    return {'video_id': video_id}
+
+
+def thumbnails_stage(stories, story_count, timestamp, thumbnail_mode=video_agent.THUMBNAIL_MODE_GENERATE):
+    """Produce one thumbnail per story from the fetched stories (runs alongside TTS)"""
+    articles = [stories['stories'][i % len(stories['stories'])] for i in range(story_count)]
+    story_texts = [f"{article['headline']}. {article['summary']}" for article in articles]
+    return {'thumbnail_paths': video_agent.generate_story_thumbnails(
+        story_texts, timestamp, mode=thumbnail_mode,
+        image_urls=[article.get('image') for article in articles]
+    )}
+
+
+def boundaries_stage(audio_path, story_count, asr_model="base"):
+    """Detect story boundaries in the voiceover"""
+    segments = detect_smart_story_boundaries(audio_path, story_count, model_name=asr_model)
+    if not segments:
+        raise PipelineError("Failed to detect story boundaries", 'boundaries')
+    return {'story_boundaries': [(seg['start'], seg['end']) for seg in segments]}
+
+
+def render_stage(audio_path, thumbnail_paths, story_boundaries, video_id, timestamp,
+                 x264_preset=None, asr_model="base"):
+    """Render the edition video and HLS ladder"""
+    rendered = video_agent.render_edition(
+        audio_path, thumbnail_paths, story_boundaries, video_id, timestamp,
+        x264_preset=x264_preset, asr_model=asr_model
+    )
+    if rendered is None:
+        raise PipelineError("Failed to render the edition video", 'render')
+    return rendered
+
+
+def upload_stage(video_path, thumbnail_paths, script_data, video_id):
+    """Publish the video, thumbnails and metadata to Supabase concurrently (see upload_agent)"""
+    from upload_agent import publish_edition
+
+    published = publish_edition(video_path, thumbnail_paths, script_data, video_id=video_id)
+    return {'remote_video_id': published['remote_video_id']}
+
+
+def build_edition_stages(upload=False):
+    """
+    Build the stage graph for one edition.
+
+    Initial values: category (str), story_count (int), timestamp (str).
+
+    Args:
+        upload: Include the Supabase upload stage
+
+    Returns:
+        list: Stages
+    """
+    stages = [
+        Stage('fetch', fetch_stage,
+              inputs={'category': str, 'story_count': int},
+              outputs={'stories': dict}, resource='newsapi'),
+        Stage('summarize', summarize_stage,
+              inputs={'stories': dict},
+              outputs={'script_data': dict}, resource='openai'),
+        Stage('voiceover', voiceover_stage,
+              inputs={'script_data': dict, 'timestamp': str},
+              outputs={'script_path': str, 'audio_path': str, 'duration': OPTIONAL_FLOAT},
+              resource='openai'),
+        Stage('record', record_stage,
+              inputs={'stories': dict, 'script_path': str, 'audio_path': str,
+                      'duration': OPTIONAL_FLOAT, 'timestamp': str},
+              outputs={'video_id': OPTIONAL_INT}, resource='db'),
+        Stage('thumbnails', thumbnails_stage,
+              inputs={'stories': dict, 'story_count': int, 'timestamp': str},
+              outputs={'thumbnail_paths': list}, resource='openai_images'),
+        Stage('boundaries', boundaries_stage,
+              inputs={'audio_path': str, 'story_count': int},
+              outputs={'story_boundaries': list}, resource='asr'),
+        Stage('render', render_stage,
+              inputs={'audio_path': str, 'thumbnail_paths': list, 'story_boundaries': list,
+                      'video_id': OPTIONAL_INT, 'timestamp': str},
+              outputs={'video_path': str, 'hls_dir': str}, resource='render'),
+    ]
+    if upload:
+        stages.append(Stage('upload', upload_stage,
+                            inputs={'video_path': str, 'thumbnail_paths': list, 'script_data': dict,
+                                    'video_id': OPTIONAL_INT},
+                            outputs={'remote_video_id': (int, str)}, resource='upload'))
+    return stages
+
+
+def settle_video_status(video_id, upload, failed=False):
+    """
+    Give an edition's local videos row its final status.
+
+    A failed edition is marked 'failed' and one that finished without an
+    upload VIDEO_STATUS_RENDERED. An uploaded edition is left alone:
+    publish_edition marked it 'completed' once everything landed in Supabase.
+
+    Args:
+        video_id: ID of the edition's videos row, or None if it never got one
+        upload: Whether the edition included the upload stage
+        failed: The edition failed for good
+    """
+    if video_id is None:
+        return
+    if failed:
+        update_video_status(video_id, 'failed')
+    elif not upload:
+        update_video_status(video_id, VIDEO_STATUS_RENDERED)
+
+
+def edition_initial_values(category, story_count, timestamp=None):
+    """Initial values for build_edition_stages; the timestamp is made unique per category"""
+    timestamp = timestamp or datetime.now().strftime("%Y%m%d_%H%M%S")
+    return {'category': category, 'story_count': story_count, 'timestamp': f"{timestamp}_{category}"}
+
+
+def prepare_edition(category, story_count, upload=False, timestamp=None, deadline=None, completed=None):
+    """
+    Build the stages and initial values for one edition, applying its deadline.
+
+    With a deadline, a DeadlineController may reduce the story count up front
+    and picks the quality settings of the thumbnails, boundaries and render
+    stages as each one starts. The count is only planned while nothing built
+    from it exists yet (at most the fetch is done); a completed fetch is then
+    trimmed to the planned count, so the script, thumbnails and boundaries
+    all cover the same stories.
+
+    Args:
+        category: NewsAPI category
+        story_count: Requested stories (for resumed jobs: the planned count)
+        upload: Include the upload stage
+        timestamp: Edition timestamp (default: now)
+        deadline: Optional publish deadline (epoch seconds)
+        completed: Dict of stage name -> outputs already finished (prefetched
+            stories, resumed jobs); its fetch outputs are trimmed in place
+
+    Returns:
+        tuple: (stages, initial values, DeadlineController or None)
+    """
+    stages = build_edition_stages(upload=upload)
+    completed = completed if completed is not None else {}
+    controller = None
+    if deadline is not None:
+        controller = DeadlineController(deadline, stages, story_count)
+        controller.mark_completed(completed)
+        if set(completed) <= {'fetch'}:
+            story_count = controller.plan_story_count()
+        stages = controller.wrap_stages(stages)
+    if 'fetch' in completed and set(completed) <= {'fetch'}:
+        stories = completed['fetch']['stories']
+        if len(stories['stories']) > story_count:
+            completed['fetch'] = {'stories': dict(stories, stories=stories['stories'][:story_count])}
+    return stages, edition_initial_values(category, story_count, timestamp), controller
+
+
+def fetch_batch(categories, story_count):
+    """
+    One fetch pass for a batch of editions.
+
+    Every category is fetched up front over the shared HTTP session, and a story
+    already assigned to an earlier edition (NewsAPI lists many articles under
+    both "general" and a specific category) is dropped from later ones.
+
+    Args:
+        categories: List of NewsAPI categories
+        story_count: Stories per edition
+
+    Returns:
+        dict: category -> stories dict (categories whose fetch failed are left
+            out; their editions fetch again in the graph)
+    """
+    def fetch(category):
+        try:
+            # Over-fetch so there is room to drop duplicates
+            return fetch_stage(category, story_count * 2)['stories']
+        except PipelineError as e:
+            print(f"⚠️ [{category}] batch fetch failed: {e}")
+            return None
+
+    with span('fetch_batch', categories=len(categories)):
+        with ThreadPoolExecutor(max_workers=DEFAULT_STAGE_LIMITS['newsapi']) as pool:
+            futures = [pool.submit(run_in_context(fetch), category) for category in categories]
+            fetched = {category: future.result() for category, future in zip(categories, futures)}
+
+    seen_urls = set()
+    batch = {}
+    for category in categories:
+        stories = fetched[category]
+        if stories is None:
+            continue
+        unique = [story for story in stories['stories'] if story.get('url') not in seen_urls]
+        selected = (unique or stories['stories'])[:story_count]
+        seen_urls.update(story.get('url') for story in selected)
+        batch[category] = dict(stories, stories=selected)
+    return batch
+
+
+def run_editions(categories, story_count=4, upload=False, limits=None, share_fetch=True, deadline=None,
+                 cores=None, orchestrator=None):
+    """
+    Produce one edition per category in this process, overlapping their independent stages.
+
+    The editions share one fetch pass, one Whisper model (loaded in the
+    background while the fetch runs), the process-wide API clients and the
+    orchestrator's render slots, so startup and model load are paid once per
+    batch rather than once per edition.
+
+    Args:
+        categories: List of NewsAPI categories
+        story_count: Stories per edition
+        upload: Upload each finished edition to Supabase
+        limits: Optional per-resource concurrency overrides
+        share_fetch: Fetch every category in one pass with cross-edition de-duplication
+        deadline: Optional publish deadline (epoch seconds) for every edition
+        cores: Core budget for CPU-heavy stages (see Orchestrator)
+        orchestrator: Optional long-lived Orchestrator to run on (e.g. the warm
+            worker's); limits and cores are ignored and it is not shut down
+
+    Returns:
+        dict: category -> {'values', 'timings', 'wall_seconds'} or
+            {'error', 'stage', 'timings', 'wall_seconds'}
+    """
+    threading.Thread(target=get_whisper_model, daemon=True).start()
+
+    owns_orchestrator = orchestrator is None
+    if owns_orchestrator:
+        orchestrator = Orchestrator(limits=limits, cores=cores)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    prefetched = fetch_batch(categories, story_count) if share_fetch else {}
+    futures = {}
+    timings = {}
+    video_ids = {}
+    finished_at = {}
+    try:
+        start = time.monotonic()
+        for category in categories:
+            timings[category] = {}
+
+            def record_timing(stage_name, outputs, elapsed, category=category):
+                timings[category][stage_name] = round(elapsed, 3)
+                if 'video_id' in outputs:
+                    video_ids[category] = outputs['video_id']
+                print(f"[{category}] {stage_name} done in {elapsed:.1f}s")
+
+            completed = {'fetch': {'stories': prefetched[category]}} if category in prefetched else None
+            stages, initial, _ = prepare_edition(
+                category, story_count, upload=upload, timestamp=timestamp, deadline=deadline,
+                completed=completed
+            )
+            futures[category] = orchestrator.submit(
+                stages, initial, on_stage_complete=record_timing, completed=completed
+            )
+            futures[category].add_done_callback(
+                lambda _, category=category: finished_at.setdefault(category, time.monotonic())
+            )
+
+        results = {}
+        for category, future in futures.items():
+            try:
+                values = future.result()
+                results[category] = {'values': values, 'timings': timings[category]}
+                settle_video_status(values.get('video_id'), upload)
+            except PipelineError as e:
+                print(f"❌ [{category}] {e}")
+                settle_video_status(video_ids.get(category), upload, failed=True)
+                results[category] = {'error': str(e), 'stage': e.stage, 'timings': timings[category]}
+            # result() can return before the done callback has run
+            finished = finished_at.get(category, time.monotonic())
+            results[category]['wall_seconds'] = round(finished - start, 3)
+        return results
+    finally:
+        if owns_orchestrator:
+            orchestrator.shutdown()
+
+
+def summarize_throughput(results, wall_seconds):
+    """
+    Per-edition and total throughput of a batch.
+
+    Args:
+        results: Return value of run_editions
+        wall_seconds: Wall time of the whole batch, including startup
+
+    Returns:
+        dict: editions, failed, wall_seconds, editions_per_hour,
+            video_seconds and video_seconds_per_wall_second
+    """
+    succeeded = [result for result in results.values() if 'error' not in result]
+    video_seconds = sum(result['values'].get('duration') or 0 for result in succeeded)
+    return {
+        'editions': len(succeeded),
+        'failed': len(results) - len(succeeded),
+        'wall_seconds': round(wall_seconds, 3),
+        'editions_per_hour': round(len(succeeded) * 3600 / wall_seconds, 2) if wall_seconds else None,
+        'video_seconds': round(video_seconds, 3),
+        'video_seconds_per_wall_second': round(video_seconds / wall_seconds, 3) if wall_seconds else None,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Queue workers
+# ---------------------------------------------------------------------------
+
+def _artifacts_missing(outputs):
+    for name, value in outputs.items():
+        paths = value if name.endswith('_paths') else [value] if name.endswith('_path') else []
+        if any(isinstance(path, str) and not os.path.exists(path) for path in paths):
+            return True
+    return False
+
+
+def drop_stale_checkpoints(stages, completed):
+    """
+    Forget checkpoints whose artifact files no longer exist, and every
+    checkpoint built from them, so those stages run again.
+
+    Args:
+        stages: List of Stage
+        completed: Dict of stage name -> checkpointed outputs
+
+    Returns:
+        dict: The checkpoints that can be reused
+    """
+    producers = {output: stage.name for stage in stages for output in stage.outputs}
+    stale = {name for name, outputs in completed.items() if _artifacts_missing(outputs)}
+    changed = True
+    while changed:
+        changed = False
+        for stage in stages:
+            if stage.name in completed and stage.name not in stale:
+                if any(producers.get(name) in stale for name in stage.inputs):
+                    stale.add(stage.name)
+                    changed = True
+    return {name: outputs for name, outputs in completed.items() if name not in stale}
+
+
+def process_job(orchestrator, job, worker_id, lease_seconds=DEFAULT_LEASE_SECONDS):
+    """
+    Run one claimed job, resuming from its checkpointed stages.
+
+    Args:
+        orchestrator: Orchestrator to run the stage graph on
+        job: Job record from claim_job
+        worker_id: Identifier of this worker
+        lease_seconds: Lease length renewed by the heartbeat
+
+    Returns:
+        bool: True if the job completed
+    """
+    completed = drop_stale_checkpoints(
+        build_edition_stages(upload=bool(job['upload'])), get_completed_stages(job['id'])
+    )
+    if completed:
+        print(f"Job {job['id']}: resuming after {', '.join(sorted(completed))}")
+    stages, initial, _ = prepare_edition(
+        job['category'], job['story_count'], upload=bool(job['upload']),
+        timestamp=job['timestamp'], deadline=job.get('deadline'), completed=completed
+    )
+    if initial['story_count'] != job['story_count']:
+        # A resumed attempt must build on the count its checkpoints were made with
+        set_job_story_count(job['id'], initial['story_count'])
+
+    def checkpoint(stage_name, outputs, elapsed):
+        record_stage_complete(job['id'], stage_name, outputs, elapsed)
+        print(f"Job {job['id']}: {stage_name} done in {elapsed:.1f}s")
+
+    # Keep the lease alive while the job runs; an expired lease lets another worker take over
+    stop_heartbeat = threading.Event()
+
+    def heartbeat():
+        while not stop_heartbeat.wait(lease_seconds / 3):
+            renew_lease(job['id'], worker_id, lease_seconds)
+
+    heartbeat_thread = threading.Thread(target=heartbeat, daemon=True)
+    heartbeat_thread.start()
+    try:
+        values = orchestrator.run(stages, initial, on_stage_complete=checkpoint, completed=completed)
+    except PipelineError as e:
+        status = fail_job(job['id'], str(e), worker_id)
+        if status is None:
+            print(f"⚠️ Job {job['id']} failed in stage {e.stage} after its lease passed to another worker: {e}")
+            return False
+        print(f"❌ Job {job['id']} failed in stage {e.stage} ({status}): {e}")
+        if status == 'failed':
+            video_id = get_completed_stages(job['id']).get('record', {}).get('video_id')
+            settle_video_status(video_id, bool(job['upload']), failed=True)
+        return False
+    finally:
+        stop_heartbeat.set()
+        heartbeat_thread.join()
+
+    if not complete_job(job['id'], worker_id):
+        print(f"⚠️ Job {job['id']} finished after its lease passed to another worker; leaving it to them")
+        return False
+    settle_video_status(values.get('video_id'), bool(job['upload']))
+    print(f"✅ Job {job['id']} completed: {values.get('video_path')}")
+    return True
+
+
+def run_worker(worker_id=None, poll_interval=5.0, once=False, limits=None,
+               lease_seconds=DEFAULT_LEASE_SECONDS, cores=None):
+    """
+    Claim and run queued jobs until interrupted.
+
+    Several worker processes can drain the queue in parallel; claims are atomic.
+
+    Args:
+        worker_id: Identifier of this worker (default: host:pid)
+        poll_interval: Seconds to wait when the queue is empty
+        once: Exit when the queue is empty instead of polling
+        limits: Optional per-resource concurrency overrides
+        lease_seconds: Lease length for claimed jobs
+        cores: Core budget for CPU-heavy stages (see Orchestrator)
+
+    Returns:
+        int: Number of jobs completed
+    """
+    worker_id = worker_id or default_worker_id()
+    orchestrator = Orchestrator(limits=limits, cores=cores)
+    completed_jobs = 0
+    try:
+        while True:
+            job = claim_job(worker_id, lease_seconds)
+            if job is None:
+                if once:
+                    break
+                time.sleep(poll_interval)
+                continue
+            print(f"Worker {worker_id} claimed job {job['id']} "
+                  f"({job['category']}, attempt {job['attempts']})")
+            try:
+                if process_job(orchestrator, job, worker_id, lease_seconds):
+                    completed_jobs += 1
+            except Exception as e:
+                # Anything process_job didn't handle fails this job, not the worker
+                error = f"{type(e).__name__}: {e}"
+                print(f"❌ Job {job['id']} failed: {error}")
+                try:
+                    fail_job(job['id'], error, worker_id)
+                except Exception as fail_error:
+                    print(f"⚠️ Could not record the failure of job {job['id']} ({fail_error}); "
+                          f"it is retried once its lease expires")
+    except KeyboardInterrupt:
+        print(f"Worker {worker_id} stopping")
+    finally:
+        orchestrator.shutdown()
+    return completed_jobs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run news video editions as a stage graph")
+    parser.add_argument('--categories', nargs='+', default=['technology'],
+                        help="NewsAPI categories, one edition each ('all' for every category)")
+    parser.add_argument('--stories', type=int, default=4, help="Stories per edition")
+    parser.add_argument('--upload', action='store_true', help="Upload finished editions to Supabase")
+    parser.add_argument('--enqueue', action='store_true',
+                        help="Queue one job per category in news_videos.db instead of running now")
+    parser.add_argument('--worker', action='store_true', help="Run a queue worker")
+    parser.add_argument('--once', action='store_true', help="Worker exits when the queue is empty")
+    parser.add_argument('--no-shared-fetch', action='store_true',
+                        help="Fetch each edition's stories separately instead of in one pass")
+    parser.add_argument('--deadline', type=parse_deadline,
+                        help="Publish deadline ('18:30' or '+20m'); quality is reduced as needed to meet it")
+    parser.add_argument('--cores', type=int, default=None,
+                        help=f"Cores shared by ASR and render stages (default {DEFAULT_CORES}; 0 = no budgets)")
+    parser.add_argument('--trace', help="Write a JSON trace of every span to this file")
+    parser.add_argument('--metrics', help="Write a Prometheus text summary of the spans to this file")
+    args = parser.parse_args()
+    if args.categories == ['all']:
+        args.categories = list(CATEGORIES)
+
+    # Local video records are shipped to Supabase in the background
+    flusher = OutboxFlusher().start()
+    try:
+        run_cli(args)
+    finally:
+        flusher.stop(timeout=OUTBOX_EXIT_FLUSH_SECONDS)
+        if args.trace:
+            get_tracer().export_json(args.trace)
+            print(f"Trace written to {args.trace}")
+        if args.metrics:
+            get_tracer().export_prometheus(args.metrics)
+            print(f"Metrics written to {args.metrics}")
+
+
+def run_cli(args):
+    if args.enqueue:
+        for category in args.categories:
+            job_id = enqueue_job(category, args.stories, upload=args.upload, deadline=args.deadline)
+            print(f"Queued job {job_id} ({category})")
+        return
+    if args.worker:
+        completed_jobs = run_worker(once=args.once, cores=args.cores)
+        print(f"Worker finished {completed_jobs} job(s)")
+        return
+
+    startup_seconds = time.monotonic() - IMPORT_STARTED_AT
+    results = run_editions(args.categories, story_count=args.stories, upload=args.upload,
+                           share_fetch=not args.no_shared_fetch, deadline=args.deadline,
+                           cores=args.cores)
+    throughput = summarize_throughput(results, time.monotonic() - IMPORT_STARTED_AT)
+
+    for category, result in results.items():
+        if 'error' in result:
+            print(f"{category}: failed in stage {result['stage']} after {result['wall_seconds']:.1f}s")
+        else:
+            print(f"{category}: {result['values'].get('video_path')} in {result['wall_seconds']:.1f}s")
+        print(f"  stage timings: {result['timings']}")
+    print(f"Startup (imports): {startup_seconds:.1f}s")
+    print(f"Total: {throughput['editions']} edition(s), {throughput['failed']} failed, "
+          f"{throughput['wall_seconds']:.1f}s wall, {throughput['editions_per_hour']} editions/hour, "
+          f"{throughput['video_seconds_per_wall_second']} video seconds per wall second")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+"""
+Runs editions on a timetable.
+
+Each category has its own interval. Triggers are aligned to fixed slots
+(start + k * interval) plus a random jitter so editions for different
+categories don't all hit NewsAPI, OpenAI and the CPU at the same moment.
+A trigger that fires while the category's previous run is still in flight is
+coalesced (skipped and recorded) instead of stacking a second copy behind it.
+Every run's schedule lag and duration is stored in the schedule_runs table of
+news_videos.db; `--report` shows when the pipeline no longer fits its slot.
+
+Usage:
+    python scheduler.py --every technology=1h business=2h --stories 4
+    python scheduler.py --every technology=30m --enqueue     # hand runs to queue workers
+    python scheduler.py --report
+"""
+
+import argparse
+import math
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.resolve() / 'database'))
+
+from orchestration_agent import Orchestrator, PipelineError, prepare_edition, settle_video_status
+from job_queue import enqueue_job, get_job
+from schedule_runs import (
+    finish_schedule_run, get_schedule_stats, record_coalesced_run, start_schedule_run
+)
+
+
+# Maximum random delay added to each trigger, in seconds
+DEFAULT_JITTER_SECONDS = 120
+
+# How often the scheduler checks for due triggers and finished runs
+TICK_SECONDS = 1.0
+
+DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def _parse_duration(text, plain_unit):
+    text = text.strip().lower()
+    if text and text[-1] in DURATION_UNITS:
+        seconds = float(text[:-1]) * DURATION_UNITS[text[-1]]
+    else:
+        seconds = float(text) * DURATION_UNITS[plain_unit]
+    if not math.isfinite(seconds):
+        raise ValueError(f"Duration must be finite: '{text}'")
+    return seconds
+
+
+def parse_interval(text, plain_unit='m'):
+    """
+    Parse an interval like '90s', '30m', '2h' or '1d'.
+
+    Args:
+        text: Interval text
+        plain_unit: Unit of a plain number (default: minutes)
+
+    Returns:
+        float: Interval in seconds
+
+    Raises:
+        ValueError: If the text isn't a positive, finite duration (a zero
+            interval would never let the schedule advance)
+    """
+    seconds = _parse_duration(text, plain_unit)
+    if seconds <= 0:
+        raise ValueError(f"Interval must be positive: '{text}'")
+    return seconds
+
+
+def parse_jitter(text):
+    """Parse a jitter like '90s' or '2m' (plain numbers are seconds; must not be negative)"""
+    seconds = _parse_duration(text, 's')
+    if seconds < 0:
+        raise ValueError(f"Jitter must not be negative: '{text}'")
+    return seconds
+
+
+class ScheduledEdition:
+    """
+    Schedule state for one category.
+
+    Args:
+        category: NewsAPI category
+        interval_seconds: Time between triggers
+        jitter_seconds: Maximum random delay added to each trigger
+        start_time: Epoch seconds of the first slot
+    """
+
+    def __init__(self, category, interval_seconds, jitter_seconds, start_time):
+        self.category = category
+        self.interval_seconds = interval_seconds
+        self.jitter_seconds = min(jitter_seconds, interval_seconds / 2)
+        self.slot = start_time
+        self.next_run_at = self._jittered(self.slot)
+        self.in_flight = None       # Future (in-process) or job ID (enqueue mode)
+        self.video_id = None        # videos row of the in-process run, once recorded
+        self.run_id = None
+        self.started_at = None
+
+    def _jittered(self, slot):
+        return slot + random.uniform(0, self.jitter_seconds)
+
+    def advance(self, now):
+        """Move to the next slot after now; returns the planned times of slots missed on the way"""
+        missed = []
+        self.slot += self.interval_seconds
+        while self.slot <= now:
+            missed.append(self.slot)
+            self.slot += self.interval_seconds
+        self.next_run_at = self._jittered(self.slot)
+        return missed
+
+
+class EditionScheduler:
+    """
+    Triggers editions per category with coalescing and jitter.
+
+    Args:
+        intervals: Dict of category -> interval in seconds
+        story_count: Stories per edition
+        jitter_seconds: Maximum random delay added to each trigger
+        upload: Upload finished editions
+        enqueue: Put runs on the job queue for workers instead of running them here
+        limits: Optional per-resource concurrency overrides (in-process mode)
+        slot_deadline: Give every run a deadline at the end of its slot, so the
+            deadline controller degrades quality instead of overrunning
+    """
+
+    def __init__(self, intervals, story_count=4, jitter_seconds=DEFAULT_JITTER_SECONDS,
+                 upload=False, enqueue=False, limits=None, slot_deadline=False):
+        now = time.time()
+        self.editions = [
+            ScheduledEdition(category, interval, jitter_seconds, now)
+            for category, interval in intervals.items()
+        ]
+        self.story_count = story_count
+        self.upload = upload
+        self.enqueue = enqueue
+        self.slot_deadline = slot_deadline
+        self.orchestrator = None if enqueue else Orchestrator(limits=limits)
+
+    def _start(self, edition, now):
+        deadline = edition.slot + edition.interval_seconds if self.slot_deadline else None
+        if self.enqueue:
+            edition.in_flight = enqueue_job(
+                edition.category, self.story_count, upload=self.upload, deadline=deadline
+            )
+            job_id = edition.in_flight
+        else:
+            stages, initial, _ = prepare_edition(
+                edition.category, self.story_count, upload=self.upload, deadline=deadline
+            )
+            edition.video_id = None
+
+            def record_video_id(stage_name, outputs, elapsed, edition=edition):
+                if 'video_id' in outputs:
+                    edition.video_id = outputs['video_id']
+
+            edition.in_flight = self.orchestrator.submit(stages, initial, on_stage_complete=record_video_id)
+            job_id = None
+        edition.started_at = now
+        edition.run_id = start_schedule_run(
+            edition.category, edition.next_run_at, now, edition.interval_seconds, job_id
+        )
+        print(f"[scheduler] {edition.category}: started (lag {now - edition.next_run_at:.1f}s)")
+
+    def _poll(self, edition, now):
+        """Record the in-flight run's outcome if it finished; returns True while still running"""
+        if edition.in_flight is None:
+            return False
+
+        error = None
+        if self.enqueue:
+            job = get_job(edition.in_flight)
+            if job is not None and job['status'] in ('queued', 'running'):
+                return True
+            status = job['status'] if job else 'failed'
+            error = job['error'] if job else 'job disappeared'
+        else:
+            if not edition.in_flight.done():
+                return True
+            try:
+                edition.in_flight.result()
+                status = 'completed'
+            except PipelineError as e:
+                status, error = 'failed', str(e)
+            except Exception as e:
+                status, error = 'failed', f"{type(e).__name__}: {e}"
+            settle_video_status(edition.video_id, self.upload, failed=status == 'failed')
+
+        duration = now - edition.started_at
+        finish_schedule_run(edition.run_id, status, duration, error)
+        note = " (longer than its interval)" if duration > edition.interval_seconds else ""
+        print(f"[scheduler] {edition.category}: {status} in {duration:.1f}s{note}")
+        edition.in_flight = None
+        return False
+
+    def tick(self, now=None):
+        """Record finished runs and start (or coalesce) due triggers"""
+        now = now if now is not None else time.time()
+        for edition in self.editions:
+            # One slot's failure (a locked database, a bad prepare) must not
+            # stop the other categories or the scheduler itself
+            try:
+                self._tick_edition(edition, now)
+            except Exception as e:
+                print(f"[scheduler] {edition.category}: tick failed: {type(e).__name__}: {e}")
+
+    def _tick_edition(self, edition, now):
+        running = self._poll(edition, now)
+        if now < edition.next_run_at:
+            return
+
+        if running:
+            record_coalesced_run(edition.category, edition.next_run_at, edition.interval_seconds)
+            print(f"[scheduler] {edition.category}: previous run still in flight, trigger coalesced")
+        else:
+            self._start(edition, now)
+        for missed in edition.advance(now):
+            record_coalesced_run(edition.category, missed, edition.interval_seconds)
+
+    def run_forever(self):
+        """Tick until interrupted"""
+        try:
+            while True:
+                self.tick()
+                time.sleep(TICK_SECONDS)
+        except KeyboardInterrupt:
+            print("[scheduler] stopping")
+        finally:
+            if self.orchestrator is not None:
+                self.orchestrator.shutdown()
+
+
+def print_report():
+    """Print lag and duration statistics per category"""
+    stats = get_schedule_stats()
+    if not stats:
+        print("No schedule runs recorded")
+        return
+    for row in stats:
+        print(f"{row['category']}: {row['runs']} runs, {row['coalesced']} coalesced, "
+              f"{row['failed']} failed, {row['overruns']} longer than the "
+              f"{row['interval_seconds'] or 0:.0f}s interval")
+        if row['runs']:
+            print(f"  lag avg {row['avg_lag_seconds'] or 0:.1f}s max {row['max_lag_seconds'] or 0:.1f}s, "
+                  f"duration avg {row['avg_duration_seconds'] or 0:.1f}s "
+                  f"max {row['max_duration_seconds'] or 0:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run news video editions on a schedule")
+    parser.add_argument('--every', nargs='+', metavar='CATEGORY=INTERVAL',
+                        help="Category and interval, e.g. technology=1h business=90m")
+    parser.add_argument('--stories', type=int, default=4, help="Stories per edition")
+    parser.add_argument('--jitter', type=parse_jitter, default=DEFAULT_JITTER_SECONDS,
+                        help="Maximum random delay per trigger, e.g. 90 or 2m (plain numbers are seconds; default: 120s)")
+    parser.add_argument('--upload', action='store_true', help="Upload finished editions to Supabase")
+    parser.add_argument('--enqueue', action='store_true',
+                        help="Queue runs for orchestration_agent.py --worker processes")
+    parser.add_argument('--deadline', action='store_true',
+                        help="Each run must finish within its slot; quality is reduced as needed")
+    parser.add_argument('--report', action='store_true', help="Print schedule lag/duration stats")
+    args = parser.parse_args()
+
+    if args.report:
+        print_report()
+        return
+    if not args.every:
+        parser.error("--every is required unless --report is given")
+
+    intervals = {}
+    for item in args.every:
+        category, _, interval = item.partition('=')
+        if not interval:
+            parser.error(f"Expected CATEGORY=INTERVAL, got '{item}'")
+        try:
+            intervals[category] = parse_interval(interval)
+        except ValueError as e:
+            parser.error(f"Bad interval for {category}: {e}")
+
+    scheduler = EditionScheduler(
+        intervals, story_count=args.stories, jitter_seconds=args.jitter,
+        upload=args.upload, enqueue=args.enqueue, slot_deadline=args.deadline
+    )
+    scheduler.run_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+"""
+Resident warm worker for the news video pipeline.
+
+A cold run pays for `import whisper` (torch), the Whisper model load,
+load_dotenv and building the API clients before doing any work. The warm
+worker pays that once: it imports the pipeline, loads the Whisper model and
+creates the shared clients at startup, then accepts editions over a local
+socket (multiprocessing.connection, authenticated with WARM_WORKER_AUTHKEY)
+and runs them on one long-lived Orchestrator, so its resource limits and core
+budgets are shared by every submitted edition.
+
+Models that sit unused for WARM_MODEL_IDLE_SECONDS are evicted to give the
+memory back; the next edition reloads them. `status` reports the daemon's RSS,
+loaded models, evictions and per-edition latency.
+
+This module only imports the pipeline inside `serve`, so `submit`, `status`
+and `stop` start in milliseconds.
+
+Usage:
+    python warm_worker.py serve [--model base] [--idle-evict 900]
+    python warm_worker.py submit --categories technology business --stories 4 [--upload]
+    python warm_worker.py status
+    python warm_worker.py stop
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+from pathlib import Path
+
+
+DEFAULT_ADDRESS = os.getenv(
+    "WARM_WORKER_ADDRESS", str(Path(tempfile.gettempdir()) / "news_video_worker.sock")
+)
+AUTHKEY = os.getenv("WARM_WORKER_AUTHKEY", "news-video-worker").encode()
+
+# Whisper models unused for this long are evicted
+WARM_MODEL_IDLE_SECONDS = float(os.getenv("WARM_MODEL_IDLE_SECONDS", 900))
+
+# How often the janitor thread looks for idle models
+EVICTION_CHECK_SECONDS = 30.0
+
+
+class WarmWorker:
+    """
+    The daemon: pipeline modules, Whisper model, API clients and one Orchestrator kept warm.
+
+    Args:
+        address: Unix socket path to listen on
+        model_name: Whisper model to preload
+        idle_evict_seconds: Evict models idle for this long (0 disables eviction)
+        cores: Core budget for the orchestrator (see Orchestrator)
+    """
+
+    def __init__(self, address=DEFAULT_ADDRESS, model_name="base",
+                 idle_evict_seconds=WARM_MODEL_IDLE_SECONDS, cores=None):
+        self.address = address
+        self.model_name = model_name
+        self.idle_evict_seconds = idle_evict_seconds
+        self.cores = cores
+        self.started_at = time.time()
+        self.cold_start_seconds = None
+        self.jobs = []
+        self.evictions = []
+        self.running = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def warm_up(self):
+        """Import the pipeline and build everything a cold run would build per edition"""
+        start = time.monotonic()
+        import orchestration_agent
+        from clients import get_http_session, get_openai_client
+        from video_gen import get_whisper_model
+
+        self.pipeline = orchestration_agent
+        self.orchestrator = orchestration_agent.Orchestrator(cores=self.cores)
+        get_openai_client()
+        get_http_session()
+        get_whisper_model(self.model_name)
+        self.cold_start_seconds = round(time.monotonic() - start, 3)
+        print(f"Warm worker ready in {self.cold_start_seconds:.1f}s "
+              f"(RSS {self.memory()['rss_mb']} MB)")
+
+    def memory(self):
+        from tracing import current_rss_kb, peak_rss_kb
+        return {
+            'rss_mb': round(current_rss_kb() / 1024, 1),
+            'peak_rss_mb': round(peak_rss_kb() / 1024, 1),
+        }
+
+    def status(self):
+        """
+        Describe the daemon.
+
+        Returns:
+            dict: uptime, cold start, memory, loaded models, evictions, running and finished jobs
+        """
+        from video_gen import loaded_whisper_models
+        with self._lock:
+            jobs = list(self.jobs)
+            running = self.running
+            evictions = list(self.evictions)
+        return {
+            'pid': os.getpid(),
+            'uptime_seconds': round(time.time() - self.started_at, 1),
+            'cold_start_seconds': self.cold_start_seconds,
+            'memory': self.memory(),
+            'models': loaded_whisper_models(),
+            'idle_evict_seconds': self.idle_evict_seconds,
+            'evictions': evictions[-10:],
+            'running': running,
+            'jobs_done': len(jobs),
+            'recent_jobs': jobs[-10:],
+        }
+
+    def run_job(self, request):
+        """
+        Run a submitted batch of editions on the warm orchestrator.
+
+        Returns:
+            dict: category -> {'video_path', 'wall_seconds', 'timings'} or {'error', 'stage', ...}
+        """
+        from deadline import parse_deadline
+        with self._lock:
+            self.running += 1
+        start = time.monotonic()
+        try:
+            results = self.pipeline.run_editions(
+                request['categories'],
+                story_count=request.get('stories', 4),
+                upload=request.get('upload', False),
+                share_fetch=request.get('share_fetch', True),
+                deadline=parse_deadline(request['deadline']) if request.get('deadline') else None,
+                orchestrator=self.orchestrator,
+            )
+        finally:
+            with self._lock:
+                self.running -= 1
+        summary = {}
+        for category, result in results.items():
+            entry = {'wall_seconds': result['wall_seconds'], 'timings': result['timings']}
+            if 'error' in result:
+                entry.update(error=result['error'], stage=result['stage'])
+            else:
+                entry['video_path'] = result['values'].get('video_path')
+            summary[category] = entry
+        with self._lock:
+            self.jobs.append({
+                'categories': request['categories'],
+                'seconds': round(time.monotonic() - start, 3),
+                'failed': sum(1 for entry in summary.values() if 'error' in entry),
+                'finished_at': time.time(),
+            })
+        return summary
+
+    def _evict_idle_models(self):
+        from video_gen import evict_idle_whisper_models
+        while not self._stop.wait(min(EVICTION_CHECK_SECONDS, self.idle_evict_seconds)):
+            if self.running:
+                continue
+            before = self.memory()['rss_mb']
+            evicted = evict_idle_whisper_models(self.idle_evict_seconds)
+            if evicted:
+                after = self.memory()['rss_mb']
+                print(f"Evicted idle Whisper model(s) {evicted}: RSS {before} MB -> {after} MB")
+                with self._lock:
+                    self.evictions.append({'models': evicted, 'at': time.time(),
+                                           'rss_mb_before': before, 'rss_mb_after': after})
+
+    def _handle(self, connection):
+        with connection:
+            try:
+                request = connection.recv()
+                op = request.get('op')
+                if op == 'run':
+                    reply = {'ok': True, 'results': self.run_job(request)}
+                elif op == 'status':
+                    reply = {'ok': True, 'status': self.status()}
+                elif op == 'stop':
+                    self._stop.set()
+                    reply = {'ok': True}
+                else:
+                    reply = {'ok': False, 'error': f"Unknown op: {op}"}
+            except Exception as e:
+                reply = {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+            try:
+                connection.send(reply)
+            except OSError:
+                print("Client went away before the reply was sent")
+
+    def serve(self):
+        """Warm up, then accept connections until a stop request or Ctrl-C"""
+        self.warm_up()
+        from outbox import OutboxFlusher
+        flusher = OutboxFlusher().start()
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+        listener = Listener(self.address, family='AF_UNIX', authkey=AUTHKEY)
+        if self.idle_evict_seconds:
+            threading.Thread(target=self._evict_idle_models, daemon=True).start()
+        # accept() blocks, so a stop request is noticed by the accept loop thread
+        threading.Thread(target=self._accept_loop, args=(listener,), daemon=True).start()
+        print(f"Listening on {self.address}")
+        try:
+            while not self._stop.wait(1.0):
+                pass
+        except KeyboardInterrupt:
+            pass
+        finally:
+            print("Warm worker stopping")
+            listener.close()
+            self.orchestrator.shutdown()
+            flusher.stop()
+            if os.path.exists(self.address):
+                os.unlink(self.address)
+
+    def _accept_loop(self, listener):
+        while not self._stop.is_set():
+            try:
+                connection = listener.accept()
+            except OSError:
+                # Listener closed, or a client failed authentication
+                if self._stop.is_set():
+                    return
+                continue
+            threading.Thread(target=self._handle, args=(connection,), daemon=True).start()
+
+
+def send_request(request, address=DEFAULT_ADDRESS):
+    """
+    Send one request to the warm worker and wait for its reply.
+
+    Raises:
+        ConnectionError: If no worker is listening at address
+    """
+    try:
+        connection = Client(address, family='AF_UNIX', authkey=AUTHKEY)
+    except (FileNotFoundError, ConnectionRefusedError) as e:
+        raise ConnectionError(f"No warm worker at {address}; start one with 'warm_worker.py serve'") from e
+    with connection:
+        connection.send(request)
+        return connection.recv()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm worker daemon for news video editions")
+    parser.add_argument('--address', default=DEFAULT_ADDRESS, help="Unix socket of the worker")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve = commands.add_parser('serve', help="Run the daemon")
+    serve.add_argument('--model', default="base", help="Whisper model to keep loaded")
+    serve.add_argument('--idle-evict', type=float, default=WARM_MODEL_IDLE_SECONDS,
+                       help="Evict models idle for this many seconds (0 = never)")
+    serve.add_argument('--cores', type=int, default=None, help="Core budget (0 = no budgets)")
+
+    submit = commands.add_parser('submit', help="Run editions on the daemon and wait for them")
+    submit.add_argument('--categories', nargs='+', default=['technology'])
+    submit.add_argument('--stories', type=int, default=4)
+    submit.add_argument('--upload', action='store_true')
+    submit.add_argument('--no-shared-fetch', action='store_true')
+    submit.add_argument('--deadline', help="Publish deadline ('18:30' or '+20m')")
+
+    commands.add_parser('status', help="Print the daemon's memory, models and recent jobs")
+    commands.add_parser('stop', help="Stop the daemon")
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        WarmWorker(args.address, args.model, args.idle_evict, args.cores).serve()
+        return
+
+    if args.command == 'submit':
+        request = {'op': 'run', 'categories': args.categories, 'stories': args.stories,
+                   'upload': args.upload, 'share_fetch': not args.no_shared_fetch}
+        if args.deadline:
+            request['deadline'] = args.deadline
+        start = time.monotonic()
+        reply = send_request(request, args.address)
+        if not reply['ok']:
+            sys.exit(f"Worker error: {reply['error']}")
+        for category, result in reply['results'].items():
+            if 'error' in result:
+                print(f"{category}: failed in stage {result['stage']} after {result['wall_seconds']:.1f}s")
+            else:
+                print(f"{category}: {result['video_path']} in {result['wall_seconds']:.1f}s")
+        print(f"Total (including submit round trip): {time.monotonic() - start:.1f}s")
+        return
+
+    reply = send_request({'op': args.command}, args.address)
+    if not reply['ok']:
+        sys.exit(f"Worker error: {reply['error']}")
+    if args.command == 'status':
+        print(json.dumps(reply['status'], indent=2))
+    else:
+        print("Warm worker stopping")
+
+
+if __name__ == "__main__":
+    main()
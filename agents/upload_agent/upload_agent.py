@@ -0,0 +1,95 @@
+"""
+Publishes a finished edition to Supabase.
+
+The video upload, every thumbnail upload and the metadata insert are
+independent, so they run concurrently over the process-wide Supabase client
+and HTTP connection pool; publish latency is the slowest of them rather than
+their sum. The metadata row is inserted without URLs and gets them in one
+update once every file has landed. Only then is the local videos row marked
+completed. If anything fails, the remote metadata row is removed again so a
+retried upload doesn't leave a half-published duplicate behind (a metadata
+insert that fails part-way removes its own row).
+"""
+
+import sys
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+
+AGENTS_DIR = Path(__file__).parent.parent.resolve()
+sys.path.append(str(AGENTS_DIR / 'database'))
+sys.path.append(str(AGENTS_DIR / 'common'))
+
+import database_utils
+from video_database import update_video_status
+from tracing import run_in_context, span
+
+
+# Uploads in flight at once for one edition (video + thumbnails + metadata)
+MAX_CONCURRENT_UPLOADS = 8
+
+
+def _remove_metadata(remote_video_id):
+    # Best effort: the original error is what the caller needs to see
+    try:
+        database_utils.delete_video_metadata(remote_video_id)
+    except Exception as e:
+        print(f"Could not remove metadata of unpublished video {remote_video_id}: {e}")
+
+
+def publish_edition(video_path, thumbnail_paths, script_data, video_id=None):
+    """
+    Upload an edition's video, thumbnails and metadata concurrently.
+
+    Args:
+        video_path: Rendered video file
+        thumbnail_paths: Story thumbnails; the first one is the edition's thumbnail
+        script_data: Summary script dict (date, title, summary, original_titles,
+            sources, tags) as produced by summarize_story
+        video_id: Optional local videos row to mark completed afterwards
+
+    Returns:
+        dict: remote_video_id, video_url, thumbnail_url and thumbnail_urls
+            (one per entry of thumbnail_paths)
+
+    Raises:
+        Exception: The first upload or insert error; nothing is left published
+    """
+    # Stories can share a thumbnail (fallbacks); upload each file once
+    unique_thumbnails = list(dict.fromkeys(thumbnail_paths))
+
+    with span('upload.publish', kind='http', thumbnails=len(unique_thumbnails)):
+        workers = min(MAX_CONCURRENT_UPLOADS, len(unique_thumbnails) + 2)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='upload') as pool:
+            video_future = pool.submit(run_in_context(database_utils.upload_video_to_storage), video_path)
+            thumbnail_futures = {
+                path: pool.submit(run_in_context(database_utils.upload_thumbnail_to_storage), path)
+                for path in unique_thumbnails
+            }
+            metadata_future = pool.submit(run_in_context(database_utils.upload_video_metadata), script_data)
+            wait([video_future, metadata_future, *thumbnail_futures.values()])
+
+        futures = [video_future, metadata_future, *thumbnail_futures.values()]
+        error = next((future.exception() for future in futures if future.exception()), None)
+        if error is not None:
+            if metadata_future.exception() is None:
+                _remove_metadata(metadata_future.result())
+            raise error
+
+        remote_video_id = metadata_future.result()
+        video_url = video_future.result()
+        thumbnail_urls = [thumbnail_futures[path].result() for path in thumbnail_paths]
+        try:
+            database_utils.set_video_urls(remote_video_id, video_url, thumbnail_urls[0] if thumbnail_urls else None)
+        except Exception:
+            _remove_metadata(remote_video_id)
+            raise
+
+    if video_id is not None:
+        update_video_status(video_id, 'completed')
+    print(f"Published video {remote_video_id}: {video_url}")
+    return {
+        'remote_video_id': remote_video_id,
+        'video_url': video_url,
+        'thumbnail_url': thumbnail_urls[0] if thumbnail_urls else None,
+        'thumbnail_urls': thumbnail_urls,
+    }
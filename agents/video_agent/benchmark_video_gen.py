@@ -0,0 +1,461 @@
+#!/usr/bin/env python3
+"""
+Reproducible performance benchmark for the video pipeline.
+
+Generates every input locally (square test images, a lavfi voiceover and canned
+word timestamps), so no OpenAI or Whisper call is made. Each case runs in its
+own child process; wall time, CPU time and peak RSS include the ffmpeg
+processes it launches. Results are printed (or written) as JSON so runs before
+and after a change can be compared.
+
+Usage:
+    python benchmark_video_gen.py
+    python benchmark_video_gen.py --stories 1 4 --durations 20 60 --presets veryfast medium
+    python benchmark_video_gen.py --output bench.json --repeat 3
+    python benchmark_video_gen.py --compare-admission --jobs 4 --asr-model tiny
+
+--compare-admission measures the throughput of a mixed workload (renders and
+Whisper transcriptions running concurrently) twice: as a free-for-all where
+every ffmpeg and torch instance sizes itself to the whole machine, and under
+the CoreScheduler core budgets the orchestrator uses.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+SCRIPT_DIR = Path(__file__).parent.resolve()
+TEST_FILES_DIR = SCRIPT_DIR.parent.parent / "website" / "static" / "test-files"
+TEST_IMAGES = ['one.jpeg', 'two.jpg', 'four.jpg', 'six.jpg']
+
+# Seconds per canned word; roughly the pace of the TTS voice
+WORD_SECONDS = 0.4
+
+DEFAULT_STORY_COUNTS = [1, 4]
+DEFAULT_DURATIONS = [30]
+DEFAULT_PRESETS = ['medium']
+
+# Concurrent jobs per policy in --compare-admission (each is a render plus a transcription)
+DEFAULT_CONTENTION_JOBS = 4
+
+# Policies compared by --compare-admission
+ADMISSION_POLICIES = ['free', 'budget']
+
+# Benchmarked functions (see run_case)
+CASES = [
+    'segment_videoonly',
+    'multi_story_segments',
+    'multi_story_single_pass',
+    'add_captions',
+    'word_captions',
+]
+
+
+def prepare_images(work_dir, count):
+    """
+    Create square 1024x1024 PNG test images.
+
+    Uses the images in website/static/test-files when present, otherwise a
+    lavfi test pattern, so the inputs are identical on every machine.
+    """
+    images = []
+    for i in range(count):
+        output = work_dir / f"image_{i}.png"
+        source = TEST_FILES_DIR / TEST_IMAGES[i % len(TEST_IMAGES)]
+        if source.exists():
+            command = ['ffmpeg', '-y', '-v', 'error', '-i', str(source),
+                       '-vf', 'scale=1024:1024,setsar=1', '-frames:v', '1', str(output)]
+        else:
+            command = ['ffmpeg', '-y', '-v', 'error', '-f', 'lavfi',
+                       '-i', f"testsrc2=size=1024x1024:rate=1:duration=1,hue=h={i * 90}",
+                       '-frames:v', '1', str(output)]
+        subprocess.run(command, check=True)
+        images.append(str(output))
+    return images
+
+
+def prepare_voiceover(work_dir, duration):
+    """Create an MP3 'voiceover' of the given duration with lavfi"""
+    output = work_dir / f"voiceover_{duration}s.mp3"
+    subprocess.run([
+        'ffmpeg', '-y', '-v', 'error',
+        '-f', 'lavfi', '-i', f"sine=frequency=220:sample_rate=24000:duration={duration}",
+        '-c:a', 'libmp3lame', '-b:a', '64k',
+        str(output)
+    ], check=True)
+    return str(output)
+
+
+def prepare_video(work_dir, audio_file, duration):
+    """Create a 1024x1024 video with audio to caption (input for add_captions)"""
+    output = work_dir / f"uncaptioned_{duration}s.mp4"
+    subprocess.run([
+        'ffmpeg', '-y', '-v', 'error',
+        '-f', 'lavfi', '-i', f"testsrc2=size=1024x1024:rate=25:duration={duration}",
+        '-i', audio_file,
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-pix_fmt', 'yuv420p',
+        '-c:a', 'aac', '-shortest',
+        str(output)
+    ], check=True)
+    return str(output)
+
+
+def canned_word_segments(duration):
+    """Word timestamps shaped like Whisper output: (start, end, word) every WORD_SECONDS"""
+    count = int(duration / WORD_SECONDS)
+    return [
+        (i * WORD_SECONDS, i * WORD_SECONDS + WORD_SECONDS * 0.9, f"word{i}")
+        for i in range(count)
+    ]
+
+
+def equal_boundaries(duration, story_count):
+    """Split the voiceover into equal, continuous story boundaries"""
+    step = duration / story_count
+    return [(i * step, duration if i == story_count - 1 else (i + 1) * step)
+            for i in range(story_count)]
+
+
+def run_contention(spec, video_gen):
+    """
+    Run spec['jobs'] renders and transcriptions at once. Called in the child process.
+    
+    With spec['policy'] == 'budget' each job first reserves cores from a
+    CoreScheduler (same demands as the orchestrator); with 'free' they all
+    start immediately with no thread limits. The transcriptions share one
+    Whisper model, so under both policies they take turns on its
+    transcription lock; a budgeted one only reserves cores once it holds it.
+    
+    Returns:
+        dict: {'ok': bool, 'output_bytes': None, 'jobs_done': int, 'job_seconds': list}
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from resources import DEFAULT_CORE_DEMANDS, CoreScheduler
+    from tracing import run_in_context
+    
+    work_dir = Path(spec['work_dir'])
+    duration = spec['duration']
+    images = spec['images'][:spec['stories']]
+    words = canned_word_segments(duration)
+    scheduler = CoreScheduler(spec['cores']) if spec['policy'] == 'budget' else None
+    if spec['asr_model']:
+        video_gen.get_whisper_model(spec['asr_model'])
+    
+    def budget(resource):
+        if scheduler is None:
+            return contextlib.nullcontext()
+        return scheduler.reserve(*DEFAULT_CORE_DEMANDS[resource], name=resource)
+    
+    def render_job(index):
+        output_file = str(work_dir / f"contention_{os.getpid()}_{index}.mp4")
+        start = time.monotonic()
+        with budget('render'):
+            ok = video_gen.create_multi_story_video(
+                spec['audio'], images, equal_boundaries(duration, len(images)), output_file,
+                render_mode=video_gen.RENDER_MODE_SINGLE_PASS, use_segment_cache=False,
+                word_segments=words
+            )
+        if os.path.exists(output_file):
+            os.remove(output_file)
+        return bool(ok), time.monotonic() - start
+    
+    def asr_job(index):
+        start = time.monotonic()
+        with video_gen.whisper_transcribe_lock(spec['asr_model']), budget('asr'):
+            video_gen.get_word_timestamps_free(spec['audio'], model_name=spec['asr_model'])
+        return True, time.monotonic() - start
+    
+    jobs = [(render_job, i) for i in range(spec['jobs'])]
+    if spec['asr_model']:
+        jobs += [(asr_job, i) for i in range(spec['jobs'])]
+    with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+        futures = [pool.submit(run_in_context(job), index) for job, index in jobs]
+        outcomes = [future.result() for future in futures]
+    
+    return {
+        'ok': all(ok for ok, _ in outcomes),
+        'output_bytes': None,
+        'jobs_done': sum(1 for ok, _ in outcomes if ok),
+        'job_seconds': [round(seconds, 3) for _, seconds in outcomes],
+    }
+
+
+def run_case(spec):
+    """
+    Run one benchmark case in this process. Called in the child process.
+
+    Args:
+        spec: Dict with case, stories, duration, preset, work_dir and fixture paths
+
+    Returns:
+        dict: {'ok': bool, 'output_bytes': int or None}
+    """
+    sys.path.insert(0, str(SCRIPT_DIR))
+    import video_gen
+
+    work_dir = Path(spec['work_dir'])
+    output_file = str(work_dir / f"out_{os.getpid()}.mp4")
+    duration = spec['duration']
+    images = spec['images'][:spec['stories']]
+    words = canned_word_segments(duration)
+
+    case = spec['case']
+    if case == 'contention':
+        return run_contention(spec, video_gen)
+    if case == 'segment_videoonly':
+        ok = video_gen.create_video_segment_videoonly(images[0], duration, 'zoom_in', output_file)
+    elif case in ('multi_story_segments', 'multi_story_single_pass'):
+        mode = (video_gen.RENDER_MODE_SINGLE_PASS if case == 'multi_story_single_pass'
+                else video_gen.RENDER_MODE_SEGMENTS)
+        ok = video_gen.create_multi_story_video(
+            spec['audio'], images, equal_boundaries(duration, len(images)), output_file,
+            render_mode=mode, use_segment_cache=False, word_segments=words
+        )
+    elif case == 'add_captions':
+        ok = video_gen.add_captions_to_video(
+            spec['audio'], spec['video'], output_file, word_segments=words
+        )
+    elif case == 'word_captions':
+        ok = video_gen.create_video_with_word_captions(
+            spec['audio'], images[0], output_file, word_segments=words,
+            telemetry=video_gen.RenderTelemetry()
+        )
+    else:
+        raise ValueError(f"Unknown benchmark case: {case}")
+
+    output_bytes = os.path.getsize(output_file) if ok and os.path.exists(output_file) else None
+    if os.path.exists(output_file):
+        os.remove(output_file)
+    return {'ok': bool(ok), 'output_bytes': output_bytes}
+
+
+def measure_case(spec, env=None):
+    """
+    Run one case in a child process and measure it.
+
+    wait4 reports the child's resource usage including the ffmpeg processes it
+    waited for, so CPU time and peak RSS cover the whole render.
+
+    Returns:
+        dict: Case description plus wall_seconds, cpu_seconds, peak_rss_kb,
+            output_bytes and ok
+    """
+    result_file = Path(spec['work_dir']) / f"result_{spec['case']}.json"
+    command = [sys.executable, str(Path(__file__).resolve()),
+               '--run-case', json.dumps(spec), '--result-file', str(result_file)]
+
+    child_env = dict(os.environ, **(env or {}))
+    child_env['X264_PRESET'] = spec['preset']
+
+    # stderr goes to a file: a pipe nobody reads while wait4 blocks would
+    # stall a chatty child once the pipe buffer fills
+    with tempfile.TemporaryFile(mode='w+') as stderr_file:
+        start = time.monotonic()
+        process = subprocess.Popen(command, env=child_env,
+                                   stdout=subprocess.DEVNULL, stderr=stderr_file, text=True)
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        wall_seconds = time.monotonic() - start
+        stderr_file.seek(0)
+        stderr = stderr_file.read()
+
+    outcome = {'ok': False, 'output_bytes': None}
+    if process.returncode == 0 and result_file.exists():
+        outcome = json.loads(result_file.read_text())
+        result_file.unlink()
+    elif stderr:
+        outcome['error'] = stderr[-500:]
+
+    return {
+        'case': spec['case'],
+        'stories': spec['stories'],
+        'duration': spec['duration'],
+        'preset': spec['preset'],
+        'policy': spec.get('policy'),
+        'wall_seconds': round(wall_seconds, 3),
+        'cpu_seconds': round(usage.ru_utime + usage.ru_stime, 3),
+        'peak_rss_kb': usage.ru_maxrss,
+        **outcome,
+    }
+
+
+def environment_info():
+    """Describe the machine and ffmpeg build the numbers came from"""
+    version = subprocess.run(['ffmpeg', '-version'], capture_output=True, text=True)
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'ffmpeg': version.stdout.splitlines()[0] if version.stdout else None,
+    }
+
+
+def build_specs(args, fixtures, work_dir):
+    """Expand the CLI matrix into a list of case specs"""
+    specs = []
+    for preset in args.presets:
+        for duration in args.durations:
+            for case in args.cases:
+                # Single-image cases don't depend on the story count
+                story_counts = (args.stories if case.startswith('multi_story')
+                                else [1])
+                for stories in story_counts:
+                    specs.append({
+                        'case': case,
+                        'stories': stories,
+                        'duration': duration,
+                        'preset': preset,
+                        'work_dir': str(work_dir),
+                        'images': fixtures['images'],
+                        'audio': fixtures['audio'][duration],
+                        'video': fixtures['video'][duration],
+                    })
+    return specs
+
+
+def run_benchmarks(args):
+    """Prepare fixtures, run every case args.repeat times and return the report"""
+    work_dir = Path(tempfile.mkdtemp(prefix='video_bench_'))
+    try:
+        fixtures = {
+            'images': prepare_images(work_dir, max(args.stories)),
+            'audio': {},
+            'video': {},
+        }
+        for duration in args.durations:
+            fixtures['audio'][duration] = prepare_voiceover(work_dir, duration)
+            fixtures['video'][duration] = prepare_video(work_dir, fixtures['audio'][duration], duration)
+
+        results = []
+        for spec in build_specs(args, fixtures, work_dir):
+            for run in range(args.repeat):
+                print(f"Running {spec['case']} stories={spec['stories']} "
+                      f"duration={spec['duration']}s preset={spec['preset']} ({run + 1}/{args.repeat})...",
+                      file=sys.stderr)
+                result = measure_case(spec)
+                result['run'] = run
+                results.append(result)
+
+        return {
+            'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'environment': environment_info(),
+            'results': results,
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def compare_admission(args):
+    """
+    Run the mixed render + transcription workload under each admission policy.
+    
+    Returns:
+        dict: Report with every run and, per policy, the best wall time and
+            jobs per minute, plus the budget/free speedup
+    """
+    work_dir = Path(tempfile.mkdtemp(prefix='video_bench_'))
+    stories = max(args.stories)
+    duration = args.durations[0]
+    asr_model = None if args.asr_model == 'none' else args.asr_model
+    if (args.cores or os.cpu_count()) < 2:
+        print("Warning: one core available; both policies get the same single core, "
+              "so this comparison says nothing about core budgets", file=sys.stderr)
+    try:
+        images = prepare_images(work_dir, stories)
+        audio = prepare_voiceover(work_dir, duration)
+        results = []
+        for run in range(args.repeat):
+            for policy in ADMISSION_POLICIES:
+                spec = {
+                    'case': 'contention',
+                    'policy': policy,
+                    'jobs': args.jobs,
+                    'cores': args.cores or os.cpu_count(),
+                    'asr_model': asr_model,
+                    'stories': stories,
+                    'duration': duration,
+                    'preset': args.presets[0],
+                    'work_dir': str(work_dir),
+                    'images': images,
+                    'audio': audio,
+                }
+                print(f"Running contention policy={policy} jobs={args.jobs} "
+                      f"asr={asr_model} ({run + 1}/{args.repeat})...", file=sys.stderr)
+                result = measure_case(spec)
+                result['run'] = run
+                results.append(result)
+        
+        summary = {}
+        for policy in ADMISSION_POLICIES:
+            runs = [r for r in results if r['policy'] == policy and r['ok']]
+            if not runs:
+                summary[policy] = None
+                continue
+            best = min(runs, key=lambda r: r['wall_seconds'])
+            summary[policy] = {
+                'wall_seconds': best['wall_seconds'],
+                'cpu_seconds': best['cpu_seconds'],
+                'jobs_per_minute': round(best['jobs_done'] * 60 / best['wall_seconds'], 2),
+            }
+        if summary.get('free') and summary.get('budget'):
+            summary['speedup'] = round(summary['free']['wall_seconds'] / summary['budget']['wall_seconds'], 3)
+        
+        return {
+            'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'environment': environment_info(),
+            'results': results,
+            'admission_comparison': summary,
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the video generation pipeline")
+    parser.add_argument('--stories', type=int, nargs='+', default=DEFAULT_STORY_COUNTS,
+                        help="Story counts for multi-story cases")
+    parser.add_argument('--durations', type=int, nargs='+', default=DEFAULT_DURATIONS,
+                        help="Voiceover durations in seconds")
+    parser.add_argument('--presets', nargs='+', default=DEFAULT_PRESETS,
+                        help="x264 presets")
+    parser.add_argument('--cases', nargs='+', default=CASES, choices=CASES,
+                        help="Functions to benchmark")
+    parser.add_argument('--repeat', type=int, default=1, help="Runs per case")
+    parser.add_argument('--output', help="Write the JSON report here instead of stdout")
+    parser.add_argument('--compare-admission', action='store_true',
+                        help="Compare a concurrent render + ASR workload with and without core budgets")
+    parser.add_argument('--jobs', type=int, default=DEFAULT_CONTENTION_JOBS,
+                        help="Concurrent renders (and transcriptions) for --compare-admission")
+    parser.add_argument('--asr-model', default='tiny',
+                        help="Whisper model for the transcriptions in --compare-admission ('none' to skip)")
+    parser.add_argument('--cores', type=int, help="Cores for the budget policy (default: all)")
+    parser.add_argument('--run-case', help=argparse.SUPPRESS)
+    parser.add_argument('--result-file', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        # Child process: run exactly one case, report through the result file
+        outcome = run_case(json.loads(args.run_case))
+        Path(args.result_file).write_text(json.dumps(outcome))
+        return
+
+    report = compare_admission(args) if args.compare_admission else run_benchmarks(args)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output)
+        print(f"Benchmark report written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""
+Run ffmpeg with machine-readable progress output and collect render telemetry.
+
+ffmpeg is started with `-progress pipe:1`, which prints key=value blocks
+(frame, fps, out_time_us, speed, progress) while it works. Each block is turned
+into a progress event passed to an optional callback, and every finished run is
+recorded as a stage with its wall time, CPU time and peak memory so slow stages
+of a production render can be spotted.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / 'common'))
+from tracing import span
+from resources import current_core_budget, ffmpeg_thread_args
+
+
+# Number of stderr lines kept for error reports
+STDERR_TAIL_LINES = 50
+
+
+class RenderTelemetry:
+    """
+    Collects progress events and per-stage timings for one render.
+
+    Args:
+        progress_callback: Optional callable receiving each progress event dict
+            with keys: stage, frame, fps, speed, out_time, expected_duration,
+            eta, done
+    """
+
+    def __init__(self, progress_callback=None):
+        self.progress_callback = progress_callback
+        self.stages = []
+        self._lock = threading.Lock()
+
+    def emit(self, event):
+        """Forward a progress event to the callback, if any"""
+        if self.progress_callback is not None:
+            self.progress_callback(event)
+
+    def record_stage(self, stage, wall_seconds, cpu_seconds, max_rss_kb, frames, returncode):
+        """Record the outcome of one finished ffmpeg run"""
+        with self._lock:
+            self.stages.append({
+                'stage': stage,
+                'wall_seconds': round(wall_seconds, 3),
+                'cpu_seconds': round(cpu_seconds, 3) if cpu_seconds is not None else None,
+                'max_rss_kb': max_rss_kb,
+                'frames': frames,
+                'returncode': returncode,
+            })
+
+    def summary(self):
+        """
+        Aggregate recorded runs by stage name.
+
+        Returns:
+            dict: stage -> {'runs', 'wall_seconds', 'cpu_seconds', 'frames'}
+        """
+        totals = {}
+        with self._lock:
+            for record in self.stages:
+                entry = totals.setdefault(record['stage'], {
+                    'runs': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'frames': 0
+                })
+                entry['runs'] += 1
+                entry['wall_seconds'] = round(entry['wall_seconds'] + record['wall_seconds'], 3)
+                entry['cpu_seconds'] = round(entry['cpu_seconds'] + (record['cpu_seconds'] or 0.0), 3)
+                entry['frames'] += record['frames'] or 0
+        return totals
+
+    def save(self, path):
+        """Write the per-run records and per-stage summary to a JSON file"""
+        with self._lock:
+            stages = list(self.stages)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'stages': stages, 'summary': self.summary()}, f, indent=2)
+
+
+def print_progress_event(event):
+    """Progress callback that prints one status line per event"""
+    eta = f"{event['eta']:.1f}s" if event['eta'] is not None else "?"
+    speed = f"{event['speed']:.2f}x" if event['speed'] is not None else "?"
+    print(f"[{event['stage']}] frame={event['frame']} fps={event['fps']} speed={speed} eta={eta}")
+
+
+def _parse_float(value):
+    try:
+        return float(value.rstrip('x'))
+    except (AttributeError, ValueError):
+        return None
+
+
+def build_progress_event(stage, fields, expected_duration=None):
+    """
+    Convert one ffmpeg progress block into an event dict.
+
+    Args:
+        stage: Name of the render stage
+        fields: Dict of key=value pairs from one progress block
+        expected_duration: Expected output duration in seconds (for the ETA)
+
+    Returns:
+        dict: Progress event
+    """
+    frame = fields.get('frame')
+    out_time_us = _parse_float(fields.get('out_time_us') or fields.get('out_time_ms'))
+    out_time = out_time_us / 1_000_000 if out_time_us is not None and out_time_us >= 0 else None
+    speed = _parse_float(fields.get('speed'))
+    done = fields.get('progress') == 'end'
+
+    eta = None
+    if done:
+        eta = 0.0
+    elif expected_duration and out_time is not None and speed:
+        eta = max(expected_duration - out_time, 0.0) / speed
+
+    return {
+        'stage': stage,
+        'frame': int(frame) if frame and frame.isdigit() else None,
+        'fps': _parse_float(fields.get('fps')),
+        'speed': speed,
+        'out_time': out_time,
+        'expected_duration': expected_duration,
+        'eta': eta,
+        'done': done,
+    }
+
+
+def run_ffmpeg(command, stage, telemetry=None, expected_duration=None):
+    """
+    Run an ffmpeg command, streaming progress events and recording stage timings.
+
+    Behaves like subprocess.run(command, check=True): a non-zero exit raises
+    subprocess.CalledProcessError, with the tail of ffmpeg's stderr attached.
+
+    Args:
+        command: ffmpeg command list (starting with 'ffmpeg')
+        stage: Name of the render stage (e.g. 'segment_zoompan', 'caption_burn')
+        telemetry: Optional RenderTelemetry receiving events and timings
+        expected_duration: Expected output duration in seconds (for the ETA)
+
+    Returns:
+        subprocess.CompletedProcess
+    """
+    # Keep encoders and filters within the stage's core budget, if it has one
+    threads = current_core_budget()
+    command = ffmpeg_thread_args(command, threads)
+    command = [command[0], '-progress', 'pipe:1', '-nostats'] + list(command[1:])
+
+    with span(f"ffmpeg.{stage}", kind='subprocess', threads=threads) as attributes:
+        return _run_ffmpeg_process(command, stage, telemetry, expected_duration, attributes)
+
+
+def _run_ffmpeg_process(command, stage, telemetry, expected_duration, attributes):
+    start = time.monotonic()
+    process = subprocess.Popen(
+        command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+    )
+
+    # Drain stderr on a thread so a chatty ffmpeg can't block on a full pipe
+    stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+    stderr_reader = threading.Thread(
+        target=lambda: stderr_tail.extend(process.stderr), daemon=True
+    )
+    stderr_reader.start()
+
+    fields = {}
+    last_frame = None
+    for line in process.stdout:
+        key, _, value = line.strip().partition('=')
+        if not key:
+            continue
+        fields[key] = value.strip()
+        if key == 'progress':
+            event = build_progress_event(stage, fields, expected_duration)
+            if event['frame'] is not None:
+                last_frame = event['frame']
+            if telemetry is not None:
+                telemetry.emit(event)
+            fields = {}
+
+    cpu_seconds = None
+    max_rss_kb = None
+    if hasattr(os, 'wait4'):
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        cpu_seconds = usage.ru_utime + usage.ru_stime
+        max_rss_kb = usage.ru_maxrss
+    else:
+        process.wait()
+    stderr_reader.join()
+    wall_seconds = time.monotonic() - start
+
+    if telemetry is not None:
+        telemetry.record_stage(
+            stage, wall_seconds, cpu_seconds, max_rss_kb, last_frame, process.returncode
+        )
+    attributes.update(
+        ffmpeg_cpu_seconds=cpu_seconds, ffmpeg_max_rss_kb=max_rss_kb,
+        frames=last_frame, returncode=process.returncode
+    )
+
+    stderr = ''.join(stderr_tail)
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, command, stderr=stderr)
+    return subprocess.CompletedProcess(command, process.returncode, stderr=stderr)
@@ -0,0 +1,152 @@
+"""
+Job-scoped scratch directories for video renders.
+
+Every render writes its intermediates (segments, concat lists, captions) into
+its own directory so several renders can run on one host without clobbering
+each other's files. Workspaces are placed on a RAM-backed filesystem such as
+/dev/shm when one is available and has room, and are always removed when the
+render finishes, even if it fails. Workspaces live in a subdirectory of their
+own (WORKSPACE_DIR_NAME) so other programs' files in the shared temp
+directories are never touched; leftovers of a killed process are swept from
+it the first time this process renders into it.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+
+# RAM-backed filesystems tried (in order) before falling back to the temp dir
+RAM_WORKSPACE_ROOTS = ['/dev/shm']
+
+# Don't put a workspace in RAM unless at least this much space is free
+MIN_RAM_WORKSPACE_BYTES = 512 * 1024 * 1024
+
+# Subdirectory of the temp or RAM root holding this project's workspaces;
+# only it is swept for leftovers
+WORKSPACE_DIR_NAME = 'news_video_render'
+
+WORKSPACE_PREFIX = 'render_'
+
+# Workspaces older than this are leftovers (no render runs that long)
+STALE_WORKSPACE_SECONDS = 6 * 3600
+
+# Roots already swept for leftovers by this process
+_swept_roots = set()
+_sweep_lock = threading.Lock()
+
+
+def get_workspace_root(use_ram=True):
+    """
+    Pick the directory new render workspaces are created in.
+
+    RENDER_WORKSPACE_ROOT in the environment always wins. Otherwise a writable
+    RAM-backed filesystem with enough free space is used, falling back to the
+    system temp directory. Either way workspaces go into its
+    WORKSPACE_DIR_NAME subdirectory.
+
+    Args:
+        use_ram: Prefer a RAM-backed filesystem (tmpfs) when available
+
+    Returns:
+        Path: Workspace root directory (may not exist yet)
+    """
+    configured = os.getenv("RENDER_WORKSPACE_ROOT")
+    if configured:
+        return Path(configured) / WORKSPACE_DIR_NAME
+
+    if use_ram:
+        for root in RAM_WORKSPACE_ROOTS:
+            if os.path.isdir(root) and os.access(root, os.W_OK):
+                if shutil.disk_usage(root).free >= MIN_RAM_WORKSPACE_BYTES:
+                    return Path(root) / WORKSPACE_DIR_NAME
+
+    return Path(tempfile.gettempdir()) / WORKSPACE_DIR_NAME
+
+
+@contextmanager
+def render_workspace(job_id=None, use_ram=True, keep=False):
+    """
+    Create an isolated workspace directory for one render.
+
+    Args:
+        job_id: Optional job identifier (e.g. the videos.id) included in the
+            directory name to make leftovers traceable
+        use_ram: Prefer a RAM-backed filesystem (tmpfs) when available
+        keep: Leave the directory in place for debugging instead of removing it
+
+    Yields:
+        Path: The workspace directory
+    """
+    root = get_workspace_root(use_ram)
+    root.mkdir(parents=True, exist_ok=True)
+    _sweep_once(root)
+    prefix = f"{WORKSPACE_PREFIX}{job_id}_" if job_id is not None else WORKSPACE_PREFIX
+    workspace = Path(tempfile.mkdtemp(prefix=prefix, dir=root))
+    try:
+        yield workspace
+    finally:
+        if not keep:
+            shutil.rmtree(workspace, ignore_errors=True)
+
+
+@contextmanager
+def ensure_workspace(workspace=None):
+    """
+    Use the caller's workspace if one was given, otherwise create a temporary one.
+
+    Args:
+        workspace: Existing workspace directory, or None
+
+    Yields:
+        Path: The workspace directory
+    """
+    if workspace is not None:
+        yield Path(workspace)
+    else:
+        with render_workspace() as created:
+            yield created
+
+
+def cleanup_stale_workspaces(max_age_seconds=STALE_WORKSPACE_SECONDS, use_ram=True):
+    """
+    Remove workspaces left behind by renders that were killed before cleanup.
+
+    Args:
+        max_age_seconds: Only remove workspaces older than this
+        use_ram: Look in the RAM-backed root (same choice as render_workspace)
+
+    Returns:
+        int: Number of workspaces removed
+    """
+    return _remove_stale(get_workspace_root(use_ram), max_age_seconds)
+
+
+def _sweep_once(root):
+    with _sweep_lock:
+        if root in _swept_roots:
+            return
+        _swept_roots.add(root)
+    removed = _remove_stale(root, STALE_WORKSPACE_SECONDS)
+    if removed:
+        print(f"Removed {removed} stale render workspace(s) from {root}")
+
+
+def _remove_stale(root, max_age_seconds):
+    if not root.is_dir():
+        return 0
+
+    removed = 0
+    cutoff = time.time() - max_age_seconds
+    for path in root.glob(f"{WORKSPACE_PREFIX}*"):
+        try:
+            if path.is_dir() and path.stat().st_mtime < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+        except FileNotFoundError:
+            continue
+    return removed
@@ -0,0 +1,216 @@
+"""
+Content-addressed cache of rendered video segments.
+
+A segment is fully determined by its source image bytes, motion effect,
+duration, frame rate, resolution and encoder settings, so those make up the
+cache key. Re-rendering an edition after one thumbnail or boundary changes
+only encodes the segments whose key changed; the rest are reused and joined
+by stream-copy concatenation.
+
+The segment render mode (RENDER_MODE_SEGMENTS) uses the cache; editions are
+rendered in that mode unless their captions are burned in. A cache hit is
+checked out into the render's workspace (hard link, or copy across
+filesystems) before use, so a concurrent prune can't remove it mid-render.
+Every store prunes the cache back to SEGMENT_CACHE_MAX_BYTES, least recently
+used segments first.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+
+SEGMENT_CACHE_DIR = Path(os.getenv(
+    "SEGMENT_CACHE_DIR",
+    Path(__file__).parent.resolve() / "segment_cache"
+))
+
+# Size the cache is pruned back to after every store (SEGMENT_CACHE_MAX_MB, default 2 GB)
+SEGMENT_CACHE_MAX_BYTES = int(float(os.getenv("SEGMENT_CACHE_MAX_MB", 2048)) * 1024 * 1024)
+
+# Bump when the segment filter chain changes in a way the key can't see
+SEGMENT_CACHE_VERSION = 1
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# (path, size, mtime) -> sha256, so an image is hashed once per process
+_file_hashes = {}
+
+
+def hash_file(file_path):
+    """
+    Return the SHA-256 hex digest of a file's contents.
+
+    Args:
+        file_path: Path to the file
+
+    Returns:
+        str: Hex digest
+    """
+    stat = os.stat(file_path)
+    memo_key = (str(file_path), stat.st_size, stat.st_mtime_ns)
+    if memo_key in _file_hashes:
+        return _file_hashes[memo_key]
+
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    _file_hashes[memo_key] = digest.hexdigest()
+    return _file_hashes[memo_key]
+
+
+def segment_cache_key(image_file, effect, duration, fps, size, encoder_settings):
+    """
+    Build the cache key for one rendered segment.
+
+    Args:
+        image_file: Path to the source image
+        effect: Effect definition (the zoompan expressions, not just its name)
+        duration: Segment duration in seconds
+        fps: Output frame rate
+        size: Output width/height in pixels
+        encoder_settings: Dict of encoder options used for the segment
+
+    Returns:
+        str: Hex digest identifying the segment
+    """
+    key_data = {
+        'version': SEGMENT_CACHE_VERSION,
+        'image': hash_file(image_file),
+        'effect': effect,
+        'duration': f"{duration:.3f}",
+        'fps': fps,
+        'size': size,
+        'encoder': encoder_settings,
+    }
+    encoded = json.dumps(key_data, sort_keys=True).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def _segment_path(key):
+    return SEGMENT_CACHE_DIR / key[:2] / f"{key}.mp4"
+
+
+def get_cached_segment(key):
+    """
+    Look up a rendered segment in the cache.
+
+    Args:
+        key: Key from segment_cache_key
+
+    Returns:
+        Path or None: Path to the cached segment if present
+    """
+    path = _segment_path(key)
+    if not path.exists():
+        return None
+    # Refresh mtime so prune_segment_cache evicts least recently used first
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return path
+
+
+def checkout_segment(key, dest):
+    """
+    Place a cached segment at dest for one render.
+
+    dest is a hard link to the cached file where possible and a copy otherwise,
+    so pruning the cache afterwards doesn't affect the render using it.
+
+    Args:
+        key: Key from segment_cache_key
+        dest: Path for the render's own copy
+
+    Returns:
+        Path or None: dest, or None on a cache miss
+    """
+    path = get_cached_segment(key)
+    if path is None:
+        return None
+    dest = Path(dest)
+    if dest.exists():
+        dest.unlink()
+    try:
+        try:
+            os.link(path, dest)
+        except OSError as e:
+            if isinstance(e, FileNotFoundError):
+                raise
+            shutil.copyfile(path, dest)
+    except FileNotFoundError:
+        # Pruned between the lookup and the checkout
+        return None
+    return dest
+
+
+def store_segment(key, rendered_file):
+    """
+    Copy a freshly rendered segment into the cache, then prune the cache to
+    SEGMENT_CACHE_MAX_BYTES.
+
+    The copy is written to a temp file next to its final location and moved
+    into place atomically, so concurrent renders never see partial segments.
+
+    Args:
+        key: Key from segment_cache_key
+        rendered_file: Path to the rendered segment
+
+    Returns:
+        Path: Path to the cached segment
+    """
+    path = _segment_path(key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    os.close(fd)
+    try:
+        shutil.copyfile(rendered_file, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    prune_segment_cache(SEGMENT_CACHE_MAX_BYTES, keep=path)
+    return path
+
+
+def prune_segment_cache(max_bytes, keep=None):
+    """
+    Evict least recently used segments until the cache fits in max_bytes.
+
+    Args:
+        max_bytes: Maximum total size of the cache in bytes
+        keep: Optional segment path that is never evicted (the one just stored)
+
+    Returns:
+        int: Number of segments removed
+    """
+    if not SEGMENT_CACHE_DIR.is_dir():
+        return 0
+
+    entries = []
+    for path in SEGMENT_CACHE_DIR.glob('*/*.mp4'):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+    return removed
@@ -4,22 +4,57 @@ from datetime import datetime
 from pathlib import Path
 # gTTS replaced with OpenAI TTS
 from mutagen.mp3 import MP3
-from video_gen import create_video_with_word_captions, create_multi_story_video, detect_smart_story_boundaries
-import requests
-from openai import OpenAI
+from video_gen import create_video_with_word_captions, create_multi_story_video, detect_smart_story_boundaries, get_word_timestamps_free, RENDER_MODE_SEGMENTS, RENDER_MODE_SINGLE_PASS, CAPTION_MODE_BURN, CAPTION_MODE_SOFT, CAPTION_MODE_SIDECAR, VIDEO_SIZE
+from render_workspace import render_workspace
+from ffmpeg_progress import RenderTelemetry, print_progress_event, run_ffmpeg
 from dotenv import load_dotenv
 
 # Add parent directories to path to import from other agents
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'news_agent'))
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'database'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'common'))
 from generate_summary import generate_news_script
-from video_database import initialize_database, insert_video_record, get_db_path
+from video_database import initialize_database, insert_video_record, get_db_path, update_video_path
+from clients import get_openai_client, get_http_session
+from tracing import span
+from resilience import call_external
 
 load_dotenv()
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+# Where thumbnails come from, best to cheapest: DALL-E per story, the news
+# article's own image, or thumbnails generated for an earlier edition
+THUMBNAIL_MODE_GENERATE = 'generate'
+THUMBNAIL_MODE_ARTICLE = 'article'
+THUMBNAIL_MODE_CACHED = 'cached'
 
-def create_voiceover(story_count=1, output_dir="voiceovers"):
+# Modes tried in order for each story, starting from the requested one
+THUMBNAIL_FALLBACKS = {
+    THUMBNAIL_MODE_GENERATE: [THUMBNAIL_MODE_GENERATE, THUMBNAIL_MODE_ARTICLE, THUMBNAIL_MODE_CACHED],
+    THUMBNAIL_MODE_ARTICLE: [THUMBNAIL_MODE_ARTICLE, THUMBNAIL_MODE_CACHED],
+    THUMBNAIL_MODE_CACHED: [THUMBNAIL_MODE_CACHED],
+}
+
+# How editions carry their captions: a soft track plus the WebVTT sidecar the
+# website's player shows (video stream-copied after the encode), or burned in
+EDITION_CAPTION_MODE = os.getenv("EDITION_CAPTION_MODE", CAPTION_MODE_SOFT)
+if EDITION_CAPTION_MODE not in (CAPTION_MODE_BURN, CAPTION_MODE_SOFT, CAPTION_MODE_SIDECAR):
+    raise ValueError(f"Unknown EDITION_CAPTION_MODE: {EDITION_CAPTION_MODE}")
+
+
+def edition_render_mode(caption_mode):
+    """
+    Render mode for an edition with the given caption mode.
+    
+    Soft and sidecar captions leave the video stream untouched after the
+    segments are encoded, so editions render per segment through the segment
+    cache: a re-render or resumed job after one story's image or boundary
+    changed encodes only that segment. Burned-in captions re-encode the whole
+    video anyway, so those editions render in a single pass.
+    """
+    return RENDER_MODE_SINGLE_PASS if caption_mode == CAPTION_MODE_BURN else RENDER_MODE_SEGMENTS
+
+
+def create_voiceover(story_count=1, output_dir="voiceovers", category="technology"):
     """
     Fetches news, generates a summary script, and creates a voiceover audio file.
     
@@ -32,6 +67,7 @@ def create_voiceover(story_count=1, output_dir="voiceovers"):
     Args:
         story_count (int): Number of news stories to process. Default is 1.
         output_dir (str): Directory name for saving outputs. Default is "voiceovers".
+        category (str): News category to cover. Default is "technology".
     
     Returns:
         dict: A dictionary containing:
@@ -57,7 +93,7 @@ def create_voiceover(story_count=1, output_dir="voiceovers"):
     
     # Generate the news script with metadata
     print("Fetching news and generating script...")
-    result = generate_news_script(story_count, return_metadata=True)
+    result = generate_news_script(story_count, return_metadata=True, category=category)
     
     # Extract script and metadata
     if isinstance(result, dict):
@@ -103,23 +139,7 @@ def create_voiceover(story_count=1, output_dir="voiceovers"):
         f.write(script)
     
     # Generate and save the voiceover using OpenAI TTS
-    print(f"Generating voiceover audio with OpenAI TTS...")
-    client = OpenAI(api_key=OPENAI_API_KEY)
-    response = client.audio.speech.create(
-        model="tts-1",  # Use "tts-1-hd" for higher quality
-        voice="nova",   # Options: alloy, echo, fable, onyx, nova, shimmer
-        input=script
-    )
-    response.stream_to_file(str(audio_path))
-    print(f"Voiceover saved to {audio_path}")
-    
-    # Calculate audio duration
-    duration = None
-    try:
-        audio_file = MP3(str(audio_path))
-        duration = audio_file.info.length  # Duration in seconds
-    except Exception as e:
-        print(f"Warning: Could not determine audio duration: {e}")
+    duration = synthesize_voiceover(script, audio_path)
     
     # Extract metadata
     headline = story_metadata.get('headline') if story_metadata else None
@@ -153,10 +173,276 @@ def create_voiceover(story_count=1, output_dir="voiceovers"):
         'timestamp': timestamp,
         'video_id': video_id,
         'story_metadata': story_metadata,
-        'script': script
+        'script': script,
+        'script_data': result.get('script') if isinstance(result, dict) else None
     }
 
 
+def synthesize_voiceover(script, audio_path):
+    """
+    Convert a script to speech with OpenAI TTS and save it as an MP3.
+    
+    Args:
+        script: Text to speak
+        audio_path: Output MP3 path
+    
+    Returns:
+        float or None: Audio duration in seconds, if it could be determined
+    """
+    print(f"Generating voiceover audio with OpenAI TTS...")
+    client = get_openai_client()
+
+    def request(timeout):
+        with span('openai.tts', kind='http', model="tts-1", chars=len(script)):
+            response = client.with_options(timeout=timeout, max_retries=0).audio.speech.create(
+                model="tts-1",  # Use "tts-1-hd" for higher quality
+                voice="nova",   # Options: alloy, echo, fable, onyx, nova, shimmer
+                input=script
+            )
+            response.stream_to_file(str(audio_path))
+
+    call_external('openai', request)
+    print(f"Voiceover saved to {audio_path}")
+    
+    # Calculate audio duration
+    duration = None
+    try:
+        audio_file = MP3(str(audio_path))
+        duration = audio_file.info.length  # Duration in seconds
+    except Exception as e:
+        print(f"Warning: Could not determine audio duration: {e}")
+    return duration
+
+
+def build_thumbnail_prompt(story_text):
+    """Build the DALL-E prompt for a story thumbnail from (up to 150 chars of) its text"""
+    story_preview = story_text[:150]
+    return f"Create a professional news thumbnail image for this story: {story_preview}. Style: modern news broadcast, clean, professional, high quality. Do not include any text in the image."
+
+
+def generate_thumbnail(prompt, output_path):
+    """
+    Generate a thumbnail with DALL-E 3 and save it as a PNG.
+    
+    Args:
+        prompt: Image prompt
+        output_path: Where to save the image
+    
+    Returns:
+        str: Path to the saved image
+    """
+    client = get_openai_client()
+
+    def generate(timeout):
+        with span('openai.image', kind='http', model="dall-e-3"):
+            return client.with_options(timeout=timeout, max_retries=0).images.generate(
+                model="dall-e-3",
+                prompt=prompt,
+                n=1,
+                size="1024x1024"
+            )
+
+    response = call_external('openai_images', generate)
+    image_url = response.data[0].url
+    img_response = call_external('image_download', lambda timeout: _download_image(image_url, timeout))
+    with open(output_path, "wb") as f:
+        f.write(img_response.content)
+    return str(output_path)
+
+
+def _download_image(image_url, timeout):
+    """GET an image (one attempt) and return the response"""
+    with span('http.image_download', kind='http') as attributes:
+        response = get_http_session().get(image_url, timeout=timeout)
+        response.raise_for_status()
+        attributes['bytes'] = len(response.content)
+    return response
+
+
+def download_article_thumbnail(image_url, output_path):
+    """
+    Download a news article's image and crop it to a square thumbnail.
+    
+    Args:
+        image_url: The article's image URL (NewsAPI urlToImage)
+        output_path: Where to save the PNG
+    
+    Returns:
+        str: Path to the saved image
+    """
+    download_path = Path(output_path).with_suffix('.download')
+    response = call_external('image_download', lambda timeout: _download_image(image_url, timeout))
+    download_path.write_bytes(response.content)
+    try:
+        run_ffmpeg([
+            'ffmpeg', '-y', '-v', 'error',
+            '-i', str(download_path),
+            '-vf', f"scale={VIDEO_SIZE}:{VIDEO_SIZE}:force_original_aspect_ratio=increase,"
+                   f"crop={VIDEO_SIZE}:{VIDEO_SIZE},setsar=1",
+            '-frames:v', '1',
+            str(output_path)
+        ], 'thumbnail_crop')
+    finally:
+        download_path.unlink(missing_ok=True)
+    return str(output_path)
+
+
+def find_cached_thumbnails(thumbnails_dir, count, exclude_timestamp=None):
+    """
+    Return the most recent thumbnails generated for earlier editions.
+    
+    Args:
+        thumbnails_dir: Directory holding thumbnail_<timestamp>_story<n>.png files
+        count: Number of thumbnails wanted
+        exclude_timestamp: Skip thumbnails of this edition
+    
+    Returns:
+        list: Up to count paths, newest first
+    """
+    candidates = sorted(
+        (path for path in Path(thumbnails_dir).glob("thumbnail_*.png")
+         if not exclude_timestamp or f"_{exclude_timestamp}_" not in path.name),
+        key=lambda path: path.stat().st_mtime,
+        reverse=True
+    )
+    return [str(path) for path in candidates[:count]]
+
+
+def generate_story_thumbnails(story_texts, timestamp, mode=THUMBNAIL_MODE_GENERATE, image_urls=None):
+    """
+    Produce one thumbnail per story, falling back to cheaper sources when one fails.
+    
+    A story whose thumbnail can't be produced in the requested mode tries the
+    next modes of THUMBNAIL_FALLBACKS (article image, then an earlier
+    edition's thumbnail) before reusing the previous story's image.
+    
+    Args:
+        story_texts: List of story texts (one per video segment)
+        timestamp: Edition timestamp used in the file names
+        mode: THUMBNAIL_MODE_GENERATE (DALL-E), THUMBNAIL_MODE_ARTICLE (the
+            article's own image) or THUMBNAIL_MODE_CACHED (earlier editions'
+            thumbnails); cheaper modes are used when an edition runs late
+        image_urls: Article image URLs, one per story
+    
+    Returns:
+        list: Thumbnail paths (same length as story_texts)
+    
+    Raises:
+        RuntimeError: If no thumbnail could be produced at all
+    """
+    thumbnails_dir = Path(__file__).parent.resolve() / "thumbnails"
+    thumbnails_dir.mkdir(exist_ok=True)
+    
+    cached = None
+    
+    def produce(story_mode, i, story_text, thumb_path):
+        nonlocal cached
+        if story_mode == THUMBNAIL_MODE_CACHED:
+            if cached is None:
+                cached = find_cached_thumbnails(thumbnails_dir, len(story_texts), exclude_timestamp=timestamp)
+            if not cached:
+                raise RuntimeError("no cached thumbnails available")
+            return cached[i % len(cached)]
+        if story_mode == THUMBNAIL_MODE_ARTICLE:
+            image_url = image_urls[i] if image_urls and i < len(image_urls) else None
+            if not image_url:
+                raise RuntimeError("story has no article image")
+            return download_article_thumbnail(image_url, thumb_path)
+        print(f"\nGenerating thumbnail {i+1}/{len(story_texts)} based on story content...")
+        return generate_thumbnail(build_thumbnail_prompt(story_text), thumb_path)
+    
+    thumbnail_paths = []
+    for i, story_text in enumerate(story_texts):
+        thumb_path = thumbnails_dir / f"thumbnail_{timestamp}_story{i+1}.png"
+        path = None
+        for story_mode in THUMBNAIL_FALLBACKS[mode]:
+            try:
+                path = produce(story_mode, i, story_text, thumb_path)
+            except Exception as e:
+                print(f"⚠️  Failed to produce thumbnail {i+1} ({story_mode}): {e}")
+                continue
+            print(f"✅ Thumbnail {i+1} saved: {path} ({story_mode})")
+            print(f"   Based on: {story_text[:150]}...")
+            break
+        if path is None:
+            if not thumbnail_paths:
+                raise RuntimeError("Failed to generate any thumbnails")
+            path = thumbnail_paths[-1]
+        thumbnail_paths.append(path)
+    return thumbnail_paths
+
+
+def render_edition(audio_path, thumbnail_paths, story_boundaries, video_id, timestamp, telemetry=None,
+                   x264_preset=None, asr_model="base", caption_mode=None):
+    """
+    Render a multi-story edition (with HLS ladder) into its job-scoped output paths.
+    
+    The render mode follows the caption mode (see edition_render_mode).
+    
+    Args:
+        audio_path: Path to the voiceover
+        thumbnail_paths: One image per story
+        story_boundaries: List of (start, end) tuples, one per story
+        video_id: ID of the edition's row in the videos table, or None
+        timestamp: Edition timestamp
+        telemetry: Optional RenderTelemetry
+        x264_preset: Optional x264 preset (default: X264_PRESET)
+        asr_model: Whisper model used for the caption timestamps
+        caption_mode: CAPTION_MODE_SOFT, CAPTION_MODE_SIDECAR or CAPTION_MODE_BURN
+            (default: EDITION_CAPTION_MODE)
+    
+    Returns:
+        dict or None: {'video_path', 'hls_dir'} if successful, None otherwise
+    """
+    output_video_path, hls_output_dir = get_render_output_paths(video_id, timestamp)
+    word_segments = get_word_timestamps_free(audio_path, model_name=asr_model)
+    caption_mode = caption_mode or EDITION_CAPTION_MODE
+    with render_workspace(job_id=video_id) as workspace:
+        success = create_multi_story_video(
+            audio_file=audio_path,
+            image_files=thumbnail_paths,
+            story_boundaries=story_boundaries,
+            output_file=str(output_video_path),
+            render_mode=edition_render_mode(caption_mode),
+            hls_output_dir=str(hls_output_dir),
+            workspace=workspace,
+            telemetry=telemetry,
+            caption_mode=caption_mode,
+            word_segments=word_segments,
+            x264_preset=x264_preset
+        )
+    if not success:
+        return None
+    if video_id is not None:
+        update_video_path(video_id, str(output_video_path))
+    return {'video_path': str(output_video_path), 'hls_dir': str(hls_output_dir)}
+
+
+
+def get_render_output_paths(video_id, timestamp):
+    """
+    Build unique output locations for one edition's render.
+    
+    Outputs are keyed by the videos.id of the edition (falling back to the
+    timestamp when no database record exists) so concurrent renders never
+    write to the same file.
+    
+    Args:
+        video_id: ID of the edition's row in the videos table, or None
+        timestamp: Edition timestamp (format: YYYYMMDD_HHMMSS)
+    
+    Returns:
+        tuple: (Path to the final MP4, Path to the HLS output directory)
+    """
+    script_dir = Path(__file__).parent.resolve()
+    key = video_id if video_id is not None else timestamp
+    
+    videos_dir = script_dir / "videos"
+    videos_dir.mkdir(parents=True, exist_ok=True)
+    
+    output_video_path = videos_dir / f"Story_{key}.mp4"
+    hls_output_dir = script_dir / "hls" / str(key)  # Served by website/app.py for adaptive playback
+    return output_video_path, hls_output_dir
 
 
 # Allow running as a standalone script
@@ -172,7 +458,9 @@ if __name__ == "__main__":
     thumbnails_dir = script_dir / "thumbnails"
     thumbnails_dir.mkdir(exist_ok=True)
     timestamp = result['timestamp']
-    output_video_path = script_dir / "Story.mp4"
+    video_id = result.get('video_id')
+    output_video_path, hls_output_dir = get_render_output_paths(video_id, timestamp)
+    telemetry = RenderTelemetry(progress_callback=print_progress_event)
     
     # Get script and metadata
     script_text = result.get('script', '')
@@ -190,38 +478,13 @@ if __name__ == "__main__":
             print("❌ Failed to detect story boundaries. Aborting.")
         else:
             # Generate thumbnails based on ACTUAL story text
-            thumbnail_paths = []
-            for i, segment in enumerate(story_segments):
-                print(f"\nGenerating thumbnail {i+1}/{story_count} based on story content...")
-                thumb_path = thumbnails_dir / f"thumbnail_{timestamp}_story{i+1}.png"
-                
-                # Use first 150 characters of actual story text for better image generation
-                story_preview = segment['text'][:150]
-                prompt = f"Create a professional news thumbnail image for this story: {story_preview}. Style: modern news broadcast, clean, professional, high quality. Do not include any text in the image."
-                
-                try:
-                    client = OpenAI(api_key=OPENAI_API_KEY)
-                    response = client.images.generate(
-                        model="dall-e-3",
-                        prompt=prompt,
-                        n=1,
-                        size="1024x1024"
-                    )
-                    image_url = response.data[0].url
-                    img_response = requests.get(image_url)
-                    img_response.raise_for_status()
-                    with open(thumb_path, "wb") as f:
-                        f.write(img_response.content)
-                    print(f"✅ Thumbnail {i+1} saved: {thumb_path}")
-                    print(f"   Based on: {story_preview}...")
-                    thumbnail_paths.append(str(thumb_path))
-                except Exception as e:
-                    print(f"⚠️  Failed to generate thumbnail {i+1}: {e}")
-                    if thumbnail_paths:
-                        thumbnail_paths.append(thumbnail_paths[-1])
-                    else:
-                        print("❌ Failed to generate any thumbnails. Aborting.")
-                        exit(1)
+            try:
+                thumbnail_paths = generate_story_thumbnails(
+                    [segment['text'] for segment in story_segments], timestamp
+                )
+            except RuntimeError:
+                print("❌ Failed to generate any thumbnails. Aborting.")
+                exit(1)
             
             # Extract boundaries from segments
             boundaries = [(seg['start'], seg['end']) for seg in story_segments]
@@ -232,14 +495,11 @@ if __name__ == "__main__":
                 print(f"Thumbnails: {len(thumbnail_paths)}")
                 print(f"Boundaries: {boundaries}")
                 
-                success = create_multi_story_video(
-                    audio_file=result['audio_path'],
-                    image_files=thumbnail_paths,
-                    story_boundaries=boundaries,
-                    output_file=str(output_video_path)
+                rendered = render_edition(
+                    result['audio_path'], thumbnail_paths, boundaries, video_id, timestamp, telemetry
                 )
                 
-                if success:
+                if rendered:
                     print(f"\n✅ Multi-story video created successfully: {output_video_path}")
                 else:
                     print(f"\n❌ Failed to create multi-story video")
@@ -254,30 +514,30 @@ if __name__ == "__main__":
         
         # Generate thumbnail
         try:
-            prompt = f"Create a professional news thumbnail image for this headline: {headline}. Style: modern news broadcast, clean, professional, high quality. Do not include any text in the image." if headline else f"Create a professional news thumbnail image for this story: {script_text[:150]}. Style: modern news broadcast, clean, professional, high quality. Do not include any text in the image."
+            prompt = f"Create a professional news thumbnail image for this headline: {headline}. Style: modern news broadcast, clean, professional, high quality. Do not include any text in the image." if headline else build_thumbnail_prompt(script_text)
             
-            client = OpenAI(api_key=OPENAI_API_KEY)
-            response = client.images.generate(
-                model="dall-e-3",
-                prompt=prompt,
-                n=1,
-                size="1024x1024"
-            )
-            image_url = response.data[0].url
-            img_response = requests.get(image_url)
-            img_response.raise_for_status()
-            with open(thumbnail_path, "wb") as f:
-                f.write(img_response.content)
+            generate_thumbnail(prompt, thumbnail_path)
             print(f"✅ Thumbnail saved: {thumbnail_path}")
             
             print("\nGenerating video with word captions...")
             print(f"Using audio from: {result['audio_path']}")
             print(f"Using thumbnail from: {thumbnail_path}")
-            create_video_with_word_captions(
-                audio_file=result['audio_path'],
-                image_file=str(thumbnail_path),
-                output_file=str(output_video_path)
-            )
+            with render_workspace(job_id=video_id) as workspace:
+                create_video_with_word_captions(
+                    audio_file=result['audio_path'],
+                    image_file=str(thumbnail_path),
+                    output_file=str(output_video_path),
+                    workspace=workspace,
+                    telemetry=telemetry
+                )
             print(f"✅ Video created: {output_video_path}")
+            if video_id is not None:
+                update_video_path(video_id, str(output_video_path))
         except Exception as e:
             print(f"❌ Failed to generate thumbnail: {e}")
+
+    # Per-stage render timings (ffmpeg wall/CPU time), kept next to the video
+    if telemetry.stages:
+        telemetry_path = output_video_path.with_suffix('.telemetry.json')
+        telemetry.save(telemetry_path)
+        print(f"Render telemetry saved: {telemetry_path}")
@@ -3,15 +3,152 @@ This script is used to generate a video from a story.
 """
 
 
-import whisper
 import subprocess
-from openai import OpenAI
+import sys
+import threading
+import time
+import gc
 from dotenv import load_dotenv
 import os
+import shutil
 from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / 'common'))
+from render_workspace import ensure_workspace
+from segment_cache import segment_cache_key, checkout_segment, store_segment
+from ffmpeg_progress import run_ffmpeg, RenderTelemetry, print_progress_event
+from tracing import span
+from resources import torch_thread_budget
 load_dotenv()
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key=OPENAI_API_KEY)
+
+
+# Whisper models loaded in this process, by name; loading takes seconds, so it's done once.
+# whisper (and torch) is imported on first use, so render-only and DB-only
+# callers never pay for it.
+_whisper_models = {}
+_whisper_last_used = {}
+_whisper_lock = threading.Lock()
+# One lock per model name: a Whisper model isn't safe to transcribe with from
+# two threads at once, so concurrent jobs sharing it take turns (reentrant, so
+# a caller may take it before reserving cores for the transcription)
+_whisper_transcribe_locks = {}
+
+
+def get_whisper_model(name="base"):
+    """
+    Return a Whisper model, loading it on first use and reusing it afterwards.
+    
+    Args:
+        name: Whisper model name (e.g. "tiny", "base", "small")
+    
+    Returns:
+        whisper.Whisper: The loaded model
+    """
+    with _whisper_lock:
+        if name not in _whisper_models:
+            print(f"Loading Whisper model '{name}' (once per process)...")
+            with span('whisper.load_model', kind='model', model=name):
+                import whisper
+                _whisper_models[name] = whisper.load_model(name)
+        _whisper_last_used[name] = time.monotonic()
+        return _whisper_models[name]
+
+
+def whisper_transcribe_lock(name="base"):
+    """
+    Return the lock held around every transcription with the named model.
+    
+    Args:
+        name: Whisper model name
+    
+    Returns:
+        threading.RLock: The model's transcription lock
+    """
+    with _whisper_lock:
+        return _whisper_transcribe_locks.setdefault(name, threading.RLock())
+
+
+def loaded_whisper_models():
+    """
+    Whisper models currently held in memory.
+    
+    Returns:
+        dict: Model name -> seconds since it was last requested
+    """
+    now = time.monotonic()
+    with _whisper_lock:
+        return {name: round(now - _whisper_last_used[name], 1) for name in _whisper_models}
+
+
+def evict_idle_whisper_models(idle_seconds):
+    """
+    Drop Whisper models that haven't been requested for idle_seconds.
+    
+    A transcription already running keeps its reference, so eviction never
+    interrupts work; the model is freed once it finishes.
+    
+    Args:
+        idle_seconds: Idle time after which a model is evicted
+    
+    Returns:
+        list: Names of the evicted models
+    """
+    now = time.monotonic()
+    with _whisper_lock:
+        evicted = [name for name in _whisper_models if now - _whisper_last_used[name] >= idle_seconds]
+        for name in evicted:
+            del _whisper_models[name]
+            del _whisper_last_used[name]
+    if evicted:
+        gc.collect()
+    return evicted
+
+
+# Output settings shared by every render path
+VIDEO_FPS = 25
+VIDEO_SIZE = 1024
+ZOOM_UPSCALE = 4096  # Upscale before zoompan to prevent rounding errors (shakiness)
+X264_PRESET = os.getenv("X264_PRESET", 'medium')
+AUDIO_BITRATE = '192k'
+
+# Everything that affects the bytes of a rendered segment besides its inputs;
+# part of the segment cache key
+SEGMENT_ENCODER_SETTINGS = {'codec': 'libx264', 'preset': X264_PRESET, 'pix_fmt': 'yuv420p'}
+
+# Render modes for create_multi_story_video
+RENDER_MODE_SEGMENTS = 'segments'        # One encode per segment, concat, mux, caption burn
+RENDER_MODE_SINGLE_PASS = 'single_pass'  # One ffmpeg graph, encoded exactly once
+
+# Caption output modes
+CAPTION_MODE_BURN = 'burn'        # ASS captions rendered into the pixels (forces a video encode)
+CAPTION_MODE_SOFT = 'soft'        # Embedded mov_text track + WebVTT sidecar, video stream-copied
+CAPTION_MODE_SIDECAR = 'sidecar'  # WebVTT sidecar only, video stream-copied
+
+# Adaptive streaming ladder: every rendition is split from the same composited
+# stream, so one decode/composite feeds all encoders
+RENDITION_LADDER = [
+    {'name': '1024p', 'size': 1024, 'video_bitrate': '3000k', 'audio_bitrate': '128k'},
+    {'name': '720p', 'size': 720, 'video_bitrate': '1600k', 'audio_bitrate': '128k'},
+    {'name': '480p', 'size': 480, 'video_bitrate': '800k', 'audio_bitrate': '96k'},
+]
+HLS_SEGMENT_SECONDS = 4
+HLS_MASTER_PLAYLIST = 'master.m3u8'
+HLS_CAPTIONS_FILE = 'captions.vtt'
+
+# Effect rotation for visual variety in multi-story videos
+MULTI_STORY_EFFECTS = ['zoom_in', 'pan_right', 'zoom_out', 'ken_burns']
+
+ASS_HEADER = (
+    "[Script Info]\n"
+    "ScriptType: v4.00+\n"
+    f"PlayResX: {VIDEO_SIZE}\n"
+    f"PlayResY: {VIDEO_SIZE}\n\n"
+    "[V4+ Styles]\n"
+    "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding\n"
+    "Style: Default,Arial,60,&H00FFFFFF,&H000000FF,&H00000000,&H80000000,-1,0,0,0,100,100,0,0,3,2,0,2,10,10,100,1\n\n"
+    "[Events]\n"
+    "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\n"
+)
 
 
 # Effect styles for different video segments
@@ -49,13 +186,15 @@ EFFECT_STYLES = {
 }
 
 
-def get_word_timestamps_free(audio_file):
-    """Get word-level timestamps using FREE local Whisper"""
-    print("Loading Whisper model (this may take a moment on first run)...")
-    model = whisper.load_model("base")
+def get_word_timestamps_free(audio_file, model_name="base"):
+    """Get word-level timestamps using FREE local Whisper (model_name picks the Whisper size)"""
+    model = get_whisper_model(model_name)
     
     print(f"Transcribing {audio_file}...")
-    result = model.transcribe(audio_file, word_timestamps=True)
+    with whisper_transcribe_lock(model_name):
+        with span('whisper.transcribe', kind='model', model=model_name, purpose='captions'):
+            with torch_thread_budget():
+                result = model.transcribe(audio_file, word_timestamps=True)
     
     text_segments = []
     for segment in result['segments']:
@@ -79,7 +218,121 @@ def format_ass_time(seconds):
     return f"{hours}:{minutes:02d}:{secs:02d}.{centiseconds:02d}"
 
 
-def detect_smart_story_boundaries(audio_file, story_count):
+def get_media_duration(media_file):
+    """Return the duration of an audio/video file in seconds using ffprobe"""
+    info = subprocess.run([
+        'ffprobe', '-v', 'error',
+        '-show_entries', 'format=duration',
+        '-of', 'default=noprint_wrappers=1:nokey=1',
+        media_file
+    ], capture_output=True, text=True, check=True)
+    return float(info.stdout.strip())
+
+
+def group_words_into_phrases(word_segments, words_per_phrase=4):
+    """
+    Group word-level timestamps into short caption phrases.
+    
+    Args:
+        word_segments: List of (start, end, word) tuples
+        words_per_phrase: Number of words per caption phrase
+    
+    Returns:
+        List of (start, end, text) tuples
+    """
+    phrase_segments = []
+    for i in range(0, len(word_segments), words_per_phrase):
+        phrase_words = word_segments[i:i+words_per_phrase]
+        if phrase_words:
+            start = phrase_words[0][0]
+            end = phrase_words[-1][1]
+            text = ' '.join([word[2] for word in phrase_words])
+            phrase_segments.append((start, end, text))
+    return phrase_segments
+
+
+def write_ass_captions(phrase_segments, ass_file):
+    """Write phrase segments to an ASS subtitle file using the default caption style"""
+    with open(ass_file, 'w', encoding='utf-8') as f:
+        f.write(ASS_HEADER)
+        for start, end, text in phrase_segments:
+            start_time = format_ass_time(start)
+            end_time = format_ass_time(end)
+            f.write(f"Dialogue: 0,{start_time},{end_time},Default,,0,0,0,,{text}\n")
+
+
+def format_vtt_time(seconds):
+    """Convert seconds to WebVTT time format HH:MM:SS.mmm"""
+    hours = int(seconds // 3600)
+    minutes = int((seconds % 3600) // 60)
+    secs = int(seconds % 60)
+    milliseconds = int(round((seconds % 1) * 1000))
+    if milliseconds == 1000:
+        secs, milliseconds = secs + 1, 0
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}.{milliseconds:03d}"
+
+
+def write_webvtt_captions(phrase_segments, vtt_file):
+    """Write phrase segments to a WebVTT file for client-side captions"""
+    with open(vtt_file, 'w', encoding='utf-8') as f:
+        f.write("WEBVTT\n\n")
+        for index, (start, end, text) in enumerate(phrase_segments, 1):
+            f.write(f"{index}\n")
+            f.write(f"{format_vtt_time(start)} --> {format_vtt_time(end)}\n")
+            f.write(f"{text}\n\n")
+
+
+def get_caption_sidecar_path(output_file):
+    """Return the WebVTT sidecar path written next to a rendered video"""
+    return Path(output_file).with_suffix('.vtt')
+
+
+def copy_captions_to_hls(output_file, hls_output_dir):
+    """Publish the video's WebVTT sidecar next to its HLS master playlist"""
+    sidecar = get_caption_sidecar_path(output_file)
+    if hls_output_dir and sidecar.exists():
+        Path(hls_output_dir).mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(sidecar, Path(hls_output_dir) / HLS_CAPTIONS_FILE)
+
+
+def escape_filter_path(path):
+    """Escape a file path for use as an option value inside an ffmpeg filter graph"""
+    value = str(path).replace('\\', '/')
+    # First level: filter option parsing
+    for ch in ("'", ':'):
+        value = value.replace(ch, '\\' + ch)
+    # Second level: filter graph parsing
+    escaped = ''
+    for ch in value:
+        if ch in "\\'[],;":
+            escaped += '\\'
+        escaped += ch
+    return escaped
+
+
+def build_motion_filter(input_label, effect_style, duration, output_label):
+    """
+    Build the scale -> zoompan -> scale filter chain for one still image.
+    
+    Args:
+        input_label: Filter graph input pad (e.g. '0:v')
+        effect_style: Key into EFFECT_STYLES
+        duration: Segment duration in seconds
+        output_label: Filter graph output pad name
+    
+    Returns:
+        str: Filter chain string
+    """
+    effect = EFFECT_STYLES.get(effect_style, EFFECT_STYLES['zoom_in'])
+    d_value = int(duration * VIDEO_FPS)
+    return (
+        f"[{input_label}]scale={ZOOM_UPSCALE}x{ZOOM_UPSCALE},"
+        f"zoompan=z='{effect['z']}':x='{effect['x']}':y='{effect['y']}':d={d_value}:s={ZOOM_UPSCALE}x{ZOOM_UPSCALE}:fps={VIDEO_FPS},"
+        f"scale={VIDEO_SIZE}x{VIDEO_SIZE}[{output_label}]"
+    )
+
+
+def detect_smart_story_boundaries(audio_file, story_count, model_name="base"):
     """
     Intelligently detect story boundaries by transcribing audio and dividing text.
     Ensures boundaries are continuous with no gaps.
@@ -87,18 +340,21 @@ def detect_smart_story_boundaries(audio_file, story_count):
     Args:
         audio_file: Path to audio file
         story_count: Number of stories to detect
+        model_name: Whisper model size ("tiny" is several times faster than "base")
     
     Returns:
         List of dicts with 'start', 'end', 'text' for each story segment
     """
     print(f"Detecting {story_count} story boundaries intelligently...")
     
-    # Load Whisper model and transcribe
-    print("Loading Whisper model for boundary detection...")
-    model = whisper.load_model("base")
+    # Transcribe with the shared Whisper model
+    model = get_whisper_model(model_name)
     
     print(f"Transcribing {audio_file} for text extraction...")
-    result = model.transcribe(audio_file, word_timestamps=True)
+    with whisper_transcribe_lock(model_name):
+        with span('whisper.transcribe', kind='model', model=model_name, purpose='boundaries'):
+            with torch_thread_budget():
+                result = model.transcribe(audio_file, word_timestamps=True)
     
     # Extract all words with timestamps
     word_data = []
@@ -119,13 +375,7 @@ def detect_smart_story_boundaries(audio_file, story_count):
     print(f"Transcribed {total_words} words")
     
     # Get actual audio duration from file (not just last word timestamp)
-    audio_info = subprocess.run([
-        'ffprobe', '-v', 'error',
-        '-show_entries', 'format=duration',
-        '-of', 'default=noprint_wrappers=1:nokey=1',
-        audio_file
-    ], capture_output=True, text=True, check=True)
-    total_duration = float(audio_info.stdout.strip())
+    total_duration = get_media_duration(audio_file)
     print(f"Audio duration: {total_duration:.2f}s (last word ends at {word_data[-1]['end']:.2f}s)")
     
     # Try to detect natural story boundaries using transition markers
@@ -187,7 +437,8 @@ def detect_smart_story_boundaries(audio_file, story_count):
     return story_segments
 
 
-def create_video_segment_videoonly(image_file, duration, effect_style, output_file):
+def create_video_segment_videoonly(image_file, duration, effect_style, output_file, telemetry=None,
+                                   x264_preset=None):
     """
     Create a video segment (video only, no audio) with a specific effect.
     
@@ -196,34 +447,28 @@ def create_video_segment_videoonly(image_file, duration, effect_style, output_fi
         duration: Duration in seconds
         effect_style: Effect to apply
         output_file: Output video path
+        telemetry: Optional RenderTelemetry for progress events and stage timings
+        x264_preset: Optional x264 preset overriding X264_PRESET
     
     Returns:
         bool: True if successful
     """
-    effect = EFFECT_STYLES.get(effect_style, EFFECT_STYLES['zoom_in'])
-    fps = 25
-    d_value = int(duration * fps)
-    
     try:
         command = [
             'ffmpeg', '-y',
             '-loop', '1',
             '-i', image_file,
-            '-filter_complex', (
-                f"[0:v]scale=4096x4096,"
-                f"zoompan=z='{effect['z']}':x='{effect['x']}':y='{effect['y']}':d={d_value}:s=4096x4096:fps={fps},"
-                f"scale=1024x1024[v]"
-            ),
+            '-filter_complex', build_motion_filter('0:v', effect_style, duration, 'v'),
             '-map', '[v]',
-            '-c:v', 'libx264',
-            '-preset', 'medium',
+            '-c:v', SEGMENT_ENCODER_SETTINGS['codec'],
+            '-preset', x264_preset or SEGMENT_ENCODER_SETTINGS['preset'],
             '-t', str(duration),
-            '-pix_fmt', 'yuv420p',
+            '-pix_fmt', SEGMENT_ENCODER_SETTINGS['pix_fmt'],
             '-an',  # No audio
             output_file
         ]
         
-        subprocess.run(command, check=True, capture_output=True, text=True)
+        run_ffmpeg(command, 'segment_zoompan', telemetry, expected_duration=duration)
         return True
         
     except subprocess.CalledProcessError as e:
@@ -233,7 +478,304 @@ def create_video_segment_videoonly(image_file, duration, effect_style, output_fi
         return False
 
 
-def create_multi_story_video(audio_file, image_files, story_boundaries, output_file):
+def render_segment_cached(image_file, duration, effect_style, work_dir, index, telemetry=None,
+                          x264_preset=None):
+    """
+    Return a rendered segment for the given inputs, rendering only on a cache miss.
+    
+    Args:
+        image_file: Path to image
+        duration: Duration in seconds
+        effect_style: Effect to apply
+        work_dir: Workspace directory for the fresh render
+        index: Segment number (used for the temp file name)
+        telemetry: Optional RenderTelemetry for progress events and stage timings
+        x264_preset: Optional x264 preset overriding X264_PRESET (part of the cache key)
+    
+    Returns:
+        str or None: Path to the segment in work_dir, or None if rendering failed
+    """
+    effect = EFFECT_STYLES.get(effect_style, EFFECT_STYLES['zoom_in'])
+    key = segment_cache_key(
+        image_file,
+        {name: effect[name] for name in ('z', 'x', 'y')},
+        duration,
+        VIDEO_FPS,
+        VIDEO_SIZE,
+        dict(SEGMENT_ENCODER_SETTINGS, preset=x264_preset or SEGMENT_ENCODER_SETTINGS['preset'])
+    )
+    
+    segment_file = str(Path(work_dir) / f"temp_vseg_{index}.mp4")
+    if checkout_segment(key, segment_file) is not None:
+        print(f"Reusing cached segment {index+1} ({key[:12]})")
+        return segment_file
+    
+    if not create_video_segment_videoonly(image_file, duration, effect_style, segment_file, telemetry,
+                                          x264_preset):
+        return None
+    store_segment(key, segment_file)
+    return segment_file
+
+
+def build_hls_outputs(video_label, audio_input, renditions, hls_output_dir, duration=None,
+                      x264_preset=None):
+    """
+    Build the filter chains and output arguments for an HLS rendition ladder.
+    
+    The composited video pad is split once and scaled per rendition; each
+    rendition gets its own encoder and is packaged as HLS segments with a
+    master playlist, all within the same ffmpeg run.
+    
+    Args:
+        video_label: Filter graph pad holding the final composited video
+        audio_input: Stream specifier of the audio track (e.g. '2:a')
+        renditions: List of rendition dicts (see RENDITION_LADDER)
+        hls_output_dir: Directory for playlists and segments
+        duration: Optional output duration in seconds
+        x264_preset: Optional x264 preset overriding X264_PRESET
+    
+    Returns:
+        tuple: (list of filter chain strings, list of output arguments)
+    """
+    hls_dir = Path(hls_output_dir)
+    hls_dir.mkdir(parents=True, exist_ok=True)
+    
+    split_pads = ''.join(f"[hls{i}]" for i in range(len(renditions)))
+    filters = [f"[{video_label}]split={len(renditions)}{split_pads}"]
+    for i, rendition in enumerate(renditions):
+        size = rendition['size']
+        filters.append(f"[hls{i}]scale={size}x{size}[hlsout{i}]")
+    
+    # Fixed GOP aligned to the segment length keeps renditions switchable at every segment
+    gop = VIDEO_FPS * HLS_SEGMENT_SECONDS
+    args = []
+    for i, rendition in enumerate(renditions):
+        args += ['-map', f"[hlsout{i}]", '-map', audio_input]
+    for i, rendition in enumerate(renditions):
+        bitrate = int(rendition['video_bitrate'].rstrip('k'))
+        args += [
+            f'-c:v:{i}', 'libx264',
+            f'-b:v:{i}', rendition['video_bitrate'],
+            f'-maxrate:v:{i}', f"{int(bitrate * 1.1)}k",
+            f'-bufsize:v:{i}', f"{bitrate * 2}k",
+            f'-c:a:{i}', 'aac',
+            f'-b:a:{i}', rendition['audio_bitrate'],
+        ]
+    args += [
+        '-preset', x264_preset or X264_PRESET,
+        '-pix_fmt', 'yuv420p',
+        '-g', str(gop),
+        '-keyint_min', str(gop),
+        '-sc_threshold', '0',
+    ]
+    if duration is not None:
+        args += ['-t', str(duration)]
+    var_stream_map = ' '.join(
+        f"v:{i},a:{i},name:{rendition['name']}" for i, rendition in enumerate(renditions)
+    )
+    args += [
+        '-f', 'hls',
+        '-hls_time', str(HLS_SEGMENT_SECONDS),
+        '-hls_playlist_type', 'vod',
+        '-hls_segment_filename', str(hls_dir / '%v' / 'segment_%03d.ts'),
+        '-master_pl_name', HLS_MASTER_PLAYLIST,
+        '-var_stream_map', var_stream_map,
+        str(hls_dir / '%v' / 'index.m3u8'),
+    ]
+    return filters, args
+
+
+def package_hls(video_file, hls_output_dir, renditions=None, telemetry=None, x264_preset=None):
+    """
+    Package an existing video as an HLS rendition ladder in one ffmpeg run.
+    
+    Used by render paths that already produced a final MP4; the video is
+    decoded once and split into every rendition.
+    
+    Args:
+        video_file: Path to the final video
+        hls_output_dir: Directory for playlists and segments
+        renditions: Optional list of rendition dicts (default: RENDITION_LADDER)
+        telemetry: Optional RenderTelemetry for progress events and stage timings
+        x264_preset: Optional x264 preset overriding X264_PRESET
+    
+    Returns:
+        bool: True if successful
+    """
+    renditions = renditions or RENDITION_LADDER
+    filters, output_args = build_hls_outputs('0:v', '0:a', renditions, hls_output_dir,
+                                             x264_preset=x264_preset)
+    command = [
+        'ffmpeg', '-y',
+        '-i', video_file,
+        '-filter_complex', ';'.join(filters),
+    ] + output_args
+    
+    try:
+        print(f"Packaging {len(renditions)} HLS renditions into {hls_output_dir}...")
+        run_ffmpeg(command, 'hls_package', telemetry)
+        return True
+    except subprocess.CalledProcessError as e:
+        print(f"Error packaging HLS renditions: {e}")
+        if e.stderr:
+            print(f"FFmpeg stderr: {e.stderr[-500:]}")
+        return False
+
+
+def build_single_pass_command(audio_file, image_files, story_boundaries, ass_file,
+                              audio_duration, output_file, hls_output_dir=None,
+                              renditions=None, subtitle_file=None, x264_preset=None):
+    """
+    Build one ffmpeg command that renders a whole multi-story video.
+    
+    All images are inputs of a single filter graph: each gets its motion effect,
+    the segments are concatenated, captions are burned in and the continuous
+    audio track is muxed, so the video is encoded exactly once.
+    
+    Args:
+        audio_file: Path to combined audio file
+        image_files: List of image paths (one per story)
+        story_boundaries: List of (start, end) tuples for each story
+        ass_file: Path to ASS captions, or None to skip captions
+        audio_duration: Duration of the audio track in seconds
+        output_file: Output video path
+        hls_output_dir: Optional directory; when set, the composited stream is
+            also split into an HLS rendition ladder in the same run
+        renditions: Optional list of rendition dicts (default: RENDITION_LADDER)
+        subtitle_file: Optional WebVTT file embedded as a mov_text track
+        x264_preset: Optional x264 preset overriding X264_PRESET
+    
+    Returns:
+        list: ffmpeg command
+    """
+    command = ['ffmpeg', '-y']
+    for image in image_files:
+        command += ['-i', image]
+    command += ['-i', audio_file]
+    audio_index = len(image_files)
+    if subtitle_file:
+        command += ['-i', str(subtitle_file)]
+    
+    filters = []
+    for i, (start, end) in enumerate(story_boundaries):
+        effect = MULTI_STORY_EFFECTS[i % len(MULTI_STORY_EFFECTS)]
+        duration = end - start
+        # zoompan emits exactly d frames from the single image; trim keeps segment
+        # lengths identical to the per-segment encoder's -t cut, and setsar lets
+        # concat join images whose source aspect ratios differ
+        filters.append(
+            build_motion_filter(f"{i}:v", effect, duration, f"m{i}")
+            + f";[m{i}]trim=duration={duration},setpts=PTS-STARTPTS,setsar=1[s{i}]"
+        )
+    concat_inputs = ''.join(f"[s{i}]" for i in range(len(image_files)))
+    filters.append(f"{concat_inputs}concat=n={len(image_files)}:v=1:a=0[vcat]")
+    if ass_file:
+        filters.append(f"[vcat]ass={escape_filter_path(ass_file)}[vout]")
+    else:
+        filters.append("[vcat]null[vout]")
+    
+    hls_args = []
+    if hls_output_dir:
+        filters[-1] = filters[-1][:-len('[vout]')] + ",split=2[vout][vhls]"
+        hls_filters, hls_args = build_hls_outputs(
+            'vhls', f"{audio_index}:a", renditions or RENDITION_LADDER,
+            hls_output_dir, duration=audio_duration, x264_preset=x264_preset
+        )
+        filters += hls_filters
+    
+    command += [
+        '-filter_complex', ';'.join(filters),
+        '-map', '[vout]',
+        '-map', f"{audio_index}:a",
+    ]
+    if subtitle_file:
+        command += ['-map', f"{audio_index + 1}:s", '-c:s', 'mov_text', '-metadata:s:s:0', 'language=eng']
+    command += [
+        '-c:v', 'libx264',
+        '-preset', x264_preset or X264_PRESET,
+        '-pix_fmt', 'yuv420p',
+        '-c:a', 'aac',
+        '-b:a', AUDIO_BITRATE,
+        '-t', str(audio_duration),
+        output_file
+    ] + hls_args
+    return command
+
+
+def create_multi_story_video_single_pass(audio_file, image_files, story_boundaries, output_file,
+                                         hls_output_dir=None, renditions=None, workspace=None,
+                                         caption_mode=CAPTION_MODE_BURN, telemetry=None,
+                                         word_segments=None, x264_preset=None):
+    """
+    Create a multi-story video with one ffmpeg run and a single H.264 encode.
+    
+    Produces the same output as the segment pipeline (per-segment motion,
+    continuous audio, burned-in phrase captions) without the intermediate
+    segment, concat and mux files.
+    
+    Args:
+        audio_file: Path to combined audio file
+        image_files: List of image paths (one per story)
+        story_boundaries: List of (start, end) tuples for each story
+        output_file: Output video path
+        hls_output_dir: Optional directory for an HLS rendition ladder
+        renditions: Optional list of rendition dicts (default: RENDITION_LADDER)
+        workspace: Optional job workspace directory for intermediate files
+        caption_mode: CAPTION_MODE_BURN, CAPTION_MODE_SOFT or CAPTION_MODE_SIDECAR
+        telemetry: Optional RenderTelemetry for progress events and stage timings
+        word_segments: Optional precomputed (start, end, word) tuples; transcribed
+            from audio_file when omitted
+        x264_preset: Optional x264 preset overriding X264_PRESET
+    
+    Returns:
+        bool: True if successful
+    """
+    print("Creating video in a single ffmpeg pass...")
+    
+    if word_segments is None:
+        word_segments = get_word_timestamps_free(audio_file)
+    phrase_segments = group_words_into_phrases(word_segments)
+    print(f"Created {len(phrase_segments)} phrase segments")
+    
+    with ensure_workspace(workspace) as work_dir:
+        ass_file = None
+        subtitle_file = None
+        if caption_mode == CAPTION_MODE_BURN:
+            ass_file = work_dir / "captions.ass"
+            write_ass_captions(phrase_segments, ass_file)
+        else:
+            sidecar = get_caption_sidecar_path(output_file)
+            write_webvtt_captions(phrase_segments, sidecar)
+            if caption_mode == CAPTION_MODE_SOFT:
+                subtitle_file = sidecar
+        
+        try:
+            audio_duration = get_media_duration(audio_file)
+            print(f"Audio duration: {audio_duration:.2f}s")
+            
+            command = build_single_pass_command(
+                audio_file, image_files, story_boundaries, ass_file, audio_duration, output_file,
+                hls_output_dir=hls_output_dir, renditions=renditions, subtitle_file=subtitle_file,
+                x264_preset=x264_preset
+            )
+            run_ffmpeg(command, 'single_pass', telemetry, expected_duration=audio_duration)
+            copy_captions_to_hls(output_file, hls_output_dir)
+            
+            print(f"Video created in single pass: {output_file}")
+            return True
+            
+        except subprocess.CalledProcessError as e:
+            print(f"Error creating multi-story video: {e}")
+            if e.stderr:
+                print(f"FFmpeg stderr: {e.stderr[-500:]}")
+            return False
+
+
+def create_multi_story_video(audio_file, image_files, story_boundaries, output_file,
+                             render_mode=RENDER_MODE_SEGMENTS, hls_output_dir=None,
+                             renditions=None, workspace=None, use_segment_cache=True,
+                             caption_mode=CAPTION_MODE_BURN, telemetry=None, word_segments=None,
+                             x264_preset=None):
     """
     Create a video with multiple images (one per story) with different effects.
     Uses a single continuous audio track to avoid cuts.
@@ -243,6 +785,24 @@ def create_multi_story_video(audio_file, image_files, story_boundaries, output_f
         image_files: List of image paths (one per story)
         story_boundaries: List of (start, end) tuples for each story
         output_file: Output video path
+        render_mode: RENDER_MODE_SEGMENTS (encode per segment, then caption pass)
+            or RENDER_MODE_SINGLE_PASS (one filter graph, one encode)
+        hls_output_dir: Optional directory; when set, an HLS rendition ladder with
+            a master playlist is written alongside output_file
+        renditions: Optional list of rendition dicts (default: RENDITION_LADDER)
+        workspace: Optional job workspace directory for intermediate files. When
+            omitted a temporary workspace is created and removed afterwards.
+        use_segment_cache: In segment mode, reuse previously rendered segments with
+            identical inputs and only encode the ones that changed
+        caption_mode: CAPTION_MODE_BURN renders captions into the video;
+            CAPTION_MODE_SOFT embeds a mov_text track and writes a WebVTT sidecar,
+            CAPTION_MODE_SIDECAR only writes the sidecar (no caption encode pass)
+        telemetry: Optional RenderTelemetry; receives live progress events from
+            every ffmpeg run and records per-stage wall/CPU time
+        word_segments: Optional precomputed (start, end, word) tuples for the
+            captions; transcribed from audio_file when omitted
+        x264_preset: Optional x264 preset overriding X264_PRESET (e.g. a faster
+            one when an edition is running late)
     
     Returns:
         bool: True if successful
@@ -251,8 +811,27 @@ def create_multi_story_video(audio_file, image_files, story_boundaries, output_f
         print("Error: Number of images must match number of story boundaries")
         return False
     
-    # Effect rotation for visual variety
-    effects = ['zoom_in', 'pan_right', 'zoom_out', 'ken_burns']
+    with ensure_workspace(workspace) as work_dir:
+        if render_mode == RENDER_MODE_SINGLE_PASS:
+            return create_multi_story_video_single_pass(
+                audio_file, image_files, story_boundaries, output_file,
+                hls_output_dir=hls_output_dir, renditions=renditions, workspace=work_dir,
+                caption_mode=caption_mode, telemetry=telemetry, word_segments=word_segments,
+                x264_preset=x264_preset
+            )
+        
+        return _create_multi_story_video_segments(
+            audio_file, image_files, story_boundaries, output_file,
+            hls_output_dir, renditions, work_dir, use_segment_cache, caption_mode, telemetry,
+            word_segments, x264_preset
+        )
+
+
+def _create_multi_story_video_segments(audio_file, image_files, story_boundaries, output_file,
+                                       hls_output_dir, renditions, work_dir, use_segment_cache,
+                                       caption_mode, telemetry, word_segments, x264_preset=None):
+    """Segment render path for create_multi_story_video; intermediates live in work_dir"""
+    effects = MULTI_STORY_EFFECTS
     
     print("Creating video with continuous audio and dynamic visuals...")
     
@@ -261,81 +840,78 @@ def create_multi_story_video(audio_file, image_files, story_boundaries, output_f
     for i, (image, (start, end)) in enumerate(zip(image_files, story_boundaries)):
         effect = effects[i % len(effects)]
         duration = end - start
-        segment_file = f"temp_vseg_{i}.mp4"
         
         print(f"Creating visual segment {i+1}/{len(image_files)} with {effect}...")
-        success = create_video_segment_videoonly(
-            image_file=image,
-            duration=duration,
-            effect_style=effect,
-            output_file=segment_file
-        )
+        if use_segment_cache:
+            segment_file = render_segment_cached(image, duration, effect, work_dir, i, telemetry,
+                                                 x264_preset)
+        else:
+            segment_file = str(work_dir / f"temp_vseg_{i}.mp4")
+            if not create_video_segment_videoonly(
+                image_file=image,
+                duration=duration,
+                effect_style=effect,
+                output_file=segment_file,
+                telemetry=telemetry,
+                x264_preset=x264_preset
+            ):
+                segment_file = None
         
-        if success:
+        if segment_file:
             video_segments.append(segment_file)
         else:
             print(f"Failed to create segment {i}")
-            # Clean up
-            for seg in video_segments:
-                if os.path.exists(seg):
-                    os.remove(seg)
             return False
     
     # Step 2: Concatenate video segments
-    concat_file = "concat_list.txt"
+    concat_file = work_dir / "concat_list.txt"
     with open(concat_file, 'w') as f:
         for seg in video_segments:
             f.write(f"file '{seg}'\n")
     
+    video_only = str(work_dir / "temp_video_only.mp4")
+    video_with_audio = str(work_dir / "temp_video_with_audio.mp4")
+    
     try:
         # Concat videos
         print("Concatenating video segments...")
-        subprocess.run([
+        run_ffmpeg([
             'ffmpeg', '-y',
             '-f', 'concat',
             '-safe', '0',
-            '-i', concat_file,
+            '-i', str(concat_file),
             '-c', 'copy',
-            'temp_video_only.mp4'
-        ], check=True, capture_output=True, text=True)
+            video_only
+        ], 'concat', telemetry)
         
         # Step 3: Add continuous audio track
         print("Adding continuous audio track...")
         
         # Get audio duration first to ensure video matches
-        audio_info = subprocess.run([
-            'ffprobe', '-v', 'error',
-            '-show_entries', 'format=duration',
-            '-of', 'default=noprint_wrappers=1:nokey=1',
-            audio_file
-        ], capture_output=True, text=True, check=True)
-        audio_duration = float(audio_info.stdout.strip())
+        audio_duration = get_media_duration(audio_file)
         print(f"Audio duration: {audio_duration:.2f}s")
         
-        subprocess.run([
+        run_ffmpeg([
             'ffmpeg', '-y',
-            '-i', 'temp_video_only.mp4',
+            '-i', video_only,
             '-i', audio_file,
             '-c:v', 'copy',
             '-c:a', 'aac',
-            '-b:a', '192k',
+            '-b:a', AUDIO_BITRATE,
             '-t', str(audio_duration),
-            'temp_video_with_audio.mp4'
-        ], check=True, capture_output=True, text=True)
+            video_with_audio
+        ], 'mux_audio', telemetry, expected_duration=audio_duration)
         
         # Step 4: Add captions
         print("Adding word-level captions...")
-        success = add_captions_to_video(audio_file, 'temp_video_with_audio.mp4', output_file)
-        
-        # Clean up
-        os.remove(concat_file)
-        for seg in video_segments:
-            if os.path.exists(seg):
-                os.remove(seg)
-        if os.path.exists('temp_video_only.mp4'):
-            os.remove('temp_video_only.mp4')
-        if os.path.exists('temp_video_with_audio.mp4'):
-            os.remove('temp_video_with_audio.mp4')
+        success = add_captions_to_video(
+            audio_file, video_with_audio, output_file, workspace=work_dir, caption_mode=caption_mode,
+            telemetry=telemetry, expected_duration=audio_duration, word_segments=word_segments,
+            x264_preset=x264_preset
+        )
+        if success and hls_output_dir:
+            success = package_hls(output_file, hls_output_dir, renditions, telemetry, x264_preset)
+            copy_captions_to_hls(output_file, hls_output_dir)
         
         return success
         
@@ -343,20 +919,12 @@ def create_multi_story_video(audio_file, image_files, story_boundaries, output_f
         print(f"Error creating multi-story video: {e}")
         if e.stderr:
             print(f"FFmpeg stderr: {e.stderr[-500:]}")
-        # Clean up
-        if os.path.exists(concat_file):
-            os.remove(concat_file)
-        for seg in video_segments:
-            if os.path.exists(seg):
-                os.remove(seg)
-        if os.path.exists('temp_video_only.mp4'):
-            os.remove('temp_video_only.mp4')
-        if os.path.exists('temp_video_with_audio.mp4'):
-            os.remove('temp_video_with_audio.mp4')
         return False
 
 
-def add_captions_to_video(audio_file, video_file, output_file):
+def add_captions_to_video(audio_file, video_file, output_file, workspace=None,
+                          caption_mode=CAPTION_MODE_BURN, telemetry=None, expected_duration=None,
+                          word_segments=None, x264_preset=None):
     """
     Add word-level captions to an existing video.
     
@@ -364,158 +932,178 @@ def add_captions_to_video(audio_file, video_file, output_file):
         audio_file: Path to audio (for transcription)
         video_file: Path to video to add captions to
         output_file: Output video path
+        workspace: Optional job workspace directory for the captions file
+        caption_mode: CAPTION_MODE_BURN (re-encode with ASS captions),
+            CAPTION_MODE_SOFT (stream copy + mov_text track + WebVTT sidecar) or
+            CAPTION_MODE_SIDECAR (stream copy + WebVTT sidecar)
+        telemetry: Optional RenderTelemetry for progress events and stage timings
+        expected_duration: Optional video duration in seconds (for progress ETA)
+        word_segments: Optional precomputed (start, end, word) tuples; transcribed
+            from audio_file when omitted
+        x264_preset: Optional x264 preset for the burn-in encode (default: X264_PRESET)
     
     Returns:
         bool: True if successful
     """
     # Get timestamps from audio
-    word_segments = get_word_timestamps_free(audio_file)
+    if word_segments is None:
+        word_segments = get_word_timestamps_free(audio_file)
     
     # Group words into phrases (4 words each for better readability)
-    phrase_segments = []
-    words_per_phrase = 4
-    
-    for i in range(0, len(word_segments), words_per_phrase):
-        phrase_words = word_segments[i:i+words_per_phrase]
-        if phrase_words:
-            start = phrase_words[0][0]
-            end = phrase_words[-1][1]
-            text = ' '.join([word[2] for word in phrase_words])
-            phrase_segments.append((start, end, text))
+    phrase_segments = group_words_into_phrases(word_segments)
     
     print(f"Created {len(phrase_segments)} phrase segments")
     
-    # Create ASS subtitle file
-    ass_file = "captions.ass"
-    with open(ass_file, 'w', encoding='utf-8') as f:
-        f.write("[Script Info]\n")
-        f.write("ScriptType: v4.00+\n")
-        f.write("PlayResX: 1024\n")
-        f.write("PlayResY: 1024\n\n")
-        f.write("[V4+ Styles]\n")
-        f.write("Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding\n")
-        f.write("Style: Default,Arial,60,&H00FFFFFF,&H000000FF,&H00000000,&H80000000,-1,0,0,0,100,100,0,0,3,2,0,2,10,10,100,1\n\n")
-        f.write("[Events]\n")
-        f.write("Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\n")
+    if caption_mode != CAPTION_MODE_BURN:
+        return add_soft_captions_to_video(
+            phrase_segments, video_file, output_file, caption_mode, telemetry, expected_duration
+        )
+    
+    with ensure_workspace(workspace) as work_dir:
+        # Create ASS subtitle file
+        ass_file = work_dir / "captions.ass"
+        write_ass_captions(phrase_segments, ass_file)
         
-        for start, end, text in phrase_segments:
-            start_time = format_ass_time(start)
-            end_time = format_ass_time(end)
-            f.write(f"Dialogue: 0,{start_time},{end_time},Default,,0,0,0,,{text}\n")
+        try:
+            command = [
+                'ffmpeg', '-y',
+                '-i', video_file,
+                '-vf', f"ass={escape_filter_path(ass_file)}",
+                '-c:v', 'libx264',
+                '-preset', x264_preset or X264_PRESET,
+                '-c:a', 'copy',
+                '-pix_fmt', 'yuv420p',
+                output_file
+            ]
+            
+            run_ffmpeg(command, 'caption_burn', telemetry, expected_duration=expected_duration)
+            
+            print(f"Captions added successfully: {output_file}")
+            return True
+            
+        except subprocess.CalledProcessError as e:
+            print(f"Error adding captions: {e}")
+            return False
+
+
+def add_soft_captions_to_video(phrase_segments, video_file, output_file, caption_mode=CAPTION_MODE_SOFT,
+                               telemetry=None, expected_duration=None):
+    """
+    Attach captions without touching the video pixels.
     
-    try:
-        command = [
-            'ffmpeg', '-y',
-            '-i', video_file,
-            '-vf', f"ass={ass_file}",
-            '-c:v', 'libx264',
-            '-preset', 'medium',
-            '-c:a', 'copy',
-            '-pix_fmt', 'yuv420p',
-            output_file
+    Writes a WebVTT sidecar next to output_file and stream-copies the video and
+    audio; in CAPTION_MODE_SOFT the captions are also embedded as a mov_text
+    track that players can toggle.
+    
+    Args:
+        phrase_segments: List of (start, end, text) tuples
+        video_file: Path to video to add captions to
+        output_file: Output video path
+        caption_mode: CAPTION_MODE_SOFT or CAPTION_MODE_SIDECAR
+        telemetry: Optional RenderTelemetry for progress events and stage timings
+        expected_duration: Optional video duration in seconds (for progress ETA)
+    
+    Returns:
+        bool: True if successful
+    """
+    sidecar = get_caption_sidecar_path(output_file)
+    write_webvtt_captions(phrase_segments, sidecar)
+    
+    command = ['ffmpeg', '-y', '-i', video_file]
+    if caption_mode == CAPTION_MODE_SOFT:
+        command += [
+            '-i', str(sidecar),
+            '-map', '0:v', '-map', '0:a?', '-map', '1:s',
+            '-c:v', 'copy', '-c:a', 'copy',
+            '-c:s', 'mov_text', '-metadata:s:s:0', 'language=eng',
         ]
-        
-        subprocess.run(command, check=True, capture_output=True)
-        
-        # Clean up
-        os.remove(ass_file)
-        
-        print(f"Captions added successfully: {output_file}")
+    else:
+        command += ['-c', 'copy']
+    command.append(output_file)
+    
+    try:
+        run_ffmpeg(command, 'caption_soft', telemetry, expected_duration=expected_duration)
+        print(f"Soft captions added: {output_file} (sidecar: {sidecar})")
         return True
-        
     except subprocess.CalledProcessError as e:
-        print(f"Error adding captions: {e}")
-        if os.path.exists(ass_file):
-            os.remove(ass_file)
+        print(f"Error adding soft captions: {e}")
+        if e.stderr:
+            print(f"FFmpeg stderr: {e.stderr[-500:]}")
         return False
 
 
-def create_video_with_word_captions(audio_file, image_file, output_file):
-    """Creates video with phrase-by-phrase captions using ASS subtitles"""
+def create_video_with_word_captions(audio_file, image_file, output_file, workspace=None,
+                                    caption_mode=CAPTION_MODE_BURN, telemetry=None, word_segments=None):
+    """Creates video with phrase-by-phrase captions using ASS subtitles (or soft captions, see caption_mode)"""
     
-    # Get timestamps from audio
-    word_segments = get_word_timestamps_free(audio_file)
+    # Get timestamps from audio (unless precomputed ones were passed in)
+    if word_segments is None:
+        word_segments = get_word_timestamps_free(audio_file)
     
     # Group words into phrases (3-5 words each for better readability)
-    phrase_segments = []
-    words_per_phrase = 4
-    
-    for i in range(0, len(word_segments), words_per_phrase):
-        phrase_words = word_segments[i:i+words_per_phrase]
-        if phrase_words:
-            start = phrase_words[0][0]
-            end = phrase_words[-1][1]
-            text = ' '.join([word[2] for word in phrase_words])
-            phrase_segments.append((start, end, text))
+    phrase_segments = group_words_into_phrases(word_segments)
     
     print(f"Created {len(phrase_segments)} phrase segments from {len(word_segments)} words")
     
-    # Create ASS subtitle file
-    ass_file = "captions.ass"
-    with open(ass_file, 'w', encoding='utf-8') as f:
-        # Write ASS header
-        f.write("[Script Info]\n")
-        f.write("ScriptType: v4.00+\n")
-        f.write("PlayResX: 1024\n")
-        f.write("PlayResY: 1024\n")
-        f.write("\n")
-        f.write("[V4+ Styles]\n")
-        f.write("Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding\n")
-        f.write("Style: Default,Arial,60,&H00FFFFFF,&H000000FF,&H00000000,&H80000000,-1,0,0,0,100,100,0,0,3,2,0,2,10,10,100,1\n")
-        f.write("\n")
-        f.write("[Events]\n")
-        f.write("Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\n")
-        
-        # Write subtitle events
-        for start, end, text in phrase_segments:
-            # Convert seconds to ASS time format (H:MM:SS.CS)
-            start_time = format_ass_time(start)
-            end_time = format_ass_time(end)
-            # ASS format handles all special characters automatically
-            f.write(f"Dialogue: 0,{start_time},{end_time},Default,,0,0,0,,{text}\n")
-    
-    try:
-        # Add zoom effect with upscale/downscale to eliminate shakiness
-        # NO -loop or -framerate: use large d value and let zoompan generate frames
-        # d=750 creates 30 seconds of frames at 25fps, -shortest cuts to audio length
-        # Method: Upscale 4x -> apply zoom -> downscale back to prevent rounding errors
-        command = [
-            'ffmpeg',
-            '-i', image_file,  # Single image input, no looping
-            '-i', audio_file,
-            '-filter_complex', (
-                "[0:v]scale=4096x4096,"  # Upscale 4x to prevent rounding errors
-                "zoompan=z='min(zoom+0.0004,1.20)':d=750:x='iw/2-(iw/zoom/2)':y='ih/2-(ih/zoom/2)':s=4096x4096:fps=25,"
-                "scale=1024x1024[v];"  # Downscale back to target resolution
-                f"[v]ass={ass_file}[vout]"  # Apply subtitles
-            ),
-            '-map', '[vout]',  # Map filtered video
-            '-map', '1:a',     # Map audio from second input
-            '-c:v', 'libx264',
-            '-preset', 'medium',  # Good balance of speed and quality
-            '-c:a', 'aac',
-            '-b:a', '192k',
-            '-pix_fmt', 'yuv420p',
-            '-shortest',
-            '-y',
-            output_file
-        ]
-        
-        print("Running ffmpeg command with smooth zoom and ASS subtitles...")
-        print(f"Number of caption segments: {len(phrase_segments)}")
-        print(f"Zoom effect: 1.0x to 1.20x (20%) - SMOOTH (upscale/downscale method)")
-        print(f"Full command: {' '.join(command)}")
-        print("\n--- FFmpeg Output ---")
-        
-        # Run ffmpeg with visible progress output
-        result = subprocess.run(command, check=True, text=True)
-        print("\n--- FFmpeg Complete ---")
-        print(f"Video with phrase captions created: {output_file}")
-        
-        # Clean up the ASS file
-        os.remove(ass_file)
+    with ensure_workspace(workspace) as work_dir:
+        if caption_mode == CAPTION_MODE_BURN:
+            # Create ASS subtitle file
+            ass_file = work_dir / "captions.ass"
+            write_ass_captions(phrase_segments, ass_file)
+            caption_filter = f"[v]ass={escape_filter_path(ass_file)}[vout]"  # Apply subtitles
+            subtitle_inputs, subtitle_maps = [], []
+        else:
+            sidecar = get_caption_sidecar_path(output_file)
+            write_webvtt_captions(phrase_segments, sidecar)
+            caption_filter = "[v]null[vout]"  # Captions stay out of the pixels
+            subtitle_inputs, subtitle_maps = [], []
+            if caption_mode == CAPTION_MODE_SOFT:
+                subtitle_inputs = ['-i', str(sidecar)]
+                subtitle_maps = ['-map', '2:s', '-c:s', 'mov_text']
         
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"Error: {e.stderr}")
-        return False
\ No newline at end of file
+        try:
+            # Add zoom effect with upscale/downscale to eliminate shakiness
+            # NO -loop or -framerate: use large d value and let zoompan generate frames
+            # d=750 creates 30 seconds of frames at 25fps, -shortest cuts to audio length
+            # Method: Upscale 4x -> apply zoom -> downscale back to prevent rounding errors
+            command = [
+                'ffmpeg',
+                '-i', image_file,  # Single image input, no looping
+                '-i', audio_file,
+            ] + subtitle_inputs + [
+                '-filter_complex', (
+                    "[0:v]scale=4096x4096,"  # Upscale 4x to prevent rounding errors
+                    "zoompan=z='min(zoom+0.0004,1.20)':d=750:x='iw/2-(iw/zoom/2)':y='ih/2-(ih/zoom/2)':s=4096x4096:fps=25,"
+                    "scale=1024x1024[v];"  # Downscale back to target resolution
+                    + caption_filter
+                ),
+                '-map', '[vout]',  # Map filtered video
+                '-map', '1:a',     # Map audio from second input
+            ] + subtitle_maps + [
+                '-c:v', 'libx264',
+                '-preset', X264_PRESET,  # Good balance of speed and quality
+                '-c:a', 'aac',
+                '-b:a', '192k',
+                '-pix_fmt', 'yuv420p',
+                '-shortest',
+                '-y',
+                output_file
+            ]
+            
+            print("Running ffmpeg command with smooth zoom and ASS subtitles...")
+            print(f"Number of caption segments: {len(phrase_segments)}")
+            print(f"Zoom effect: 1.0x to 1.20x (20%) - SMOOTH (upscale/downscale method)")
+            print(f"Full command: {' '.join(command)}")
+            print("\n--- FFmpeg Output ---")
+            
+            # Run ffmpeg with visible progress output
+            if telemetry is None:
+                telemetry = RenderTelemetry(progress_callback=print_progress_event)
+            result = run_ffmpeg(command, 'word_captions', telemetry)
+            print("\n--- FFmpeg Complete ---")
+            print(f"Video with phrase captions created: {output_file}")
+            
+            return True
+        except subprocess.CalledProcessError as e:
+            print(f"Error: {e.stderr}")
+            return False
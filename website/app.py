@@ -1,8 +1,40 @@
-from flask import Flask, render_template, url_for
+import os
+import sys
+from datetime import date
+from pathlib import Path
+from flask import Flask, render_template, url_for, send_from_directory, abort, request, jsonify
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "agents" / "database"))
+from catalog_mirror import fetch_videos_by_ids
+from database_utils import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor
+from facet_index import search_archive
 
 
 app = Flask(__name__)
 
+# HLS rendition ladders written by the video agent (one sub-directory per edition)
+HLS_ROOT = Path(os.getenv(
+    "HLS_ROOT",
+    Path(__file__).resolve().parent.parent / "agents" / "video_agent" / "hls"
+))
+HLS_MIMETYPES = {
+    '.m3u8': 'application/vnd.apple.mpegurl',
+    '.ts': 'video/mp2t',
+    '.vtt': 'text/vtt',
+}
+HLS_CAPTIONS_FILE = 'captions.vtt'  # WebVTT sidecar written by the soft-caption render mode
+
+
+def latest_hls_master():
+    """Return the master playlist path (relative to HLS_ROOT) of the newest edition, or None"""
+    if not HLS_ROOT.is_dir():
+        return None
+    masters = list(HLS_ROOT.glob('*/master.m3u8'))
+    if not masters:
+        return None
+    newest = max(masters, key=lambda p: p.stat().st_mtime)
+    return newest.relative_to(HLS_ROOT).as_posix()
+
 @app.context_processor
 def inject_hermes_assets():
     return {
@@ -13,7 +45,21 @@ def inject_hermes_assets():
 @app.route("/")
 def index():
     mainvideo = url_for('static', filename='test-files/test.mp4')
-    return render_template('index.html', video = mainvideo)
+    master = latest_hls_master()
+    hlsvideo = url_for('hls', filename=master) if master else None
+    captions = None
+    if master:
+        captions_file = Path(master).parent / HLS_CAPTIONS_FILE
+        if (HLS_ROOT / captions_file).exists():
+            captions = url_for('hls', filename=captions_file.as_posix())
+    return render_template('index.html', video = mainvideo, hls_video = hlsvideo, captions = captions)
+
+@app.route("/hls/<path:filename>")
+def hls(filename):
+    mimetype = HLS_MIMETYPES.get(Path(filename).suffix)
+    if mimetype is None:
+        abort(404)
+    return send_from_directory(HLS_ROOT, filename, mimetype=mimetype)
 
 @app.route("/previousnews")
 def previousnews():
@@ -29,6 +75,50 @@ def previousnews():
 
     return render_template('previousnews.html',news1 = linknews1,news2 = linknews2,news3 = linknews3,news4 = linknews4,news5 = linknews5,news6 = linknews6,news7 = linknews7,news8 = linknews8,news9 = linknews9)
 
+@app.route("/api/archive")
+def archive():
+    """
+    Filter the archive: ?tag=technology&source=Reuters&days=30&limit=24&cursor=...
+
+    tag and source may repeat (every one must match); since/until (YYYY-MM-DD)
+    bound the dates. Returns one page of the matching videos' listing fields,
+    newest first, with the total and tag/source facet counts over all matches.
+    Pass next_cursor back as cursor for the following page (None on the last).
+    """
+    try:
+        days = int(request.args['days']) if request.args.get('days') else None
+        limit = int(request.args['limit']) if request.args.get('limit') else DEFAULT_PAGE_SIZE
+        since = date.fromisoformat(request.args['since']) if request.args.get('since') else None
+        until = date.fromisoformat(request.args['until']) if request.args.get('until') else None
+    except ValueError:
+        abort(400, description="days and limit must be whole numbers and since/until dates in YYYY-MM-DD format")
+    if days is not None and days < 1:
+        abort(400, description="days must be at least 1")
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        abort(400, description=f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+    cursor = request.args.get('cursor')
+    if cursor is not None:
+        try:
+            decode_cursor(cursor)
+        except ValueError as e:
+            abort(400, description=str(e))
+
+    try:
+        result = search_archive(request.args.getlist('tag'), request.args.getlist('source'),
+                                days=days, since=since, until=until, limit=limit, cursor=cursor)
+        videos = fetch_videos_by_ids(result['ids'])
+    except Exception as e:
+        # The request was valid; the catalog mirror couldn't be read or synced
+        print(f"Archive query failed: {e}")
+        abort(503, description="The archive is temporarily unavailable")
+    return jsonify({
+        'total': result['total'],
+        'facets': result['facets'],
+        'videos': videos,
+        'next_cursor': result['next_cursor'],
+    })
+
 @app.route("/sources")
 def sources():
     return render_template('sources.html')